@@ -1,3 +1,5 @@
+from k8s_bench.commands.benchmark import k8s_benchmark, k8s_import_benchmark
+from k8s_bench.commands.informer import k8s_informer
 from k8s_bench.commands.setup import k8s_setup
 
-commands = [k8s_setup]
+commands = [k8s_setup, k8s_informer, k8s_benchmark, k8s_import_benchmark]
@@ -0,0 +1,117 @@
+import json
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+OPERATION_NAMES = (
+    "create_upgrade_job",
+    "create_site_ingress",
+    "patch_ingress",
+    "read_ingress",
+    "get_job_status",
+    "delete_site_resources",
+)
+
+
+@click.command(
+    "k8s-benchmark", help="Benchmark k8s_bench calls against a local fake apiserver"
+)
+@click.option("--requests", default=200, help="Sites driven through every operation")
+@click.option("--concurrency", default=10, help="Concurrent calls per operation")
+@click.option("--latency", default=0.0, help="Seconds the fake apiserver adds per call")
+@click.option("--jitter", default=0.0, help="Random extra latency in seconds, up to")
+@click.option("--error-rate", default=0.0, help="Share of calls failed with a 500")
+@click.option("--ingress-shards", default=0, help="Benchmark the sharded Ingress layout")
+@click.option("--ingress-shard-max-rules", type=int, help="Rules per Ingress shard")
+@click.option(
+    "--operation",
+    "operations",
+    multiple=True,
+    type=click.Choice(OPERATION_NAMES),
+    help="Operations to run, in order, defaults to all",
+)
+@click.option("--trace-memory", is_flag=True, help="Report the tracemalloc peak")
+@click.option("--output", help="Write the results as JSON to this file")
+@click.option("--baseline", help="Compare against results written by --output")
+@pass_context
+def k8s_benchmark(
+    context,
+    requests,
+    concurrency,
+    latency,
+    jitter,
+    error_rate,
+    ingress_shards,
+    ingress_shard_max_rules,
+    operations,
+    trace_memory,
+    output,
+    baseline,
+):
+    from k8s_bench.utils.benchmark import compare_results, load_results, run_benchmark
+
+    site = get_site(context)
+    frappe.init(site=site)
+    try:
+        results = run_benchmark(
+            requests=requests,
+            concurrency=concurrency,
+            latency=latency,
+            jitter=jitter,
+            error_rate=error_rate,
+            ingress_shards=ingress_shards,
+            ingress_shard_max_rules=ingress_shard_max_rules,
+            operations=list(operations),
+            trace_memory=trace_memory,
+        )
+        if baseline:
+            results["comparison"] = compare_results(results, load_results(baseline))
+    finally:
+        frappe.destroy()
+
+    click.secho(
+        f"{'operation':<24}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'errors':>8}",
+        bold=True,
+    )
+    for operation, stats in results["operations"].items():
+        click.echo(
+            f"{operation:<24}{stats['throughput']:>10}{stats['p50_ms']:>10}"
+            f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['errors']:>8}"
+        )
+    click.echo(f"memory: {json.dumps(results['memory'])}")
+    if baseline:
+        click.echo(f"against {baseline}: {json.dumps(results['comparison'], indent=1)}")
+
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(results, output_file, indent=1)
+
+
+@click.command(
+    "k8s-import-benchmark",
+    help="Measure import time and RSS of a worker with and without k8s_bench",
+)
+@click.option("--repeat", default=5, help="Fresh interpreters per scenario")
+@click.option("--output", help="Write the results as JSON to this file")
+def k8s_import_benchmark(repeat, output):
+    from k8s_bench.utils.benchmark import run_import_benchmark
+
+    results = run_import_benchmark(repeat)
+
+    click.secho(
+        f"{'scenario':<42}{'import ms':>11}{'delta':>9}{'rss MiB':>10}{'delta':>9}"
+        f"{'kubernetes':>12}",
+        bold=True,
+    )
+    for scenario, stats in results.items():
+        click.echo(
+            f"{scenario:<42}{stats['import_ms']:>11}{stats['import_ms_delta']:>9}"
+            f"{stats['max_rss_mib']:>10}{stats['max_rss_mib_delta']:>9}"
+            f"{str(stats['kubernetes_loaded']):>12}"
+        )
+
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(results, output_file, indent=1)
@@ -0,0 +1,32 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("k8s-informer", help="Watch k8s_bench resources into the cache")
+@click.option(
+    "--resource",
+    "resources",
+    multiple=True,
+    type=click.Choice(["jobs", "ingresses"]),
+    help="Resources to watch, defaults to all",
+)
+@pass_context
+def k8s_informer(context, resources):
+    from k8s_bench.utils.informer import (
+        get_ingress_informer,
+        get_job_informer,
+        run_informers,
+    )
+
+    get_informers = {"jobs": get_job_informer, "ingresses": get_ingress_informer}
+    resources = resources or list(get_informers)
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect(site=site)
+    try:
+        click.secho(f"Watching {', '.join(resources)} for {site} ...", bold=True)
+        run_informers([get_informers[resource]() for resource in resources])
+    finally:
+        frappe.destroy()
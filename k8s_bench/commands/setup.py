@@ -1,6 +1,7 @@
 import click
 import frappe
 from frappe.commands import get_site, pass_context
+from k8s_bench.utils.pre_pull import pre_pull_images
 from k8s_bench.utils.setup import setup_bench
 
 
@@ -19,6 +20,31 @@ from k8s_bench.utils.setup import setup_bench
     "--wildcard-tls-secret-name",
     help="K8s secret for wildcard certificate",
 )
+@click.option(
+    "--ingress-shards",
+    type=int,
+    help="Number of shared Ingress objects for site rules, 0 for one per site",
+)
+@click.option("--ingress-shard-max-rules", type=int, help="Rules per Ingress shard")
+@click.option(
+    "--shadow-rollback/--no-shadow-rollback",
+    default=None,
+    help="Snapshot site tables into a shadow schema before migrate",
+)
+@click.option(
+    "--db-root-password-secret",
+    help="K8s secret with the MariaDB root password, used by shadow rollback",
+)
+@click.option(
+    "--assets-cache-pvc-name",
+    help="Shared PVC for nginx assets, keyed by the nginx image digest",
+)
+@click.option(
+    "--pre-pull-images",
+    "pre_pull",
+    is_flag=True,
+    help="Pull the configured images on every node with a short-lived DaemonSet",
+)
 @pass_context
 def k8s_setup(
     context,
@@ -30,6 +56,12 @@ def k8s_setup(
     service_name,
     wildcard_domain,
     wildcard_tls_secret_name,
+    ingress_shards,
+    ingress_shard_max_rules,
+    shadow_rollback,
+    db_root_password_secret,
+    assets_cache_pvc_name,
+    pre_pull,
 ):
     click.secho("Updating K8s Bench Settings ...", bold=True)
     click.secho(
@@ -45,6 +77,11 @@ pvc_name                        {pvc_name}
 service_name                    {service_name}
 wildcard_domain                 {wildcard_domain}
 wildcard_tls_secret_name        {wildcard_tls_secret_name}
+ingress_shards                  {ingress_shards}
+ingress_shard_max_rules         {ingress_shard_max_rules}
+shadow_rollback                 {shadow_rollback}
+db_root_password_secret         {db_root_password_secret}
+assets_cache_pvc_name           {assets_cache_pvc_name}
 	""",
         underline=True,
     )
@@ -60,6 +97,16 @@ wildcard_tls_secret_name        {wildcard_tls_secret_name}
         service_name,
         wildcard_domain,
         wildcard_tls_secret_name,
+        ingress_shards,
+        ingress_shard_max_rules,
+        shadow_rollback,
+        db_root_password_secret,
+        assets_cache_pvc_name,
     )
     frappe.db.commit()
+
+    if pre_pull:
+        click.secho("Pre-pulling images ...", bold=True)
+        click.echo(frappe.as_json(pre_pull_images()))
+
     frappe.destroy()
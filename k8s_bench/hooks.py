@@ -115,6 +115,17 @@ doctype_js = {
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"all": [
+		"k8s_bench.utils.warm_pool.enqueue_refill_warm_pool"
+	],
+	"cron": {
+		"* * * * *": [
+			"k8s_bench.utils.upgrade_scheduler.enqueue_dispatch"
+		]
+	}
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"k8s_bench.tasks.all"
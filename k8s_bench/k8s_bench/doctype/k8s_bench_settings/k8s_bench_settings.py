@@ -3,7 +3,9 @@
 
 # import frappe
 from frappe.model.document import Document
+from k8s_bench.utils.settings import clear_settings_cache
 
 
 class K8sBenchSettings(Document):
-    pass
+    def on_update(self):
+        clear_settings_cache()
@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Castlecraft Ecommerce Pvt Ltd and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class UpgradeRequest(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Upgrade Request", ["status", "db_host", "priority"])
@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Castlecraft Ecommerce Pvt Ltd and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Upgrade Run', {
+	// refresh: function(frm) {
+
+	// }
+});
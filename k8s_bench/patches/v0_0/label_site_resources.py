@@ -0,0 +1,68 @@
+import frappe
+from k8s_bench.utils.constants import (
+    SITE_INGRESS_LABELS,
+    SITE_LABEL,
+    UPGRADE_JOB_LABELS,
+)
+from k8s_bench.utils.k8s import get_site_label_value, get_upgrade_job_name
+from k8s_bench.utils.kube_client import client, get_api, rest
+from k8s_bench.utils.settings import get_k8s_settings
+
+
+def execute():
+    # label resources created before deletion moved to label selectors
+    k8s_settings = get_k8s_settings()
+    if not k8s_settings.namespace or not frappe.db.exists("DocType", "Site"):
+        return
+
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+    batch_v1_api = get_api(client.BatchV1Api)
+    try:
+        ingresses = {
+            ingress.metadata.name
+            for ingress in networking_v1_api.list_namespaced_ingress(
+                k8s_settings.namespace
+            ).items
+        }
+        jobs = {
+            job.metadata.name
+            for job in batch_v1_api.list_namespaced_job(k8s_settings.namespace).items
+        }
+    except Exception as e:
+        print(f"Skipping k8s_bench resource labels: {e!r}")
+        return
+
+    for site_name in frappe.get_all("Site", pluck="name"):
+        labels = {SITE_LABEL: get_site_label_value(site_name)}
+
+        if site_name in ingresses:
+            label_resource(
+                networking_v1_api.patch_namespaced_ingress,
+                site_name,
+                k8s_settings.namespace,
+                dict(SITE_INGRESS_LABELS, **labels),
+            )
+
+        job_name = get_upgrade_job_name(site_name)
+        if job_name in jobs:
+            label_resource(
+                batch_v1_api.patch_namespaced_job,
+                job_name,
+                k8s_settings.namespace,
+                dict(UPGRADE_JOB_LABELS, **labels),
+            )
+
+
+def label_resource(patch, name, namespace, labels):
+    # one failed object must not fail bench migrate for the whole install
+    try:
+        patch(name, namespace, {"metadata": {"labels": labels}})
+    except rest.ApiException as e:
+        # deleted since it was listed
+        if e.status == 404:
+            return
+        print(f"Skipping k8s_bench resource labels for {name}: {e!r}")
+        frappe.log_error(
+            {"error": e, "params": {"name": name, "namespace": namespace}},
+            "Exception: label_site_resources",
+        )
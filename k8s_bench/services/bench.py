@@ -9,38 +9,43 @@ from bench_manager.bench_manager.utils import (
     safe_decode,
     verify_whitelisted_call,
 )
+from k8s_bench.utils.provision import enqueue_provision_site
 from k8s_bench.utils.setup import setup_bench as _setup_bench
+from k8s_bench.utils.warm_pool import (
+    claim_warm_site,
+    enqueue_refill_warm_pool,
+    get_warm_pool_status,
+)
 
 
 @frappe.whitelist()
-def create_site(site_name, key, first_name, last_name, password, email,  apps=None):
-    mysql_password = frappe.get_conf().get("root_password")
-    admin_password = frappe.get_conf().get("admin_password")
-
+def create_site(
+    site_name, key, first_name, last_name, password, email, apps=None, template=None
+):
     verify_whitelisted_call()
-    commands = [
-        "bench new-site --mariadb-root-password {mysql_password} --admin-password {admin_password} --no-mariadb-socket {site_name}".format(
-            site_name=site_name,
-            admin_password=admin_password,
-            mysql_password=mysql_password,
-        ),
-        f"bench --site {site_name} add-system-manager --first-name {first_name} --last-name {last_name} --password {password} {email}"
-    ]
+    if claim_warm_site(site_name, key, first_name, last_name, password, email, apps):
+        return f"Creating {site_name} from the warm pool"
+    enqueue_provision_site(
+        site_name, key, first_name, last_name, password, email, apps, template
+    )
+    return f"Creating {site_name}"
 
-    list_apps = ["frappe"]
 
-    if apps:
-        list_apps = apps.split(",")
-        for app in list_apps:
-            commands.append(f"bench --site {site_name} install-app {app}")
+@frappe.whitelist(methods=["GET"])
+def warm_pool_status():
+    if not frappe.has_permission("Bench Settings"):
+        frappe.local.response["http_status_code"] = 403
+        return "Not Permitted"
+    return get_warm_pool_status()
 
-    frappe.enqueue(
-        "bench_manager.bench_manager.utils.run_command",
-        commands=commands,
-        doctype="Bench Settings",
-        key=key,
-    )
-    return f"Creating {site_name}"
+
+@frappe.whitelist(methods=["POST"])
+def refill_warm_pool():
+    if not frappe.has_permission("Bench Settings"):
+        frappe.local.response["http_status_code"] = 403
+        return "Not Permitted"
+    enqueue_refill_warm_pool()
+    return get_warm_pool_status()
 
 
 @frappe.whitelist()
@@ -74,6 +79,11 @@ def setup_bench(
     service_name=None,
     wildcard_domain=None,
     wildcard_tls_secret_name=None,
+    ingress_shards=None,
+    ingress_shard_max_rules=None,
+    shadow_rollback=None,
+    db_root_password_secret=None,
+    assets_cache_pvc_name=None,
 ):
     k8s_settings = _setup_bench(
         namespace,
@@ -84,5 +94,10 @@ def setup_bench(
         service_name,
         wildcard_domain,
         wildcard_tls_secret_name,
+        ingress_shards,
+        ingress_shard_max_rules,
+        shadow_rollback,
+        db_root_password_secret,
+        assets_cache_pvc_name,
     )
     return k8s_settings.as_dict()
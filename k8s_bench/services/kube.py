@@ -1,13 +1,35 @@
 import frappe
+from frappe.utils import cint
 
+from k8s_bench.utils.assets_cache import populate_assets_cache
 from k8s_bench.utils.constants import UPGRADE_SITE
 from k8s_bench.utils.k8s import (
+    create_batch_upgrade_job,
     create_upgrade_job,
     create_site_ingress,
     patch_ingress,
+    patch_ingresses,
     delete_site_resources,
+    delete_sites_resources,
     get_job_status,
     read_ingress,
+    wait_for_job_status,
+)
+from k8s_bench.utils.fleet import (
+    get_fleet_upgrade_status,
+    get_site_names,
+    start_fleet_upgrade,
+)
+from k8s_bench.utils.kube_client import get_pool_stats
+from k8s_bench.utils.metrics import get_metrics_response
+from k8s_bench.utils.upgrade_runs import collect_upgrade_run, get_phase_stats
+from k8s_bench.utils.upgrade_scheduler import (
+    get_scheduler_status,
+    schedule_upgrades as _schedule_upgrades,
+)
+from k8s_bench.utils.pre_pull import (
+    get_pre_pull_status,
+    pre_pull_images as _pre_pull_images,
 )
 
 
@@ -16,14 +38,76 @@ def upgrade_site(site_name, base_pvc_name):
     return create_upgrade_job(site_name, base_pvc_name)
 
 
+@frappe.whitelist(methods=["POST"])
+def upgrade_sites(
+    base_pvc_name,
+    sites=None,
+    filters=None,
+    parallelism=None,
+    batch_size=None,
+    batch_parallelism=None,
+    pre_pull=0,
+):
+    return start_fleet_upgrade(
+        base_pvc_name,
+        sites,
+        filters,
+        parallelism,
+        batch_size,
+        batch_parallelism,
+        cint(pre_pull),
+    )
+
+
+@frappe.whitelist(methods=["POST"])
+def schedule_upgrades(
+    base_pvc_name, sites=None, filters=None, priority=0, db_hosts=None
+):
+    return _schedule_upgrades(base_pvc_name, sites, filters, priority, db_hosts)
+
+
+@frappe.whitelist(methods=["GET"])
+def upgrade_scheduler_status():
+    return get_scheduler_status()
+
+
+@frappe.whitelist(methods=["POST"])
+def upgrade_site_batch(sites, base_pvc_name, parallelism=None):
+    return create_batch_upgrade_job(get_site_names(sites), base_pvc_name, parallelism)
+
+
+@frappe.whitelist(methods=["POST"])
+def populate_assets():
+    return populate_assets_cache()
+
+
+@frappe.whitelist(methods=["POST"])
+def pre_pull_images():
+    return _pre_pull_images()
+
+
+@frappe.whitelist(methods=["GET"])
+def pre_pull_status(cleanup=0):
+    return get_pre_pull_status(cint(cleanup))
+
+
+@frappe.whitelist(methods=["GET"])
+def fleet_upgrade_status(fleet_upgrade_id):
+    return get_fleet_upgrade_status(fleet_upgrade_id)
+
+
 @frappe.whitelist(methods=["POST"])
 def create_ingress(site_name):
     return create_site_ingress(site_name)
 
 
 @frappe.whitelist(methods=["POST"])
-def change_ingress_service_to_current_bench(site_name):
-    return patch_ingress(site_name)
+def change_ingress_service_to_current_bench(
+    site_name=None, site_names=None, parallelism=None
+):
+    if site_name:
+        return patch_ingress(site_name)
+    return patch_ingresses(get_site_names(site_names), parallelism)
 
 
 @frappe.whitelist(methods=["POST"])
@@ -31,12 +115,41 @@ def delete_resources(site_name):
     return delete_site_resources(site_name)
 
 
+@frappe.whitelist(methods=["POST"])
+def delete_resources_bulk(site_names, parallelism=None):
+    return delete_sites_resources(get_site_names(site_names), parallelism)
+
+
+@frappe.whitelist(methods=["GET"])
+def job_status(job_name, raw=0, fields=None):
+    return get_job_status(job_name, cint(raw), fields)
+
+
 @frappe.whitelist(methods=["GET"])
-def job_status(job_name):
-    return get_job_status(job_name)
+def wait_job_status(job_name, since=None, timeout=None):
+    return wait_for_job_status(job_name, since, timeout)
 
 
 @frappe.whitelist(methods=["GET"])
-def get_ingress(site_name):
-    return read_ingress(site_name)
+def get_ingress(site_name, fresh=0, raw=0, fields=None):
+    return read_ingress(site_name, cint(fresh), cint(raw), fields)
 
+
+@frappe.whitelist(methods=["POST"])
+def collect_upgrade_runs(job_name):
+    return collect_upgrade_run(job_name)
+
+
+@frappe.whitelist(methods=["GET"])
+def upgrade_phase_stats(filters=None, from_date=None, to_date=None):
+    return get_phase_stats(filters, from_date, to_date)
+
+
+@frappe.whitelist(methods=["GET"])
+def client_pool_stats():
+    return get_pool_stats()
+
+
+@frappe.whitelist(methods=["GET"])
+def metrics():
+    return get_metrics_response()
@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+
+from k8s_bench.utils.benchmark import BENCHMARK_SETTINGS
+from k8s_bench.utils.call_policy import CallPolicy
+from k8s_bench.utils.fake_apiserver import FakeApiServer
+from k8s_bench.utils.kube_client import client, manager
+from k8s_bench.utils.settings import override_k8s_settings
+
+
+@contextmanager
+def fake_cluster(**settings):
+    # k8s calls of the block go to a fake apiserver, yields the settings snapshot
+    from k8s_bench.utils.instrumented_client import InstrumentedApiClient
+
+    with FakeApiServer() as server:
+        configuration = client.Configuration()
+        configuration.host = server.url
+        api_client = InstrumentedApiClient(
+            configuration=configuration,
+            policy=CallPolicy.from_conf(rate_limit=0, circuit_failures=0),
+        )
+        with override_k8s_settings(
+            dict(BENCHMARK_SETTINGS, **settings)
+        ) as k8s_settings, manager.pin(api_client):
+            yield k8s_settings
@@ -0,0 +1,103 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import frappe
+from k8s_bench.utils.call_policy import (
+    CIRCUIT_KEY,
+    RATE_LIMIT_KEY,
+    CallPolicy,
+    get_retry_after,
+    is_transient,
+)
+from k8s_bench.utils.kube_client import rest
+
+
+class TestCallPolicy(unittest.TestCase):
+    def setUp(self):
+        frappe.cache().delete_value([RATE_LIMIT_KEY, CIRCUIT_KEY])
+
+    def tearDown(self):
+        frappe.cache().delete_value([RATE_LIMIT_KEY, CIRCUIT_KEY])
+
+    def test_token_bucket(self):
+        policy = CallPolicy(
+            rate_limit=1, burst=3, max_rate_limit_wait=0, circuit_failures=0
+        )
+        for i in range(3):
+            policy.acquire()
+
+        # the burst is spent and waiting for the next token is not allowed
+        with self.assertRaises(rest.ApiException) as context:
+            policy.acquire()
+        self.assertEqual(context.exception.status, 429)
+
+    def test_token_bucket_waits_for_a_token(self):
+        policy = CallPolicy(
+            rate_limit=10, burst=1, max_rate_limit_wait=1, circuit_failures=0
+        )
+        policy.acquire()
+        with patch(
+            "k8s_bench.utils.call_policy.time.sleep", wraps=time.sleep
+        ) as sleep:
+            policy.acquire()
+
+        # one token every 100ms at 10/s
+        self.assertGreater(sleep.call_args[0][0], 0)
+        self.assertLessEqual(sleep.call_args[0][0], 0.1)
+
+    def test_circuit_breaker(self):
+        policy = CallPolicy(rate_limit=0, circuit_failures=3, circuit_cooldown=1)
+        for i in range(3):
+            self.assertEqual(policy.acquire(), i)
+            policy.record_failure()
+
+        with self.assertRaises(rest.ApiException) as context:
+            policy.acquire()
+        self.assertEqual(context.exception.status, 503)
+
+        # after the cooldown one call probes, the others keep failing fast
+        time.sleep(1.1)
+        failures = policy.acquire()
+        self.assertEqual(failures, 3)
+        with self.assertRaises(rest.ApiException):
+            policy.acquire()
+
+        # the probe succeeded, the breaker closes
+        policy.record_success(failures)
+        self.assertEqual(policy.acquire(), 0)
+
+    def test_disabled(self):
+        policy = CallPolicy(rate_limit=0, circuit_failures=0)
+        for i in range(10):
+            self.assertEqual(policy.acquire(), 0)
+            policy.record_failure()
+        # nothing was counted against the shared breaker
+        self.assertEqual(CallPolicy(rate_limit=0).acquire(), 0)
+
+    def test_attempts(self):
+        policy = CallPolicy(read_retries=2)
+        self.assertEqual(policy.get_attempts("GET"), 3)
+        self.assertEqual(policy.get_attempts("get"), 3)
+        self.assertEqual(policy.get_attempts("GET", watch=True), 1)
+        self.assertEqual(policy.get_attempts("POST"), 1)
+        self.assertEqual(policy.get_attempts("PATCH"), 1)
+
+    def test_backoff(self):
+        policy = CallPolicy()
+        for attempt in range(10):
+            self.assertLessEqual(policy.get_backoff(attempt), 5)
+        self.assertGreaterEqual(policy.get_backoff(0, retry_after=2), 2)
+
+    def test_transient_errors(self):
+        for status in (0, 429, 500, 503):
+            self.assertTrue(is_transient(rest.ApiException(status=status)))
+        for status in (400, 404, 409, 422):
+            self.assertFalse(is_transient(rest.ApiException(status=status)))
+        self.assertTrue(is_transient(ConnectionError()))
+
+    def test_retry_after(self):
+        e = rest.ApiException(status=429)
+        self.assertIsNone(get_retry_after(e))
+        e.headers = {"Retry-After": "3"}
+        self.assertEqual(get_retry_after(e), 3)
@@ -0,0 +1,146 @@
+import unittest
+from collections import Counter
+
+from k8s_bench.tests.fake_cluster import fake_cluster
+from k8s_bench.utils.concurrency import run_concurrently
+from k8s_bench.utils.ingress import (
+    add_site_to_shard,
+    get_rule_hosts,
+    get_shard_candidates,
+    get_shard_names,
+    read_shard,
+    remove_site_from_shard,
+    remove_sites_from_shards,
+    repoint_shards,
+    set_site_shard_service,
+)
+from k8s_bench.utils.settings import make_snapshot
+
+SITES = [f"site-{i}.test" for i in range(300)]
+
+
+def get_settings(shards):
+    return make_snapshot({"ingress_shards": shards, "version": "test"})
+
+
+class TestShardRing(unittest.TestCase):
+    def test_candidates(self):
+        k8s_settings = get_settings(4)
+        candidates = get_shard_candidates(k8s_settings, "a.test")
+        self.assertEqual(sorted(candidates), sorted(get_shard_names(k8s_settings)))
+        self.assertEqual(candidates, get_shard_candidates(k8s_settings, "a.test"))
+
+    def test_balance(self):
+        k8s_settings = get_settings(4)
+        owners = Counter(get_shard_candidates(k8s_settings, s)[0] for s in SITES)
+        self.assertEqual(len(owners), 4)
+        # 64 virtual nodes a shard keep every shard near its share of 75
+        self.assertTrue(all(30 <= count <= 120 for count in owners.values()))
+
+    def test_adding_a_shard_moves_few_sites(self):
+        before = get_settings(4)
+        after = get_settings(5)
+        moved = [
+            site_name
+            for site_name in SITES
+            if get_shard_candidates(before, site_name)[0]
+            != get_shard_candidates(after, site_name)[0]
+        ]
+        # only sites taken over by the new shard move
+        new_shard = get_shard_names(after)[-1]
+        self.assertTrue(
+            all(get_shard_candidates(after, s)[0] == new_shard for s in moved)
+        )
+        self.assertLess(len(moved), len(SITES) / 2)
+
+
+class TestShardPatches(unittest.TestCase):
+    def test_add_repoint_remove(self):
+        site_names = SITES[:40]
+        with fake_cluster(
+            ingress_shards=3, ingress_shard_max_rules=1000
+        ) as k8s_settings:
+            run_concurrently(
+                lambda site_name: add_site_to_shard(k8s_settings, site_name),
+                site_names,
+            )
+            hosts = self.get_hosts(k8s_settings)
+            self.assertEqual(sorted(hosts), sorted(site_names))
+            # adding again leaves a single rule
+            add_site_to_shard(k8s_settings, site_names[0])
+            self.assertEqual(len(self.get_hosts(k8s_settings)), len(site_names))
+
+            set_site_shard_service(k8s_settings, site_names[0], "other-service")
+            self.assertEqual(
+                self.get_services(k8s_settings)[site_names[0]], "other-service"
+            )
+
+            results = repoint_shards(k8s_settings)
+            self.assertEqual(
+                sorted(site for patched, errors in results for site in patched),
+                sorted(site_names),
+            )
+            self.assertEqual(
+                set(self.get_services(k8s_settings).values()),
+                {k8s_settings.service_name},
+            )
+
+            remove_site_from_shard(k8s_settings, site_names[0])
+            removed = remove_sites_from_shards(
+                k8s_settings, site_names[1:30] + ["missing.test"]
+            )
+            self.assertEqual(removed["missing.test"].status, 404)
+            self.assertFalse(
+                [
+                    site_name
+                    for site_name in site_names[1:30]
+                    if isinstance(removed[site_name], Exception)
+                ]
+            )
+            self.assertEqual(
+                sorted(self.get_hosts(k8s_settings)), sorted(site_names[30:])
+            )
+
+            # emptied shards are deleted, an Ingress without rules is invalid
+            remove_sites_from_shards(k8s_settings, site_names[30:])
+            self.assertEqual(self.get_hosts(k8s_settings), [])
+            self.assertTrue(
+                all(
+                    read_shard(k8s_settings, shard) is None
+                    for shard in get_shard_names(k8s_settings)
+                )
+            )
+
+    def test_concurrent_removals(self):
+        site_names = SITES[:60]
+        with fake_cluster(
+            ingress_shards=2, ingress_shard_max_rules=1000
+        ) as k8s_settings:
+            for site_name in site_names:
+                add_site_to_shard(k8s_settings, site_name)
+
+            # single site removals of the same shard conflict and retry
+            run_concurrently(
+                lambda site_name: remove_site_from_shard(k8s_settings, site_name),
+                site_names[:50],
+                10,
+            )
+            self.assertEqual(
+                sorted(self.get_hosts(k8s_settings)), sorted(site_names[50:])
+            )
+
+    def get_hosts(self, k8s_settings):
+        hosts = []
+        for shard in get_shard_names(k8s_settings):
+            ingress = read_shard(k8s_settings, shard)
+            if ingress:
+                hosts.extend(get_rule_hosts(ingress))
+        return hosts
+
+    def get_services(self, k8s_settings):
+        services = {}
+        for shard in get_shard_names(k8s_settings):
+            ingress = read_shard(k8s_settings, shard)
+            for rule in (ingress.spec.rules if ingress else None) or []:
+                services[rule.host] = rule.http.paths[0].backend.service_name
+        return services
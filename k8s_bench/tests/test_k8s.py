@@ -0,0 +1,44 @@
+import unittest
+
+from k8s_bench.utils.k8s import get_site_label_value, parse_fields, project
+
+JOB = {
+    "metadata": {"name": "upgrade-a", "labels": {"k8s-bench/site": "a.test"}},
+    "status": {"active": 1, "succeeded": None, "conditions": []},
+}
+
+
+class TestStatusProjection(unittest.TestCase):
+    def test_parse_fields(self):
+        self.assertIsNone(parse_fields(None))
+        self.assertIsNone(parse_fields(""))
+        self.assertEqual(
+            parse_fields(" status.active, metadata.name ,"),
+            [["status", "active"], ["metadata", "name"]],
+        )
+        self.assertEqual(parse_fields(["status"]), [["status"]])
+
+    def test_project(self):
+        self.assertIs(project(JOB, None), JOB)
+        self.assertEqual(
+            project(JOB, parse_fields("status.active,metadata.name")),
+            {"status": {"active": 1}, "metadata": {"name": "upgrade-a"}},
+        )
+        # falsy values are kept, missing paths are left out
+        self.assertEqual(
+            project(JOB, parse_fields("status.succeeded,status.missing,spec.x")),
+            {"status": {"succeeded": None}},
+        )
+        self.assertEqual(project(JOB, parse_fields("metadata.name.x")), {})
+
+
+class TestSiteLabelValue(unittest.TestCase):
+    def test_valid_site_name(self):
+        self.assertEqual(get_site_label_value("a.example.com"), "a.example.com")
+
+    def test_invalid_site_name(self):
+        for site_name in ("x" * 64, "-a.test", "a.test-", "a b.test"):
+            value = get_site_label_value(site_name)
+            self.assertEqual(len(value), 40)
+            self.assertRegex(value, r"^[0-9a-f]+$")
+            self.assertEqual(value, get_site_label_value(site_name))
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+
+import frappe
+from k8s_bench.utils.metrics import (
+    JOBS_CREATED,
+    JOBS_FAILED,
+    REJECTED_RATE_LIMITED,
+    get_metrics_key,
+    inc_jobs,
+    inc_rejected,
+    observe_call,
+    render_metrics,
+    track_in_flight,
+)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        frappe.cache().delete(get_metrics_key())
+
+    def tearDown(self):
+        frappe.cache().delete(get_metrics_key())
+
+    @patch("frappe.get_conf", return_value=frappe._dict())
+    def test_render_metrics(self, get_conf):
+        for duration in (0.003, 0.2):
+            track_in_flight("GET /pods", 1)
+            observe_call("GET /pods", 200, duration)
+        track_in_flight("GET /pods", 1)
+        inc_jobs(JOBS_CREATED, 3)
+        inc_jobs(JOBS_FAILED)
+        inc_rejected(REJECTED_RATE_LIMITED)
+
+        lines = render_metrics().splitlines()
+        name = "k8s_bench_api_request_duration_seconds"
+        labels = 'operation="GET /pods"'
+        self.assertIn(f'{name}_bucket{{{labels},le="0.005"}} 1', lines)
+        self.assertIn(f'{name}_bucket{{{labels},le="0.25"}} 2', lines)
+        self.assertIn(f'{name}_bucket{{{labels},le="+Inf"}} 2', lines)
+        self.assertIn(f"{name}_count{{{labels}}} 2", lines)
+        self.assertIn(
+            'k8s_bench_api_requests_total{operation="GET /pods",status="200"} 2', lines
+        )
+        self.assertIn(
+            'k8s_bench_api_requests_in_flight{operation="GET /pods"} 1', lines
+        )
+        self.assertIn(
+            'k8s_bench_api_requests_rejected_total{reason="rate_limited"} 1', lines
+        )
+        self.assertIn('k8s_bench_jobs_total{event="created"} 3', lines)
+        self.assertIn('k8s_bench_jobs_total{event="succeeded"} 0', lines)
+        self.assertIn('k8s_bench_jobs_total{event="failed"} 1', lines)
+        self.assertIn("k8s_bench_warm_pool_target_sites 0", lines)
@@ -0,0 +1,43 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+from k8s_bench.utils.provision import install_site
+
+
+def new_site(db_name, site, db_type=None, no_mariadb_socket=False, **kwargs):
+    # frappe.installer._new_site exits without a db_type and for
+    # no_mariadb_socket on postgres
+    if not db_type:
+        sys.exit(1)
+    if no_mariadb_socket and db_type != "mariadb":
+        sys.exit(1)
+
+
+class TestInstallSite(unittest.TestCase):
+    def test_install_site(self):
+        steps = []
+        with patch(
+            "frappe.installer._new_site", side_effect=new_site
+        ) as _new_site, patch("frappe.installer.install_app") as install_app:
+            install_site(
+                "provision.test", ["frappe", "erpnext"], {"root_password": "x"}, steps
+            )
+
+        self.assertEqual(_new_site.call_args[1]["db_type"], "mariadb")
+        self.assertTrue(_new_site.call_args[1]["no_mariadb_socket"])
+        self.assertEqual(_new_site.call_args[1]["mariadb_root_username"], "root")
+        install_app.assert_called_once_with("erpnext", set_as_patched=True)
+        self.assertEqual(
+            [step["step"] for step in steps], ["new_site", "install_app erpnext"]
+        )
+        self.assertFalse([step for step in steps if "error" in step])
+
+    def test_install_site_db_type_from_conf(self):
+        with patch(
+            "frappe.installer._new_site", side_effect=new_site
+        ) as _new_site, patch("frappe.installer.install_app"):
+            install_site("provision.test", [], {"db_type": "postgres"}, [])
+
+        self.assertEqual(_new_site.call_args[1]["db_type"], "postgres")
+        self.assertFalse(_new_site.call_args[1]["no_mariadb_socket"])
@@ -0,0 +1,94 @@
+import contextlib
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+from k8s_bench.utils.site_template import (
+    FILES_FILE,
+    SITE_TEMPLATE_KEY,
+    SiteTemplateError,
+    get_site_template,
+    get_template_key,
+    restore_site_template,
+    use_site_template,
+)
+
+VERSIONS = {"frappe": "13.0.0+abc123"}
+
+
+class TestSiteTemplate(unittest.TestCase):
+    def test_use_site_template(self):
+        self.assertTrue(use_site_template("1", {}))
+        self.assertFalse(use_site_template("0", {"k8s_site_template": 1}))
+        self.assertTrue(use_site_template(None, {"k8s_site_template": 1}))
+        self.assertFalse(use_site_template("", {}))
+
+    def test_template_key_follows_versions(self):
+        self.assertEqual(get_template_key(VERSIONS), get_template_key(dict(VERSIONS)))
+        self.assertNotEqual(
+            get_template_key(VERSIONS), get_template_key({"frappe": "13.0.1+def456"})
+        )
+
+    def test_build_failure_raises(self):
+        steps = []
+        with patch(
+            "k8s_bench.utils.site_template.get_app_versions", return_value=VERSIONS
+        ), patch(
+            "k8s_bench.utils.site_template.switch_site", contextlib.nullcontext
+        ), patch(
+            "k8s_bench.utils.site_template.drop_template_site"
+        ), patch(
+            "frappe.installer._new_site", side_effect=SystemExit(1)
+        ), patch(
+            "frappe.log_error"
+        ):
+            with self.assertRaises(SiteTemplateError):
+                get_site_template([], {}, steps, template=1)
+
+        self.assertEqual(steps[0]["step"], "build_template")
+        self.assertIn("error", steps[0])
+        lock_key = f"{SITE_TEMPLATE_KEY}|{get_template_key(VERSIONS)}"
+        self.assertIsNone(frappe.cache().get(frappe.cache().make_key(lock_key)))
+
+    def test_restore_makes_site_dirs(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        template_path = os.path.join(path, "template")
+        os.makedirs(os.path.join(template_path, "public", "files"))
+        with tarfile.open(os.path.join(template_path, FILES_FILE), "w") as tar:
+            tar.add(os.path.join(template_path, "public"), "public")
+
+        site_path = frappe.local.site_path
+        self.addCleanup(setattr, frappe.local, "site_path", site_path)
+
+        def init(site, sites_path):
+            # frappe.init is a no-op once the test site is initialised
+            frappe.local.site_path = os.path.join(sites_path, site)
+
+        steps = []
+        with patch("frappe.init", side_effect=init), patch(
+            "k8s_bench.utils.site_template.run_root_sql"
+        ), patch(
+            "k8s_bench.utils.site_template.run_pipeline"
+        ), patch(
+            "frappe.connect"
+        ), patch(
+            "frappe.utils.password.update_password"
+        ), patch(
+            "frappe.db", MagicMock()
+        ), patch(
+            "frappe.clear_cache"
+        ):
+            restore_site_template("a.local", path, template_path, {}, steps)
+
+        self.assertEqual(
+            [step["step"] for step in steps],
+            ["create_database", "restore_template", "rewrite_site_settings"],
+        )
+        site_path = os.path.join(path, "a.local")
+        for folder in ("logs", "locks", "task-logs", "private/backups", "public/files"):
+            self.assertTrue(os.path.isdir(os.path.join(site_path, folder)), folder)
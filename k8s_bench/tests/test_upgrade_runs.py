@@ -0,0 +1,18 @@
+import unittest
+
+from k8s_bench.utils.upgrade_runs import get_percentile
+
+
+class TestPercentile(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(get_percentile(values, 50), 50)
+        self.assertEqual(get_percentile(values, 95), 95)
+        self.assertEqual(get_percentile(values, 100), 100)
+        self.assertEqual(get_percentile(values, 0), 1)
+
+    def test_few_values(self):
+        self.assertEqual(get_percentile([7], 95), 7)
+        self.assertEqual(get_percentile([1, 2], 50), 1)
+        self.assertEqual(get_percentile([1, 2], 51), 2)
+        self.assertEqual(get_percentile([1, 2, 3], 95), 3)
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import frappe
+from k8s_bench.utils.upgrade_scheduler import (
+    SCHEDULER_STATE_KEY,
+    get_db_host,
+    get_host_state,
+    update_host_state,
+)
+
+DB_HOST = "mariadb-test"
+
+
+class TestGetDbHost(unittest.TestCase):
+    def setUp(self):
+        self.sites_path = tempfile.mkdtemp()
+        self.conf = frappe._dict(k8s_base_sites_paths={"base-bench": self.sites_path})
+
+    def tearDown(self):
+        shutil.rmtree(self.sites_path)
+
+    def write_config(self, path, config):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as config_file:
+            json.dump(config, config_file)
+
+    def test_db_host_from_base_bench(self):
+        self.write_config(
+            os.path.join(self.sites_path, "a.test", "site_config.json"),
+            {"db_host": "mariadb-1"},
+        )
+        self.write_config(
+            os.path.join(self.sites_path, "common_site_config.json"),
+            {"db_host": "mariadb-0"},
+        )
+
+        with patch("frappe.get_conf", return_value=self.conf):
+            self.assertEqual(get_db_host("a.test", "base-bench"), "mariadb-1")
+            self.assertEqual(get_db_host("b.test", "base-bench"), "mariadb-0")
+
+    def test_db_host_not_found(self):
+        with patch("frappe.get_conf", return_value=self.conf):
+            self.assertIsNone(get_db_host("a.test", "base-bench"))
+            self.assertIsNone(get_db_host("a.test", "other-bench"))
+
+
+class TestHostLimit(unittest.TestCase):
+    def setUp(self):
+        frappe.cache().hdel(SCHEDULER_STATE_KEY, DB_HOST)
+        self.conf = patch(
+            "frappe.get_conf",
+            return_value=frappe._dict(k8s_upgrade_max_per_db_host=4),
+        )
+        self.conf.start()
+
+    def tearDown(self):
+        self.conf.stop()
+        frappe.cache().hdel(SCHEDULER_STATE_KEY, DB_HOST)
+
+    def get_limit(self):
+        return get_host_state(DB_HOST)["limit"]
+
+    def test_additive_increase(self):
+        self.assertEqual(self.get_limit(), 1)
+        limits = []
+        for i in range(20):
+            update_host_state(DB_HOST, 60, True)
+            limits.append(self.get_limit())
+
+        # one more slot per window of fast jobs, up to the configured cap
+        self.assertEqual(limits[0], 2)
+        self.assertEqual(limits, sorted(limits))
+        self.assertEqual(limits[-1], 4)
+
+    def test_failure_halves(self):
+        for i in range(10):
+            update_host_state(DB_HOST, 60, True)
+        limit = self.get_limit()
+
+        update_host_state(DB_HOST, 60, False)
+        self.assertEqual(self.get_limit(), limit / 2)
+        for i in range(5):
+            update_host_state(DB_HOST, 60, False)
+        self.assertEqual(self.get_limit(), 1)
+
+    def test_slowdown_halves(self):
+        for i in range(10):
+            update_host_state(DB_HOST, 60, True)
+        self.assertEqual(self.get_limit(), 4)
+
+        # jobs slowing down well past the host's baseline mean it is saturated
+        update_host_state(DB_HOST, 600, True)
+        self.assertEqual(self.get_limit(), 2)
+        # the baseline only drifts up slowly, one slow job does not reset it
+        self.assertAlmostEqual(get_host_state(DB_HOST)["baseline"], 60.6)
+
+    def test_limit_follows_cap(self):
+        for i in range(10):
+            update_host_state(DB_HOST, 60, True)
+        with patch(
+            "frappe.get_conf",
+            return_value=frappe._dict(k8s_upgrade_max_per_db_host=2),
+        ):
+            self.assertEqual(self.get_limit(), 2)
@@ -0,0 +1,179 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from k8s_bench.utils.constants import UPGRADE_SITE_SCRIPT
+
+
+def load_script():
+    # the script ships as a string into the upgrade pods, run it as a module here
+    namespace = {"__name__": "upgrade_site"}
+    exec(compile(UPGRADE_SITE_SCRIPT, "upgrade_site.py", "exec"), namespace)
+    return namespace
+
+
+class TestTransferDir(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.script = load_script()
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.src = os.path.join(self.path, "base", "files")
+        self.dst = os.path.join(self.path, "site", "files")
+        os.makedirs(self.src)
+        os.makedirs(os.path.dirname(self.dst))
+        os.makedirs(os.path.join(self.src, "nested"))
+        for name in ("a.txt", os.path.join("nested", "b.txt")):
+            with open(os.path.join(self.src, name), "w") as f:
+                f.write(name)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def get_strategy(self):
+        return self.script["get_transfer_strategy"](self.src, self.dst)
+
+    def transfer(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.script["transfer_dir"](self.src, self.dst)
+
+    def test_strategy(self):
+        self.assertEqual(self.get_strategy(), "rename")
+        os.makedirs(self.dst)
+        self.assertEqual(self.get_strategy(), "rename")
+        open(os.path.join(self.dst, "c.txt"), "w").close()
+        self.assertEqual(self.get_strategy(), "hardlink")
+
+    def test_strategy_across_devices(self):
+        stat = os.stat
+        src = self.src
+
+        def fake_stat(path, *args, **kwargs):
+            stat(path, *args, **kwargs)
+            return SimpleNamespace(st_dev=1 if path == src else 2)
+
+        with patch("os.stat", side_effect=fake_stat):
+            self.assertEqual(self.get_strategy(), "copy")
+
+    def test_strategy_from_env(self):
+        with patch.dict(os.environ, {"TRANSFER_STRATEGY": "COPY"}):
+            self.assertEqual(self.get_strategy(), "copy")
+
+    def test_rename(self):
+        self.assertIsNone(self.transfer())
+        self.assertFalse(os.path.exists(self.src))
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "nested", "b.txt")))
+
+    def test_hardlink(self):
+        os.makedirs(self.dst)
+        open(os.path.join(self.dst, "c.txt"), "w").close()
+
+        progress = self.transfer()
+        self.assertEqual((progress.files, progress.errors), (2, 0))
+        for name in ("a.txt", os.path.join("nested", "b.txt")):
+            self.assertTrue(
+                os.path.samefile(
+                    os.path.join(self.src, name), os.path.join(self.dst, name)
+                )
+            )
+
+        # a second run finds everything linked already
+        progress = self.transfer()
+        self.assertEqual(progress.skipped, 2)
+
+    def test_copy(self):
+        with patch.dict(os.environ, {"TRANSFER_STRATEGY": "copy"}):
+            progress = self.transfer()
+        self.assertEqual((progress.files, progress.errors), (2, 0))
+        self.assertFalse(
+            os.path.samefile(
+                os.path.join(self.src, "a.txt"), os.path.join(self.dst, "a.txt")
+            )
+        )
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.script = load_script()
+        self.results = []
+        self.script["upgrade_site"] = lambda from_bench_path, site_name: {
+            "site": site_name,
+            "status": "Failed" if site_name == "b.local" else "Succeeded",
+        }
+        self.script["write_termination_message"] = self.results.extend
+
+    def run_main(self, env):
+        env = dict(env, FROM_BENCH_PATH="/home/frappe/base")
+        with patch.dict(os.environ, env), contextlib.redirect_stdout(io.StringIO()):
+            self.script["main"]()
+
+    def test_failed_site_fails_the_pod(self):
+        with self.assertRaises(SystemExit) as context:
+            self.run_main({"SITE_NAMES": "a.local,b.local"})
+        self.assertEqual(context.exception.code, 1)
+        self.assertEqual(len(self.results), 2)
+
+    def test_failed_site_does_not_fail_the_shard(self):
+        # the other shards of the Indexed Job keep running
+        self.run_main(
+            {
+                "SITE_NAMES": "a.local,b.local,c.local",
+                "SITE_SHARDS": "2",
+                "JOB_COMPLETION_INDEX": "1",
+            }
+        )
+        self.assertEqual([r["site"] for r in self.results], ["b.local"])
+        self.assertEqual(self.results[0]["status"], "Failed")
+
+    def test_crashed_site_is_reported(self):
+        def upgrade_site(from_bench_path, site_name):
+            if site_name == "a.local":
+                raise FileNotFoundError("site_config.json")
+            return {"site": site_name, "status": "Succeeded"}
+
+        self.script["upgrade_site"] = upgrade_site
+        with self.assertRaises(SystemExit):
+            self.run_main({"SITE_NAMES": "a.local,c.local"})
+        self.assertEqual(
+            [(r["site"], r["status"]) for r in self.results],
+            [("a.local", "Failed"), ("c.local", "Succeeded")],
+        )
+
+
+class TestUpgradeSite(unittest.TestCase):
+    def setUp(self):
+        self.script = load_script()
+        self.path = tempfile.mkdtemp()
+        self.script["copy_site_stub_from_bench"] = lambda *args: None
+
+        def migrate_site(site_name):
+            raise RuntimeError("migrate failed")
+
+        self.script["migrate_site"] = migrate_site
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_failed_rollback_is_reported(self):
+        # no previous backup, max() of the empty backup list raises ValueError
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            result = self.script["upgrade_site"](self.path, "a.local")
+
+        self.assertEqual(result["status"], "Failed")
+        self.assertIn("migrate failed", result["error"])
+        phases = {phase["phase"]: phase["status"] for phase in result["phases"]}
+        self.assertEqual(
+            phases,
+            {
+                "copy_site_stub": "Succeeded",
+                "migrate": "Failed",
+                "restore_previous_db": "Failed",
+            },
+        )
+        self.assertIn("Rollback failed for a.local", stdout.getvalue())
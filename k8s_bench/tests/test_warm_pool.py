@@ -0,0 +1,59 @@
+import contextlib
+import unittest
+from unittest.mock import patch
+
+import frappe
+from k8s_bench.tests.test_provision import new_site
+from k8s_bench.utils.warm_pool import (
+    PLACEHOLDER_PREFIX,
+    REFILL_LOCK_KEY,
+    get_pool_key,
+    refill_warm_pool,
+)
+
+
+class TestRefillWarmPool(unittest.TestCase):
+    def setUp(self):
+        self.conf = frappe._dict(k8s_warm_pool_size=2, k8s_warm_pool_apps="")
+        self.pool_key = get_pool_key([])
+        frappe.cache().delete_value(self.pool_key)
+
+    def tearDown(self):
+        frappe.cache().delete_value(self.pool_key)
+
+    def refill(self, side_effect=new_site):
+        # switch_site would drop the test site, the installer is stubbed anyway
+        with patch("frappe.get_conf", return_value=self.conf), patch(
+            "k8s_bench.utils.warm_pool.switch_site", contextlib.nullcontext
+        ), patch(
+            "frappe.installer._new_site", side_effect=side_effect
+        ) as _new_site, patch(
+            "frappe.installer.install_app"
+        ):
+            refill_warm_pool()
+        return _new_site
+
+    def test_refill_warm_pool(self):
+        _new_site = self.refill()
+
+        sites = [
+            frappe.safe_decode(site)
+            for site in frappe.cache().lrange(self.pool_key, 0, -1)
+        ]
+        self.assertEqual(len(sites), 2)
+        self.assertTrue(all(site.startswith(PLACEHOLDER_PREFIX) for site in sites))
+        self.assertEqual(
+            sorted(call[0][1] for call in _new_site.call_args_list), sorted(sites)
+        )
+        self.assertIsNone(frappe.cache().get(frappe.cache().make_key(REFILL_LOCK_KEY)))
+
+    def test_refill_warm_pool_install_failed(self):
+        def failing_new_site(*args, **kwargs):
+            raise Exception("database host unreachable")
+
+        _new_site = self.refill(failing_new_site)
+
+        # a broken install stops the refill instead of looping on it
+        self.assertEqual(_new_site.call_count, 1)
+        self.assertEqual(frappe.cache().llen(self.pool_key), 0)
+        self.assertIsNone(frappe.cache().get(frappe.cache().make_key(REFILL_LOCK_KEY)))
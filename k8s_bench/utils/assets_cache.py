@@ -0,0 +1,201 @@
+import datetime
+import hashlib
+import json
+
+import frappe
+from k8s_bench.utils.concurrency import get_error_summary
+from k8s_bench.utils.constants import (
+    ASSETS_CACHE,
+    ASSETS_CACHE_LABELS,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_SUCCEEDED,
+    POPULATE_ASSETS,
+)
+from k8s_bench.utils.kube_client import client, get_api, rest
+from k8s_bench.utils.settings import NOT_SET, UPGRADE_JOB_FIELDS, get_k8s_settings
+
+ASSETS_CACHE_KEY = "k8s_bench_assets_cache"
+ASSETS_CACHE_MOUNT = "/assets-cache"
+# a tag can be moved, its cache is populated again from a fresh pull after this long
+ASSETS_CACHE_TTL = 3600
+
+
+def is_pinned(image):
+    return "@sha256:" in image
+
+
+def get_assets_cache_key(image):
+    # a pinned digest names the cache, a tag is hashed and should be pinned instead
+    if is_pinned(image):
+        return image.split("@sha256:", 1)[1]
+    return hashlib.sha256(image.encode()).hexdigest()
+
+
+def get_ready_key(cache_key):
+    return f"{ASSETS_CACHE_KEY}|{cache_key}"
+
+
+def get_populate_assets_job_name(cache_key):
+    return f"{POPULATE_ASSETS}-{cache_key[:12]}"
+
+
+def get_ready_assets_cache(k8s_settings):
+    # cache directory for the upgrade pods, None keeps the init container
+    if not k8s_settings.assets_cache_pvc_name:
+        return None
+
+    cache_key = get_assets_cache_key(k8s_settings.nginx_image)
+    if frappe.cache().get_value(get_ready_key(cache_key)) == JOB_SUCCEEDED:
+        return cache_key
+
+    try:
+        phase = ensure_assets_cache(k8s_settings, cache_key)
+    except Exception as e:
+        # fleet submits run in worker threads without a db connection for log_error
+        frappe.logger("k8s_bench").error(
+            json.dumps(
+                {
+                    "title": "Exception: get_ready_assets_cache",
+                    "error": get_error_summary(e),
+                    "params": {"cache_key": cache_key},
+                }
+            )
+        )
+        return None
+
+    return cache_key if phase == JOB_SUCCEEDED else None
+
+
+def ensure_assets_cache(k8s_settings, cache_key):
+    from k8s_bench.utils.k8s import get_job_phase, to_dict
+
+    batch_v1_api = get_api(client.BatchV1Api)
+    job_name = get_populate_assets_job_name(cache_key)
+    try:
+        job = batch_v1_api.read_namespaced_job(job_name, k8s_settings.namespace)
+    except rest.ApiException as e:
+        if e.status != 404:
+            raise
+        try:
+            batch_v1_api.create_namespaced_job(
+                k8s_settings.namespace,
+                get_populate_assets_job_body(k8s_settings, job_name, cache_key),
+            )
+        except rest.ApiException as e:
+            # started concurrently by another worker
+            if e.status != 409:
+                raise
+        return JOB_PENDING
+
+    phase = get_job_phase(to_dict(job.status))
+    if phase == JOB_SUCCEEDED and is_stale(k8s_settings.nginx_image, job):
+        # the tag may point at another image by now, the next call populates again
+        batch_v1_api.delete_namespaced_job(
+            job_name, k8s_settings.namespace, propagation_policy="Background"
+        )
+        return JOB_PENDING
+
+    if phase == JOB_SUCCEEDED:
+        frappe.cache().set_value(
+            get_ready_key(cache_key), JOB_SUCCEEDED, expires_in_sec=ASSETS_CACHE_TTL
+        )
+    elif phase == JOB_FAILED:
+        # the next call starts over with a fresh Job
+        batch_v1_api.delete_namespaced_job(
+            job_name, k8s_settings.namespace, propagation_policy="Background"
+        )
+    return phase
+
+
+def is_stale(image, job):
+    completion_time = job.status.completion_time
+    if is_pinned(image) or not completion_time:
+        return False
+    age = datetime.datetime.now(datetime.timezone.utc) - completion_time
+    return age.total_seconds() > ASSETS_CACHE_TTL
+
+
+def get_populate_assets_job_body(k8s_settings, job_name, cache_key):
+    target = f"{ASSETS_CACHE_MOUNT}/{cache_key}"
+    # a tag is pulled again, the node may still hold the image it used to name
+    pull_policy = None if is_pinned(k8s_settings.nginx_image) else "Always"
+
+    body = client.V1Job(api_version="batch/v1", kind="Job")
+    body.metadata = client.V1ObjectMeta(
+        namespace=k8s_settings.namespace,
+        name=job_name,
+        labels=dict(ASSETS_CACHE_LABELS),
+    )
+    body.status = client.V1JobStatus()
+    body.spec = client.V1JobSpec(
+        backoff_limit=2,
+        template=client.V1PodTemplateSpec(
+            spec=client.V1PodSpec(
+                security_context=client.V1PodSecurityContext(
+                    supplemental_groups=[1000]
+                ),
+                containers=[
+                    client.V1Container(
+                        name=POPULATE_ASSETS,
+                        image=k8s_settings.nginx_image,
+                        image_pull_policy=pull_policy,
+                        command=["/bin/bash", "-c"],
+                        # populate aside and rename, readers never see a partial tree
+                        args=[
+                            f"rm -rf {target}.partial && mkdir -p {target}.partial"
+                            f" && rsync -a /var/www/html/assets/frappe {target}.partial/"
+                            f" && rm -rf {target} && mv {target}.partial {target}"
+                        ],
+                        volume_mounts=[
+                            client.V1VolumeMount(
+                                name=ASSETS_CACHE, mount_path=ASSETS_CACHE_MOUNT
+                            ),
+                        ],
+                    )
+                ],
+                restart_policy="Never",
+                volumes=[
+                    client.V1Volume(
+                        name=ASSETS_CACHE,
+                        persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
+                            claim_name=k8s_settings.assets_cache_pvc_name,
+                            read_only=False,
+                        ),
+                    ),
+                ],
+            )
+        ),
+    )
+    return body
+
+
+def populate_assets_cache():
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(UPGRADE_JOB_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    if not k8s_settings.assets_cache_pvc_name:
+        frappe.local.response["http_status_code"] = 501
+        return {"assets_cache_pvc_name": NOT_SET}
+
+    cache_key = get_assets_cache_key(k8s_settings.nginx_image)
+    try:
+        phase = ensure_assets_cache(k8s_settings, cache_key)
+    except (rest.ApiException, Exception) as e:
+        status_code = getattr(e, "status", 500)
+        out = {"error": e, "params": {"nginx_image": k8s_settings.nginx_image}}
+        reason = getattr(e, "reason", None)
+        if reason:
+            out["reason"] = reason
+        frappe.log_error(out, "Exception: BatchV1Api->create_namespaced_job")
+        frappe.local.response["http_status_code"] = status_code
+        return out
+
+    return {
+        "cache_key": cache_key,
+        "job_name": get_populate_assets_job_name(cache_key),
+        "phase": phase,
+    }
@@ -0,0 +1,257 @@
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+from k8s_bench.utils.call_policy import CallPolicy
+from k8s_bench.utils.fake_apiserver import FakeApiServer
+from k8s_bench.utils.k8s import (
+    create_site_ingress,
+    create_upgrade_job,
+    delete_site_resources,
+    get_job_status,
+    get_upgrade_job_name,
+    patch_ingress,
+    read_ingress,
+)
+from k8s_bench.utils.kube_client import client, manager
+from k8s_bench.utils.settings import override_k8s_settings
+from k8s_bench.utils.upgrade_runs import get_percentile
+
+BENCHMARK_PVC = "k8s-bench-benchmark-base"
+BENCHMARK_SETTINGS = {
+    "namespace": "k8s-bench-benchmark",
+    "nginx_image": "k8s-bench/nginx:benchmark",
+    "python_image": "k8s-bench/python:benchmark",
+    "cert_manager_cluster_issuer": "k8s-bench-benchmark",
+    "pvc_name": "k8s-bench-benchmark-sites",
+    "service_name": "k8s-bench-benchmark",
+    "wildcard_domain": "benchmark.k8s-bench.local",
+    "wildcard_tls_secret_name": "k8s-bench-benchmark-tls",
+}
+
+# runs in a fresh interpreter per sample, imports argv in order
+IMPORT_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+for module in sys.argv[1:]:
+    __import__(module)
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "kubernetes_loaded": "kubernetes.client" in sys.modules,
+}))
+"""
+K8S_BENCH_MODULES = [
+    "k8s_bench.hooks",
+    "k8s_bench.commands",
+    "k8s_bench.services.kube",
+    "k8s_bench.services.bench",
+]
+IMPORT_SCENARIOS = {
+    "frappe": ["frappe"],
+    "frappe + k8s_bench": ["frappe"] + K8S_BENCH_MODULES,
+    "frappe + k8s_bench + kubernetes.client": ["frappe"]
+    + K8S_BENCH_MODULES
+    + ["kubernetes.client"],
+}
+
+# in the order a site goes through them, each step needs the previous ones
+OPERATIONS = {
+    "create_upgrade_job": lambda site_name: create_upgrade_job(
+        site_name, BENCHMARK_PVC
+    ),
+    "create_site_ingress": create_site_ingress,
+    "patch_ingress": patch_ingress,
+    "read_ingress": lambda site_name: read_ingress(site_name, fresh=True),
+    "get_job_status": lambda site_name: get_job_status(
+        get_upgrade_job_name(site_name)
+    ),
+    "delete_site_resources": delete_site_resources,
+}
+
+
+def run_benchmark(
+    requests=200,
+    concurrency=10,
+    latency=0.0,
+    jitter=0.0,
+    error_rate=0.0,
+    ingress_shards=0,
+    ingress_shard_max_rules=None,
+    operations=None,
+    trace_memory=False,
+):
+    operations = operations or list(OPERATIONS)
+    site_names = [
+        f"site-{i}.{BENCHMARK_SETTINGS['wildcard_domain']}" for i in range(requests)
+    ]
+    settings = dict(
+        BENCHMARK_SETTINGS,
+        ingress_shards=ingress_shards,
+        ingress_shard_max_rules=ingress_shard_max_rules,
+    )
+
+    if trace_memory:
+        tracemalloc.start()
+
+    from k8s_bench.utils.instrumented_client import InstrumentedApiClient
+
+    results = {}
+    with FakeApiServer(latency, jitter, error_rate) as server:
+        configuration = client.Configuration()
+        configuration.host = server.url
+        configuration.connection_pool_maxsize = concurrency
+        # the shared rate limit and breaker would throttle the run and let injected
+        # errors trip the real apiserver's circuit, timeouts and retries stay on
+        api_client = InstrumentedApiClient(
+            configuration=configuration,
+            policy=CallPolicy.from_conf(rate_limit=0, circuit_failures=0),
+        )
+
+        with override_k8s_settings(settings), manager.pin(api_client):
+            for operation in operations:
+                results[operation] = run_operation(
+                    OPERATIONS[operation], site_names, concurrency
+                )
+        api_client.rest_client.pool_manager.clear()
+
+    memory = {"max_rss_mib": round(get_max_rss() / 1024 / 1024, 2)}
+    if trace_memory:
+        memory["traced_peak_mib"] = round(
+            tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2
+        )
+        tracemalloc.stop()
+
+    return {
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "ingress_shards": ingress_shards,
+        },
+        "operations": results,
+        "memory": memory,
+    }
+
+
+def run_operation(func, site_names, concurrency):
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+    local = threading.local()
+
+    # one site context per worker thread and no db connection, so failed calls
+    # cannot leave Error Logs behind, the timings cover only func
+    def call(site_name):
+        if not getattr(local, "initialized", False):
+            frappe.init(site=site, sites_path=sites_path)
+            local.initialized = True
+
+        frappe.local.response.pop("http_status_code", None)
+        start = time.perf_counter()
+        try:
+            failed = is_failed(func(site_name))
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = list(executor.map(call, site_names))
+    elapsed = time.perf_counter() - start
+
+    durations = sorted(duration for duration, failed in timings)
+    return {
+        "requests": len(timings),
+        "errors": sum(1 for duration, failed in timings if failed),
+        "elapsed": round(elapsed, 3),
+        "throughput": round(len(timings) / max(elapsed, 1e-9), 2),
+        "p50_ms": get_percentile_ms(durations, 50),
+        "p95_ms": get_percentile_ms(durations, 95),
+        "p99_ms": get_percentile_ms(durations, 99),
+        "max_ms": round(durations[-1] * 1000, 3) if durations else None,
+    }
+
+
+def is_failed(out):
+    status_code = frappe.local.response.get("http_status_code")
+    if status_code and int(status_code) >= 400:
+        return True
+    # delete reports per resource errors in the body
+    return isinstance(out, dict) and any(key.endswith("_error") for key in out)
+
+
+def get_percentile_ms(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    return round(get_percentile(sorted_values, percentile) * 1000, 3)
+
+
+def get_max_rss():
+    # ru_maxrss is in KiB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_import_benchmark(repeat=5):
+    # what a gunicorn worker, rq worker or bench cli pays for loading k8s_bench
+    results = {}
+    for scenario, modules in IMPORT_SCENARIOS.items():
+        samples = [
+            json.loads(
+                subprocess.check_output([sys.executable, "-c", IMPORT_PROBE] + modules)
+            )
+            for _ in range(repeat)
+        ]
+        results[scenario] = {
+            "import_ms": round(
+                statistics.median(sample["seconds"] for sample in samples) * 1000, 1
+            ),
+            "max_rss_mib": round(
+                statistics.median(sample["max_rss"] for sample in samples)
+                / 1024
+                / 1024,
+                2,
+            ),
+            "kubernetes_loaded": samples[0]["kubernetes_loaded"],
+        }
+
+    baseline = results["frappe"]
+    for stats in results.values():
+        stats["import_ms_delta"] = round(stats["import_ms"] - baseline["import_ms"], 1)
+        stats["max_rss_mib_delta"] = round(
+            stats["max_rss_mib"] - baseline["max_rss_mib"], 2
+        )
+    return results
+
+
+def compare_results(results, baseline):
+    # relative change against an earlier run, positive throughput is better
+    comparison = {}
+    for operation, stats in results["operations"].items():
+        previous = baseline.get("operations", {}).get(operation)
+        if not previous:
+            continue
+        comparison[operation] = {
+            key: get_change(stats.get(key), previous.get(key))
+            for key in ("throughput", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return comparison
+
+
+def get_change(value, previous):
+    if not value or not previous:
+        return None
+    return f"{(value - previous) / previous * 100:+.1f}%"
+
+
+def load_results(path):
+    with open(path) as results_file:
+        return json.load(results_file)
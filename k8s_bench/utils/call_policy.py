@@ -0,0 +1,229 @@
+import random
+import time
+
+import frappe
+from k8s_bench.utils.kube_client import rest
+from k8s_bench.utils.metrics import (
+    REJECTED_CIRCUIT_OPEN,
+    REJECTED_RATE_LIMITED,
+    inc_rejected,
+)
+
+RATE_LIMIT_KEY = "k8s_bench_rate_limit"
+CIRCUIT_KEY = "k8s_bench_circuit"
+
+DEFAULT_RATE_LIMIT = 20
+DEFAULT_MAX_RATE_LIMIT_WAIT = 10
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_READ_RETRIES = 3
+DEFAULT_CIRCUIT_FAILURES = 5
+DEFAULT_CIRCUIT_COOLDOWN = 30
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 5
+
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# one round trip per call: the breaker check and a token from the shared bucket,
+# the redis clock keeps workers on different nodes in step
+ACQUIRE_SCRIPT = """
+redis.replicate_commands()
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local threshold = tonumber(ARGV[3])
+local cooldown = tonumber(ARGV[4])
+
+local failures = tonumber(redis.call('HGET', KEYS[2], 'failures') or '0')
+if threshold > 0 and failures >= threshold then
+    local open_until = tonumber(redis.call('HGET', KEYS[2], 'open_until') or '0')
+    if open_until > now then
+        return {-1, tostring(open_until - now), failures}
+    end
+    -- half open, this call probes while the others keep failing fast
+    redis.call('HSET', KEYS[2], 'open_until', tostring(now + cooldown))
+end
+
+if rate > 0 then
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or burst)
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or now)
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    if tokens < 1 then
+        redis.call(
+            'HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now)
+        )
+        return {0, tostring((1 - tokens) / rate), failures}
+    end
+    redis.call(
+        'HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'updated', tostring(now)
+    )
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+end
+return {1, '0', failures}
+"""
+
+FAILURE_SCRIPT = """
+redis.replicate_commands()
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local threshold = tonumber(ARGV[1])
+local cooldown = tonumber(ARGV[2])
+
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+if failures >= threshold then
+    redis.call('HSET', KEYS[1], 'open_until', tostring(now + cooldown))
+end
+redis.call('EXPIRE', KEYS[1], cooldown * 10)
+return failures
+"""
+
+# redis-py Script objects, registered once per process
+_scripts = {}
+
+
+class CallPolicy(object):
+    # timeouts, retries, the shared token bucket and the circuit breaker around
+    # every apiserver request, 0 disables the rate limit or the breaker
+    def __init__(
+        self,
+        rate_limit=DEFAULT_RATE_LIMIT,
+        burst=None,
+        max_rate_limit_wait=DEFAULT_MAX_RATE_LIMIT_WAIT,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        read_retries=DEFAULT_READ_RETRIES,
+        circuit_failures=DEFAULT_CIRCUIT_FAILURES,
+        circuit_cooldown=DEFAULT_CIRCUIT_COOLDOWN,
+    ):
+        self.rate_limit = float(rate_limit)
+        self.burst = float(burst or max(self.rate_limit * 2, 1))
+        self.max_rate_limit_wait = float(max_rate_limit_wait)
+        self.timeout = (float(connect_timeout), float(read_timeout))
+        self.read_retries = int(read_retries)
+        self.circuit_failures = int(circuit_failures)
+        self.circuit_cooldown = int(circuit_cooldown)
+
+    @classmethod
+    def from_conf(cls, **overrides):
+        conf = frappe.get_conf()
+        values = {
+            "rate_limit": conf.get("k8s_rate_limit", DEFAULT_RATE_LIMIT),
+            "burst": conf.get("k8s_rate_limit_burst"),
+            "max_rate_limit_wait": conf.get(
+                "k8s_max_rate_limit_wait", DEFAULT_MAX_RATE_LIMIT_WAIT
+            ),
+            "connect_timeout": conf.get(
+                "k8s_connect_timeout", DEFAULT_CONNECT_TIMEOUT
+            ),
+            "read_timeout": conf.get("k8s_read_timeout", DEFAULT_READ_TIMEOUT),
+            "read_retries": conf.get("k8s_read_retries", DEFAULT_READ_RETRIES),
+            "circuit_failures": conf.get(
+                "k8s_circuit_failures", DEFAULT_CIRCUIT_FAILURES
+            ),
+            "circuit_cooldown": conf.get(
+                "k8s_circuit_cooldown", DEFAULT_CIRCUIT_COOLDOWN
+            ),
+        }
+        values.update(overrides)
+        return cls(**values)
+
+    def get_attempts(self, method, watch=False):
+        # writes are not retried, a timed out create may still have gone through
+        if watch or method.upper() not in IDEMPOTENT_METHODS:
+            return 1
+        return self.read_retries + 1
+
+    def acquire(self):
+        # waits for a token, returns the breaker's failure count for release
+        if not self.rate_limit and not self.circuit_failures:
+            return 0
+
+        deadline = time.monotonic() + self.max_rate_limit_wait
+        while True:
+            try:
+                allowed, wait, failures = run_script(
+                    ACQUIRE_SCRIPT,
+                    [RATE_LIMIT_KEY, CIRCUIT_KEY],
+                    [
+                        self.rate_limit,
+                        self.burst,
+                        self.circuit_failures,
+                        self.circuit_cooldown,
+                    ],
+                )
+            except Exception:
+                # the limiter must not take the k8s calls down with redis
+                return 0
+
+            if allowed == 1:
+                return failures
+            if allowed == -1:
+                inc_rejected(REJECTED_CIRCUIT_OPEN)
+                raise rest.ApiException(
+                    status=503,
+                    reason=f"Kubernetes API circuit open, retry in {float(wait):.1f}s",
+                )
+
+            wait = float(wait)
+            if time.monotonic() + wait > deadline:
+                inc_rejected(REJECTED_RATE_LIMITED)
+                raise rest.ApiException(
+                    status=429, reason="Kubernetes API client rate limit exceeded"
+                )
+            time.sleep(wait)
+
+    def record_success(self, failures):
+        # only a breaker that saw failures needs the write
+        if not self.circuit_failures or not failures:
+            return
+        try:
+            frappe.cache().delete_value(CIRCUIT_KEY)
+        except Exception:
+            pass
+
+    def record_failure(self):
+        if not self.circuit_failures:
+            return
+        try:
+            run_script(
+                FAILURE_SCRIPT,
+                [CIRCUIT_KEY],
+                [self.circuit_failures, self.circuit_cooldown],
+            )
+        except Exception:
+            pass
+
+    def get_backoff(self, attempt, retry_after=None):
+        # full jitter, so retrying workers do not hit the apiserver in lockstep
+        backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        if retry_after:
+            backoff += min(retry_after, BACKOFF_CAP)
+        return backoff
+
+
+def run_script(script, keys, args):
+    cache = frappe.cache()
+    registered = _scripts.get(script)
+    if registered is None:
+        registered = _scripts[script] = cache.register_script(script)
+    return registered(
+        keys=[cache.make_key(key) for key in keys], args=args, client=cache
+    )
+
+
+def is_transient(e):
+    # throttling, 5xx and connection errors trip the breaker and are retried,
+    # any other 4xx means the apiserver is healthy
+    if isinstance(e, rest.ApiException):
+        return e.status in RETRY_STATUSES or e.status == 0
+    return True
+
+
+def get_retry_after(e):
+    headers = getattr(e, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+
+DEFAULT_PARALLELISM = 10
+MAX_PARALLELISM = 50
+
+
+def get_parallelism(parallelism=None):
+    conf = frappe.get_conf()
+    max_parallelism = int(conf.get("k8s_max_parallelism") or MAX_PARALLELISM)
+    parallelism = int(
+        parallelism or conf.get("k8s_parallelism") or DEFAULT_PARALLELISM
+    )
+    return max(1, min(parallelism, max_parallelism))
+
+
+def run_concurrently(func, items, parallelism=None):
+    items = list(items)
+    if not items:
+        return []
+
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+    max_workers = min(get_parallelism(parallelism), len(items))
+
+    # worker threads have no frappe.local, init the site for every call
+    def run(item):
+        frappe.init(site=site, sites_path=sites_path)
+        try:
+            return func(item)
+        finally:
+            frappe.destroy()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, items))
+
+
+def get_error_summary(e):
+    return {
+        "status": getattr(e, "status", 500),
+        "reason": getattr(e, "reason", None),
+        "error": repr(e),
+    }
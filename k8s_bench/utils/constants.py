@@ -4,7 +4,10 @@ import json
 import os
 import shutil
 import subprocess
-from distutils.dir_util import copy_tree
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import frappe
 from frappe.installer import update_site_config
@@ -12,6 +15,28 @@ from frappe.migrate import migrate
 
 FROM_BENCH_PATH = "FROM_BENCH_PATH"
 SITE_NAME = "SITE_NAME"
+SITE_NAMES = "SITE_NAMES"
+SITE_SHARDS = "SITE_SHARDS"
+JOB_COMPLETION_INDEX = "JOB_COMPLETION_INDEX"
+SHADOW_ROLLBACK = "SHADOW_ROLLBACK"
+DB_ROOT_USER = "DB_ROOT_USER"
+DB_ROOT_PASSWORD = "DB_ROOT_PASSWORD"
+SHADOW_SUFFIX = "__k8s_shadow"
+TRASH_SUFFIX = "__k8s_trash"
+TRANSFER_STRATEGY = "TRANSFER_STRATEGY"
+TRANSFER_THREADS = "TRANSFER_THREADS"
+AUTO = "auto"
+RENAME = "rename"
+HARDLINK = "hardlink"
+COPY = "copy"
+DEFAULT_TRANSFER_THREADS = 8
+PROGRESS_INTERVAL = 10
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+PHASE_EVENT = "k8s_bench_phase"
+SITE_EVENT = "k8s_bench_site"
+TERMINATION_MESSAGE_PATH = "/dev/termination-log"
+TERMINATION_MESSAGE_LIMIT = 4096
 MAINTENANCE_MODE = "maintenance_mode"
 PAUSE_SCHEDULER = "pause_scheduler"
 SITE_CONFIG_FILE = "site_config.json"
@@ -20,60 +45,183 @@ COMMON_SITE_CONFIG_FILE = "common_site_config.json"
 
 def main():
 	env = get_env()
-	from_site_config_path = os.path.join(
-		env.get(FROM_BENCH_PATH), env.get(SITE_NAME), SITE_CONFIG_FILE,
-	)
+	failed_sites = []
+	results = []
+
+	for site_name in get_site_names(env):
+		try:
+			result = upgrade_site(env.get(FROM_BENCH_PATH), site_name)
+		except (Exception, SystemExit) as exc:
+			# report the site and go on with the rest of the share
+			print(repr(exc))
+			result = report_site(site_name, False, [], exc)
+		results.append(result)
+		if result["status"] != SUCCEEDED:
+			failed_sites.append(site_name)
+
+	write_termination_message(results)
+
+	# a failed pod fails an Indexed Job with backoffLimit 0 and its running
+	# shards get killed mid migrate, every site is reported above already
+	if failed_sites and not env.get(JOB_COMPLETION_INDEX):
+		exit(1)
 
-	copy_site_stub_from_bench(
-		env.get(FROM_BENCH_PATH), env.get(SITE_NAME),
-	)
+
+def upgrade_site(from_bench_path, site_name):
+	phases = []
+	try:
+		with timed_phase(phases, site_name, "copy_site_stub"):
+			copy_site_stub_from_bench(from_bench_path, site_name)
+	except Exception as exc:
+		print(repr(exc))
+		return report_site(site_name, False, phases, exc)
+
+	shadow_db = None
+	if os.environ.get(SHADOW_ROLLBACK):
+		with timed_phase(phases, site_name, "create_shadow_schema") as record:
+			shadow_db = create_shadow_schema(site_name, record)
 
 	try:
-		migrate_site(env.get(SITE_NAME))
+		with timed_phase(phases, site_name, "migrate"):
+			migrate_site(site_name)
 
 		# on successful migration, move skipped files
-		copy_user_files(env.get(FROM_BENCH_PATH), env.get(SITE_NAME))
+		with timed_phase(phases, site_name, "copy_user_files") as record:
+			copy_user_files(from_bench_path, site_name, record)
+
+		if shadow_db:
+			with timed_phase(phases, site_name, "drop_shadow_schema"):
+				drop_shadow_schema(site_name, shadow_db)
 
 		# delete site_name from_bench_path
-		delete_site_dir(os.path.join(env.get(FROM_BENCH_PATH), env.get(SITE_NAME),))
+		with timed_phase(phases, site_name, "delete_site_dir"):
+			delete_site_dir(os.path.join(from_bench_path, site_name,))
 
-		unset_maintenance_mode(os.path.join(".", env.get(SITE_NAME), SITE_CONFIG_FILE))
+		unset_maintenance_mode(os.path.join(".", site_name, SITE_CONFIG_FILE))
 
 		frappe.destroy()
+	except SystemExit as exc:
+		# copying or deleting user files failed after migration, nothing to restore
+		frappe.destroy()
+		if shadow_db:
+			drop_shadow_schema(site_name, shadow_db)
+		return report_site(site_name, False, phases, exc)
 	except Exception as exc:
-
-		# if failed migration, retore from previous backup
-		restore_previous_db(env)
-
-		# delete site_name directory from new bench
-		delete_site_dir(os.path.join(".", env.get(SITE_NAME),))
+		# release the connection, its metadata locks would block the rollback
+		frappe.destroy()
+		try:
+			# if failed migration, swap the shadow tables back or retore from previous backup
+			restored = False
+			if shadow_db:
+				with timed_phase(phases, site_name, "restore_shadow_schema") as record:
+					restored = restore_shadow_schema(site_name, shadow_db, record)
+			if not restored:
+				with timed_phase(phases, site_name, "restore_previous_db") as record:
+					restore_previous_db(from_bench_path, site_name, record)
+
+			# delete site_name directory from new bench
+			with timed_phase(phases, site_name, "delete_site_dir"):
+				delete_site_dir(os.path.join(".", site_name,))
+
+			unset_maintenance_mode(
+				os.path.join(from_bench_path, site_name, SITE_CONFIG_FILE,)
+			)
+		except (Exception, SystemExit) as rollback_exc:
+			# e.g. no previous backup or a missing site_config.json
+			print(f"Rollback failed for {site_name}: {rollback_exc!r}")
 
 		# log error
 		print(repr(exc))
-		unset_maintenance_mode(
-			os.path.join(env.get(FROM_BENCH_PATH), env.get(SITE_NAME), SITE_CONFIG_FILE,)
+		return report_site(site_name, False, phases, exc)
+
+	return report_site(site_name, True, phases)
+
+
+@contextmanager
+def timed_phase(phases, site_name, phase):
+	# one json line per phase, collected into Upgrade Run by k8s_bench
+	record = {"phase": phase}
+	start = time.monotonic()
+	try:
+		yield record
+		record["status"] = SUCCEEDED
+	except BaseException as exc:
+		record["status"] = FAILED
+		record["error"] = repr(exc)
+		raise
+	finally:
+		record["duration"] = round(time.monotonic() - start, 3)
+		phases.append(record)
+		print(json.dumps(dict(record, event=PHASE_EVENT, site=site_name)))
+
+
+def report_site(site_name, succeeded, phases, exc=None):
+	result = {
+		"event": SITE_EVENT,
+		"site": site_name,
+		"status": SUCCEEDED if succeeded else FAILED,
+		"duration": round(sum(phase["duration"] for phase in phases), 3),
+		"phases": phases,
+	}
+	if exc is not None:
+		result["error"] = repr(exc)
+	print(json.dumps(result))
+	return result
+
+
+def write_termination_message(results):
+	# the kubelet keeps at most 4096 bytes, the pod log has the full records
+	message = json.dumps(results, separators=(",", ":"))
+	if len(message) > TERMINATION_MESSAGE_LIMIT:
+		message = json.dumps(
+			[{"site": result["site"], "status": result["status"]} for result in results],
+			separators=(",", ":"),
 		)
-		frappe.destroy()
-		exit(1)
+	if len(message) > TERMINATION_MESSAGE_LIMIT:
+		message = json.dumps({"truncated": True})
+
+	try:
+		with open(TERMINATION_MESSAGE_PATH, "w") as termination_log:
+			termination_log.write(message)
+	except OSError as exc:
+		print(repr(exc))
 
 
 def get_env():
 	env = {
 		f"{FROM_BENCH_PATH}": os.environ.get(FROM_BENCH_PATH),
 		f"{SITE_NAME}": os.environ.get(SITE_NAME),
+		f"{SITE_NAMES}": os.environ.get(SITE_NAMES),
+		f"{SITE_SHARDS}": os.environ.get(SITE_SHARDS),
+		f"{JOB_COMPLETION_INDEX}": os.environ.get(JOB_COMPLETION_INDEX),
 	}
 
 	if not env.get(FROM_BENCH_PATH):
 		print(f"environment variable {FROM_BENCH_PATH} not set")
 		exit(1)
 
-	if not env.get(SITE_NAME):
-		print(f"environment variable {SITE_NAME} not set")
+	if not env.get(SITE_NAME) and not env.get(SITE_NAMES):
+		print(f"environment variable {SITE_NAME} or {SITE_NAMES} not set")
 		exit(1)
 
 	return env
 
 
+def get_site_names(env):
+	if not env.get(SITE_NAMES):
+		return [env.get(SITE_NAME)]
+
+	site_names = [site.strip() for site in env.get(SITE_NAMES).split(",") if site.strip()]
+
+	# Indexed Job, every completion index upgrades its own share of sites
+	if env.get(JOB_COMPLETION_INDEX) and env.get(SITE_SHARDS):
+		index = int(env.get(JOB_COMPLETION_INDEX))
+		shards = int(env.get(SITE_SHARDS))
+		site_names = site_names[index::shards]
+
+	return site_names
+
+
 def set_maintenance_mode(site_config_path):
 	print(f"Set Maintenance Mode for {site_config_path}")
 	update_site_config(
@@ -113,22 +261,135 @@ def migrate_site(site):
 	migrate()
 
 
-def copy_user_files(from_bench_path, site_name):
+def copy_user_files(from_bench_path, site_name, record=None):
+	record = record if record is not None else {}
 	try:
-		print("Copying private and public directories for site")
-		copy_tree(
-			os.path.join(from_bench_path, site_name, "private"),
-			os.path.join(".", site_name, "private"),
-		)
-		copy_tree(
-			os.path.join(from_bench_path, site_name, "public"),
-			os.path.join(".", site_name, "public"),
-		)
+		print("Moving private and public directories for site")
+		for folder in ("private", "public"):
+			progress = transfer_dir(
+				os.path.join(from_bench_path, site_name, folder),
+				os.path.join(".", site_name, folder),
+			)
+			if progress:
+				record["bytes"] = record.get("bytes", 0) + progress.bytes
+				record["files"] = record.get("files", 0) + progress.files
 	except Exception as exc:
 		print(repr(exc))
 		exit(1)
 
 
+def transfer_dir(src, dst):
+	if not os.path.exists(src):
+		return None
+
+	strategy = get_transfer_strategy(src, dst)
+	print(f"Transferring {src} to {dst} using {strategy}")
+
+	if strategy == RENAME:
+		try:
+			# an empty destination directory is replaced in place
+			os.rename(src, dst)
+			print(f"Renamed {src} to {dst}")
+			return None
+		except OSError as exc:
+			print(f"Rename failed, falling back to {HARDLINK}: {exc!r}")
+			strategy = HARDLINK
+
+	progress = TransferProgress(src)
+	threads = int(os.environ.get(TRANSFER_THREADS) or DEFAULT_TRANSFER_THREADS)
+	with ThreadPoolExecutor(max_workers=threads) as executor:
+		for src_path, dst_path in walk_files(src, dst):
+			executor.submit(transfer_file, src_path, dst_path, strategy, progress)
+	progress.report(final=True)
+
+	if progress.errors:
+		raise Exception(f"{progress.errors} files failed to transfer from {src}")
+
+	return progress
+
+
+def get_transfer_strategy(src, dst):
+	strategy = (os.environ.get(TRANSFER_STRATEGY) or AUTO).lower()
+	if strategy != AUTO:
+		return strategy
+
+	dst_parent = os.path.dirname(os.path.abspath(dst))
+	if os.stat(src).st_dev != os.stat(dst_parent).st_dev:
+		return COPY
+	if not os.path.exists(dst) or not os.listdir(dst):
+		return RENAME
+	return HARDLINK
+
+
+def walk_files(src, dst):
+	for root, dirs, files in os.walk(src):
+		target = os.path.join(dst, os.path.relpath(root, src))
+		os.makedirs(target, exist_ok=True)
+		for file_name in files:
+			yield os.path.join(root, file_name), os.path.join(target, file_name)
+
+
+def transfer_file(src_path, dst_path, strategy, progress):
+	try:
+		src_stat = os.stat(src_path)
+		if os.path.exists(dst_path):
+			dst_stat = os.stat(dst_path)
+			# linked or copied by an earlier attempt
+			if os.path.samefile(src_path, dst_path) or (
+				dst_stat.st_size == src_stat.st_size
+				and int(dst_stat.st_mtime) == int(src_stat.st_mtime)
+			):
+				progress.add(0, skipped=True)
+				return
+			os.remove(dst_path)
+
+		if strategy == HARDLINK:
+			try:
+				os.link(src_path, dst_path)
+				progress.add(src_stat.st_size)
+				return
+			except OSError:
+				pass
+
+		shutil.copy2(src_path, dst_path)
+		progress.add(src_stat.st_size)
+	except Exception as exc:
+		print(f"Failed to transfer {src_path}: {exc!r}")
+		progress.add(0, error=True)
+
+
+class TransferProgress:
+	def __init__(self, src):
+		self.src = src
+		self.files = 0
+		self.skipped = 0
+		self.errors = 0
+		self.bytes = 0
+		self.start = time.monotonic()
+		self.last_report = self.start
+		self.lock = threading.Lock()
+
+	def add(self, size, skipped=False, error=False):
+		with self.lock:
+			self.files += 1
+			self.bytes += size
+			self.skipped += skipped
+			self.errors += error
+			if time.monotonic() - self.last_report >= PROGRESS_INTERVAL:
+				self.report()
+
+	def report(self, final=False):
+		now = time.monotonic()
+		self.last_report = now
+		duration = max(now - self.start, 0.001)
+		print(
+			f"{'Transferred' if final else 'Transferring'} {self.src}:"
+			f" {self.files} files, {self.skipped} skipped, {self.errors} failed,"
+			f" {self.bytes} bytes in {duration:.2f}s"
+			f" ({self.bytes / duration / 1024 / 1024:.2f} MiB/s)"
+		)
+
+
 def delete_site_dir(site_dir):
 	try:
 		print(f"Deleting {site_dir}")
@@ -138,44 +399,18 @@ def delete_site_dir(site_dir):
 		exit(1)
 
 
-def restore_previous_db(env):
+def restore_previous_db(from_bench_path, site_name, record=None):
 	print("Restoring old DB")
-	versions = None
-	latest_backup_gz = max(
-		glob.iglob(
-			os.path.join(
-				env.get(FROM_BENCH_PATH),
-				env.get(SITE_NAME),
-				"private",
-				"backups",
-				"*-database.sql.gz",
-			)
-		),
+	backups_path = os.path.join(from_bench_path, site_name, "private", "backups")
+	latest_backup = max(
+		glob.glob(os.path.join(backups_path, "*-database.sql.gz"))
+		+ glob.glob(os.path.join(backups_path, "*-database.sql.zst")),
 		key=os.path.getctime,
 	)
-	latest_backup = latest_backup_gz.replace(".gz", "")
-
-	config = get_config()
-	site_config = get_site_config(env.get(SITE_NAME))
-
-	db_host = site_config.get("db_host", config.get("db_host"))
-	db_port = site_config.get("db_port", config.get("db_port", 3306))
-	db_name = site_config.get("db_name")
-	db_password = site_config.get("db_password")
 
-	command = ["gunzip", "-c", latest_backup_gz]
-
-	with open(latest_backup, "w") as db_file:
-		print("Extract Database GZip for site {}".format(env.get(SITE_NAME)))
-		run_command(command, stdout=db_file)
-
-	mysql_command = [
-		"mysql",
-		f"-u{db_name}",
-		f"-h{db_host}",
-		f"-p{db_password}",
-		f"-P{db_port}",
-	]
+	db_config = get_db_config(site_name)
+	db_name = db_config.get("db_name")
+	mysql_command = get_mysql_command(db_config, db_name, db_config.get("db_password"))
 
 	# drop db if exists for clean restore
 	drop_database = mysql_command + ["-e", f"DROP DATABASE IF EXISTS `{db_name}`;"]
@@ -186,11 +421,190 @@ def restore_previous_db(env):
 	run_command(create_database)
 
 	print("Restoring MariaDB")
-	with open(latest_backup, "r") as db_file:
-		run_command(mysql_command + [f"{db_name}"], stdin=db_file)
+	start = time.monotonic()
+	run_pipeline(get_decompress_command(latest_backup), mysql_command + [f"{db_name}"])
+	duration = time.monotonic() - start
+
+	size = os.path.getsize(latest_backup)
+	if record is not None:
+		record["bytes"] = size
+	print(
+		f"Restored {size} compressed bytes for {site_name} in {duration:.2f}s"
+		f" ({size / max(duration, 0.001) / 1024 / 1024:.2f} MiB/s)"
+	)
+
+
+def create_shadow_schema(site_name, record=None):
+	# copy every table into a sibling schema, a failed migrate swaps them back
+	root_command = get_root_mysql_command(site_name)
+	if not root_command:
+		print(f"{DB_ROOT_PASSWORD} not set, skipping shadow schema for {site_name}")
+		return None
+
+	db_name = get_db_config(site_name).get("db_name")
+	shadow_db = f"{db_name}{SHADOW_SUFFIX}"
+
+	print(f"Copying {db_name} into shadow schema {shadow_db}")
+	start = time.monotonic()
+	statements = [
+		"SET SESSION foreign_key_checks = 0;",
+		f"DROP DATABASE IF EXISTS `{shadow_db}`;",
+		f"CREATE DATABASE `{shadow_db}`;",
+	]
+	try:
+		# listing the tables is the first root login, it fails like the copy does
+		for table in get_tables(root_command, db_name):
+			statements.append(f"CREATE TABLE `{shadow_db}`.`{table}` LIKE `{db_name}`.`{table}`;")
+			statements.append(
+				f"INSERT INTO `{shadow_db}`.`{table}` SELECT * FROM `{db_name}`.`{table}`;"
+			)
+		run_sql(root_command, " ".join(statements))
+	except (Exception, SystemExit):
+		print(f"Shadow schema failed for {site_name}, rollback falls back to the backup")
+		return None
+
+	print(f"Shadow schema for {site_name} in {time.monotonic() - start:.2f}s")
+	if record is not None:
+		record["rows"] = get_row_count(root_command, shadow_db)
+	return shadow_db
+
+
+def restore_shadow_schema(site_name, shadow_db, record=None):
+	root_command = get_root_mysql_command(site_name)
+	if not root_command:
+		return False
+
+	db_name = get_db_config(site_name).get("db_name")
+	trash_db = f"{db_name}{TRASH_SUFFIX}"
+	if record is not None:
+		record["rows"] = get_row_count(root_command, shadow_db)
+
+	print(f"Restoring {db_name} from shadow schema {shadow_db}")
+	start = time.monotonic()
+	try:
+		# a single RENAME TABLE is atomic and only touches metadata
+		renames = [
+			f"`{db_name}`.`{table}` TO `{trash_db}`.`{table}`"
+			for table in get_tables(root_command, db_name)
+		] + [
+			f"`{shadow_db}`.`{table}` TO `{db_name}`.`{table}`"
+			for table in get_tables(root_command, shadow_db)
+		]
+		run_sql(
+			root_command,
+			" ".join(
+				[
+					f"DROP DATABASE IF EXISTS `{trash_db}`;",
+					f"CREATE DATABASE `{trash_db}`;",
+					f"RENAME TABLE {', '.join(renames)};",
+					f"DROP DATABASE `{trash_db}`;",
+					f"DROP DATABASE `{shadow_db}`;",
+				]
+			),
+		)
+	except SystemExit:
+		print(f"Shadow rollback failed for {site_name}")
+		return False
+
+	print(f"Restored {site_name} from shadow schema in {time.monotonic() - start:.2f}s")
+	return True
+
+
+def drop_shadow_schema(site_name, shadow_db):
+	try:
+		run_sql(get_root_mysql_command(site_name), f"DROP DATABASE IF EXISTS `{shadow_db}`;")
+	except SystemExit:
+		print(f"Could not drop shadow schema {shadow_db}")
+
+
+def get_tables(mysql_command, db_name):
+	out = run_sql(
+		mysql_command + ["-N", "-B"],
+		"SELECT table_name FROM information_schema.tables"
+		f" WHERE table_schema = '{db_name}' AND table_type = 'BASE TABLE';",
+	)
+	return [table for table in out.decode().splitlines() if table]
 
-	if os.path.isfile(latest_backup):
-		os.remove(latest_backup)
+
+def get_row_count(mysql_command, db_name):
+	# estimated by InnoDB, good enough to weigh the phase timings
+	try:
+		out = run_sql(
+			mysql_command + ["-N", "-B"],
+			"SELECT COALESCE(SUM(table_rows), 0) FROM information_schema.tables"
+			f" WHERE table_schema = '{db_name}';",
+		)
+		return int(out.decode().strip() or 0)
+	except (SystemExit, ValueError):
+		return None
+
+
+def get_db_config(site_name):
+	config = get_config()
+	site_config = get_site_config(site_name)
+	return {
+		"db_host": site_config.get("db_host", config.get("db_host")),
+		"db_port": site_config.get("db_port", config.get("db_port", 3306)),
+		"db_name": site_config.get("db_name"),
+		"db_password": site_config.get("db_password"),
+		"root_login": config.get("root_login", "root"),
+		"root_password": config.get("root_password"),
+	}
+
+
+def get_mysql_command(db_config, user, password):
+	return [
+		"mysql",
+		f"-u{user}",
+		f"-h{db_config.get('db_host')}",
+		f"-p{password}",
+		f"-P{db_config.get('db_port')}",
+	]
+
+
+def get_root_mysql_command(site_name):
+	# the site user cannot create schemas, the shadow copy needs root
+	db_config = get_db_config(site_name)
+	root_password = os.environ.get(DB_ROOT_PASSWORD) or db_config.get("root_password")
+	if not root_password:
+		return None
+	root_login = os.environ.get(DB_ROOT_USER) or db_config.get("root_login")
+	return get_mysql_command(db_config, root_login, root_password)
+
+
+def get_decompress_command(backup_path):
+	# stream decompression straight into mysql, no extracted .sql on the PVC
+	if backup_path.endswith(".zst"):
+		return ["zstd", "-dc", "-T0", backup_path]
+	if shutil.which("pigz"):
+		return ["pigz", "-dc", backup_path]
+	return ["gunzip", "-c", backup_path]
+
+
+def run_pipeline(source_command, sink_command):
+	source = subprocess.Popen(
+		source_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+	)
+	sink = subprocess.Popen(
+		sink_command, stdin=source.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+	)
+	# let the source get SIGPIPE if the sink exits early
+	source.stdout.close()
+	out, error = sink.communicate()
+	source_error = source.stderr.read()
+	source.wait()
+
+	for command, process, stdout, stderr in (
+		(source_command, source, b"", source_error),
+		(sink_command, sink, out, error),
+	):
+		if process.returncode:
+			print("Something went wrong:")
+			print(f"command: {command[0]}")
+			print(f"return code: {process.returncode}")
+			print(f"stdout:\\n{stdout}")
+			print(f"\\nstderr:\\n{stderr}")
+			exit(process.returncode)
 
 
 def run_command(command, stdout=None, stdin=None, stderr=None):
@@ -202,9 +616,23 @@ def run_command(command, stdout=None, stdin=None, stderr=None):
 	if process.returncode:
 		print("Something went wrong:")
 		print(f"return code: {process.returncode}")
-		print(f"stdout:\n{out}")
-		print(f"\nstderr:\n{error}")
+		print(f"stdout:\\n{out}")
+		print(f"\\nstderr:\\n{error}")
+		exit(process.returncode)
+
+
+def run_sql(command, sql):
+	# statements go through stdin, a large schema would overflow the argument list
+	process = subprocess.Popen(
+		command, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+	)
+	out, error = process.communicate(sql.encode())
+	if process.returncode:
+		print("Something went wrong:")
+		print(f"return code: {process.returncode}")
+		print(f"stderr:\\n{error}")
 		exit(process.returncode)
+	return out
 
 
 def get_config():
@@ -237,3 +665,36 @@ BASE_SITES_DIR = "base-sites-dir"
 
 UPGRADE_SITE = "upgrade-site"
 ASSETS_CACHE = "assets-cache"
+POPULATE_ASSETS = "populate-assets"
+PRE_PULL_IMAGES = "pre-pull-images"
+PAUSE_IMAGE = "registry.k8s.io/pause:3.9"
+
+MANAGED_BY_LABEL = "app.kubernetes.io/managed-by"
+COMPONENT_LABEL = "app.kubernetes.io/component"
+MANAGED_BY = "k8s-bench"
+FLEET_UPGRADE_LABEL = "k8s-bench/fleet-upgrade"
+INGRESS_SHARD_LABEL = "k8s-bench/ingress-shard"
+PRE_PULL_LABEL = "k8s-bench/pre-pull"
+BENCH_ANNOTATION = "k8s-bench/bench"
+BASE_BENCH_ANNOTATION = "k8s-bench/base-bench"
+SITE_LABEL = "k8s-bench/site"
+UPGRADE_REQUEST_LABEL = "k8s-bench/upgrade-request"
+
+UPGRADE_JOB_LABELS = {MANAGED_BY_LABEL: MANAGED_BY, COMPONENT_LABEL: "upgrade-site"}
+UPGRADE_JOB_SELECTOR = ",".join(f"{k}={v}" for k, v in UPGRADE_JOB_LABELS.items())
+SITE_INGRESS_LABELS = {MANAGED_BY_LABEL: MANAGED_BY, COMPONENT_LABEL: "site-ingress"}
+SITE_INGRESS_SELECTOR = ",".join(
+    f"{k}={v}" for k, v in SITE_INGRESS_LABELS.items()
+)
+ASSETS_CACHE_LABELS = {MANAGED_BY_LABEL: MANAGED_BY, COMPONENT_LABEL: "populate-assets"}
+PRE_PULL_LABELS = {MANAGED_BY_LABEL: MANAGED_BY, COMPONENT_LABEL: "pre-pull-images"}
+PRE_PULL_SELECTOR = ",".join(f"{k}={v}" for k, v in PRE_PULL_LABELS.items())
+
+JOB_PENDING = "Pending"
+JOB_ACTIVE = "Active"
+JOB_SUCCEEDED = "Succeeded"
+JOB_FAILED = "Failed"
+JOB_STATUS_EVENT = "k8s_bench_job_status"
+UPGRADE_SITES = "upgrade-sites"
+SITE_INGRESS_SHARD = "k8s-bench-sites"
+UPGRADE_SITE_EVENT = "k8s_bench_site"
@@ -0,0 +1,255 @@
+import copy
+import datetime
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RESOURCE_PATH = re.compile(
+    r"^/apis/(?P<group>batch/v1|networking\.k8s\.io/v1beta1)"
+    r"/namespaces/(?P<namespace>[^/]+)/(?P<kind>jobs|ingresses)"
+    r"(?:/(?P<name>[^/]+))?(?:/status)?$"
+)
+POD_PATH = re.compile(r"^/api/v1/namespaces/(?P<namespace>[^/]+)/pods$")
+LIST_KINDS = {"jobs": "JobList", "ingresses": "IngressList"}
+
+
+class PatchError(Exception):
+    pass
+
+
+class FakeApiServer(object):
+    # in memory stand-in for the Job and Ingress endpoints k8s_bench calls
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, host="127.0.0.1"):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.objects = {}
+        self.resource_version = 0
+        self.lock = threading.Lock()
+        self.process = None
+
+        self.server = ThreadingHTTPServer((host, 0), FakeApiHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        # a separate process keeps the server off the GIL of the code under test
+        self.process = multiprocessing.Process(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.process.start()
+        self.server.socket.close()
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, method, path, body):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.error_rate and random.random() < self.error_rate:
+            return get_status(500, "InternalError", "injected error")
+
+        url = urlparse(path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if POD_PATH.match(url.path):
+            return 200, {"kind": "PodList", "apiVersion": "v1", "items": []}
+
+        match = RESOURCE_PATH.match(url.path)
+        if not match:
+            return get_status(404, "NotFound", f"{url.path} not served")
+
+        kind, namespace, name = match.group("kind", "namespace", "name")
+        with self.lock:
+            if name is None:
+                return self.handle_collection(method, kind, namespace, params, body)
+            return self.handle_object(method, kind, namespace, name, body)
+
+    def handle_collection(self, method, kind, namespace, params, body):
+        selected = [
+            key
+            for key, obj in self.objects.items()
+            if key[:2] == (kind, namespace)
+            and match_labels(obj, params.get("labelSelector"))
+        ]
+
+        if method == "GET":
+            return 200, {
+                "kind": LIST_KINDS[kind],
+                "metadata": {"resourceVersion": str(self.resource_version)},
+                "items": [self.objects[key] for key in selected],
+            }
+
+        if method == "POST":
+            name = body.get("metadata", {}).get("name")
+            if (kind, namespace, name) in self.objects:
+                return get_status(409, "AlreadyExists", f"{name} already exists")
+            body["metadata"].update(
+                uid=str(uuid.uuid4()),
+                creationTimestamp=datetime.datetime.utcnow().isoformat() + "Z",
+            )
+            if kind == "jobs":
+                body["status"] = {
+                    "active": 1,
+                    "startTime": body["metadata"]["creationTimestamp"],
+                }
+            return 201, self.save(kind, namespace, name, body)
+
+        if method == "DELETE":
+            for key in selected:
+                del self.objects[key]
+            return get_status(200, "", f"{len(selected)} deleted", "Success")
+
+        return get_status(405, "MethodNotAllowed", method)
+
+    def handle_object(self, method, kind, namespace, name, body):
+        key = (kind, namespace, name)
+        obj = self.objects.get(key)
+        if obj is None:
+            return get_status(404, "NotFound", f"{kind} {name} not found")
+
+        if method == "GET":
+            return 200, obj
+
+        if method == "DELETE":
+            del self.objects[key]
+            return get_status(200, "", f"{name} deleted", "Success")
+
+        if method == "PATCH":
+            patched = copy.deepcopy(obj)
+            try:
+                if isinstance(body, list):
+                    apply_json_patch(patched, body)
+                else:
+                    merge_patch(patched, body)
+            except PatchError as e:
+                return get_status(422, "Invalid", str(e))
+            return 200, self.save(kind, namespace, name, patched)
+
+        return get_status(405, "MethodNotAllowed", method)
+
+    def save(self, kind, namespace, name, obj):
+        self.resource_version += 1
+        obj["metadata"]["resourceVersion"] = str(self.resource_version)
+        self.objects[(kind, namespace, name)] = obj
+        return obj
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond()
+
+    def do_PATCH(self):
+        self.respond()
+
+    def do_DELETE(self):
+        self.respond()
+
+    def respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"null") if length else None
+        status, out = self.server.fake.handle(self.command, self.path, body)
+
+        payload = json.dumps(out).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def get_status(code, reason, message, status="Failure"):
+    return code, {
+        "kind": "Status",
+        "apiVersion": "v1",
+        "status": status,
+        "reason": reason,
+        "message": message,
+        "code": code,
+    }
+
+
+def match_labels(obj, label_selector):
+    if not label_selector:
+        return True
+    labels = obj.get("metadata", {}).get("labels") or {}
+    for requirement in label_selector.split(","):
+        key, _, value = requirement.partition("=")
+        if labels.get(key) != value:
+            return False
+    return True
+
+
+def apply_json_patch(obj, operations):
+    for operation in operations:
+        parts = [
+            part.replace("~1", "/").replace("~0", "~")
+            for part in operation["path"].lstrip("/").split("/")
+        ]
+        try:
+            parent = obj
+            for part in parts[:-1]:
+                parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+
+            key = parts[-1]
+            if isinstance(parent, list):
+                key = len(parent) if key == "-" else int(key)
+
+            op = operation["op"]
+            if op == "test":
+                if parent[key] != operation["value"]:
+                    raise PatchError(f"test failed at {operation['path']}")
+            elif op == "replace":
+                # replace requires an existing target
+                parent[key]
+                parent[key] = operation["value"]
+            elif op == "add":
+                if isinstance(parent, list):
+                    parent.insert(key, operation["value"])
+                else:
+                    parent[key] = operation["value"]
+            elif op == "remove":
+                del parent[key]
+            else:
+                raise PatchError(f"unsupported op {op}")
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            raise PatchError(f"invalid path {operation['path']}: {e!r}")
+
+
+def merge_patch(obj, patch):
+    for key, value in (patch or {}).items():
+        if value is None:
+            obj.pop(key, None)
+        elif isinstance(value, dict) and isinstance(obj.get(key), dict):
+            merge_patch(obj[key], value)
+        else:
+            obj[key] = value
@@ -0,0 +1,238 @@
+import frappe
+from k8s_bench.utils.concurrency import (
+    get_error_summary,
+    get_parallelism,
+    run_concurrently,
+)
+from k8s_bench.utils.constants import FLEET_UPGRADE_LABEL
+from k8s_bench.utils.k8s import (
+    get_job_phase,
+    submit_batch_upgrade_job,
+    submit_upgrade_job,
+    to_dict,
+)
+from k8s_bench.utils.kube_client import client, get_api
+from k8s_bench.utils.pre_pull import wait_for_pre_pull
+from k8s_bench.utils.resource_cache import JOBS, get_cached_objects
+from k8s_bench.utils.settings import (
+    NAMESPACE_FIELDS,
+    NOT_SET,
+    UPGRADE_JOB_FIELDS,
+    get_k8s_settings,
+)
+
+FLEET_UPGRADE_CACHE_KEY = "k8s_bench_fleet_upgrade"
+FLEET_UPGRADE_EXPIRY = 7 * 24 * 60 * 60
+
+FLEET_QUEUED = "Queued"
+FLEET_PRE_PULLING = "Pre Pulling"
+FLEET_SUBMITTING = "Submitting"
+FLEET_SUBMITTED = "Submitted"
+
+
+def get_site_names(sites=None, filters=None):
+    if sites:
+        if isinstance(sites, str):
+            if sites.strip().startswith("["):
+                sites = frappe.parse_json(sites)
+            else:
+                sites = sites.split(",")
+        return [site.strip() for site in sites if site and site.strip()]
+
+    if filters:
+        return frappe.get_all("Site", filters=frappe.parse_json(filters), pluck="name")
+
+    return []
+
+
+def start_fleet_upgrade(
+    base_pvc_name,
+    sites=None,
+    filters=None,
+    parallelism=None,
+    batch_size=None,
+    batch_parallelism=None,
+    pre_pull=False,
+):
+    site_names = get_site_names(sites, filters)
+    if not base_pvc_name or not site_names:
+        frappe.local.response["http_status_code"] = 400
+        return {
+            "base_pvc_name": base_pvc_name or NOT_SET,
+            "sites": site_names or NOT_SET,
+        }
+
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(UPGRADE_JOB_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    fleet_upgrade_id = frappe.generate_hash(length=10)
+    fleet_upgrade = {
+        "fleet_upgrade_id": fleet_upgrade_id,
+        "base_pvc_name": base_pvc_name,
+        "parallelism": get_parallelism(parallelism),
+        "batch_size": int(batch_size or 0),
+        "batch_parallelism": int(batch_parallelism or 1),
+        "pre_pull": bool(pre_pull),
+        "status": FLEET_QUEUED,
+        "sites": site_names,
+        "jobs": {},
+        "errors": {},
+    }
+    set_fleet_upgrade(fleet_upgrade)
+
+    frappe.enqueue(
+        "k8s_bench.utils.fleet.run_fleet_upgrade",
+        queue="long",
+        timeout=3600,
+        fleet_upgrade_id=fleet_upgrade_id,
+    )
+
+    frappe.local.response["http_status_code"] = 202
+    return {
+        "fleet_upgrade_id": fleet_upgrade_id,
+        "sites": len(site_names),
+        "parallelism": fleet_upgrade["parallelism"],
+    }
+
+
+def run_fleet_upgrade(fleet_upgrade_id):
+    fleet_upgrade = get_fleet_upgrade(fleet_upgrade_id)
+    if not fleet_upgrade:
+        return
+
+    k8s_settings = get_k8s_settings()
+    base_pvc_name = fleet_upgrade.get("base_pvc_name")
+    labels = {FLEET_UPGRADE_LABEL: fleet_upgrade_id}
+
+    if fleet_upgrade.get("pre_pull"):
+        # no Job should wait on an image pull once the wave starts
+        fleet_upgrade["status"] = FLEET_PRE_PULLING
+        set_fleet_upgrade(fleet_upgrade)
+        try:
+            state = wait_for_pre_pull(k8s_settings)
+            fleet_upgrade["pre_pull"] = {
+                key: state[key] for key in ("desired", "ready", "complete")
+            }
+        except Exception as e:
+            fleet_upgrade["pre_pull"] = get_error_summary(e)
+
+    fleet_upgrade["status"] = FLEET_SUBMITTING
+    set_fleet_upgrade(fleet_upgrade)
+
+    batch_size = fleet_upgrade.get("batch_size")
+    if batch_size:
+        # one Job per batch, the upgrade script migrates the batch in one process
+        batches = [
+            fleet_upgrade["sites"][i : i + batch_size]
+            for i in range(0, len(fleet_upgrade["sites"]), batch_size)
+        ]
+    else:
+        batches = [[site_name] for site_name in fleet_upgrade["sites"]]
+
+    def submit(batch):
+        try:
+            if batch_size:
+                job_name = submit_batch_upgrade_job(
+                    k8s_settings,
+                    batch,
+                    base_pvc_name,
+                    fleet_upgrade.get("batch_parallelism"),
+                    labels,
+                )
+            else:
+                job_name = submit_upgrade_job(
+                    k8s_settings, batch[0], base_pvc_name, labels
+                )
+            return job_name, None
+        except Exception as e:
+            return None, get_error_summary(e)
+
+    results = run_concurrently(submit, batches, fleet_upgrade.get("parallelism"))
+
+    for batch, (job_name, error) in zip(batches, results):
+        for site_name in batch:
+            if error:
+                fleet_upgrade["errors"][site_name] = error
+            else:
+                fleet_upgrade["jobs"][site_name] = job_name
+
+    fleet_upgrade["status"] = FLEET_SUBMITTED
+    set_fleet_upgrade(fleet_upgrade)
+
+    if fleet_upgrade["errors"]:
+        frappe.log_error(
+            {"fleet_upgrade_id": fleet_upgrade_id, "errors": fleet_upgrade["errors"]},
+            "Exception: run_fleet_upgrade - BatchV1Api->create_namespaced_job",
+        )
+
+
+def get_fleet_upgrade_status(fleet_upgrade_id):
+    fleet_upgrade = get_fleet_upgrade(fleet_upgrade_id)
+    if not fleet_upgrade:
+        frappe.local.response["http_status_code"] = 404
+        return {"fleet_upgrade_id": fleet_upgrade_id}
+
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(NAMESPACE_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    jobs = get_cached_objects(JOBS, k8s_settings.namespace)
+    if jobs is not None:
+        job_phases = {
+            name: get_job_phase(job.get("status"))
+            for name, job in jobs.items()
+            if job.get("metadata", {}).get("labels", {}).get(FLEET_UPGRADE_LABEL)
+            == fleet_upgrade_id
+        }
+    else:
+        batch_v1_api = get_api(client.BatchV1Api)
+        try:
+            jobs = batch_v1_api.list_namespaced_job(
+                k8s_settings.namespace,
+                label_selector=f"{FLEET_UPGRADE_LABEL}={fleet_upgrade_id}",
+            )
+        except Exception as e:
+            out = {"error": e, "params": {"fleet_upgrade_id": fleet_upgrade_id}}
+            reason = getattr(e, "reason", None)
+            if reason:
+                out["reason"] = reason
+            frappe.log_error(out, "Exception: BatchV1Api->list_namespaced_job")
+            frappe.local.response["http_status_code"] = getattr(e, "status", 500)
+            return out
+
+        job_phases = {
+            job.metadata.name: get_job_phase(to_dict(job.status))
+            for job in jobs.items
+        }
+
+    summary = {"Error": len(fleet_upgrade["errors"])}
+    for phase in job_phases.values():
+        summary[phase] = summary.get(phase, 0) + 1
+
+    return {
+        "fleet_upgrade_id": fleet_upgrade_id,
+        "status": fleet_upgrade["status"],
+        "base_pvc_name": fleet_upgrade["base_pvc_name"],
+        "sites": len(fleet_upgrade["sites"]),
+        "pre_pull": fleet_upgrade.get("pre_pull"),
+        "summary": summary,
+        "jobs": job_phases,
+        "errors": fleet_upgrade["errors"],
+    }
+
+
+def get_fleet_upgrade(fleet_upgrade_id):
+    return frappe.cache().get_value(f"{FLEET_UPGRADE_CACHE_KEY}|{fleet_upgrade_id}")
+
+
+def set_fleet_upgrade(fleet_upgrade):
+    frappe.cache().set_value(
+        f"{FLEET_UPGRADE_CACHE_KEY}|{fleet_upgrade['fleet_upgrade_id']}",
+        fleet_upgrade,
+        expires_in_sec=FLEET_UPGRADE_EXPIRY,
+    )
@@ -0,0 +1,240 @@
+import threading
+import time
+
+import frappe
+from k8s_bench.utils.constants import (
+    JOB_FAILED,
+    JOB_STATUS_EVENT,
+    JOB_SUCCEEDED,
+    SITE_INGRESS_SELECTOR,
+    UPGRADE_JOB_SELECTOR,
+    UPGRADE_REQUEST_LABEL,
+)
+from k8s_bench.utils.k8s import get_job_phase, to_dict
+from k8s_bench.utils.kube_client import client, get_api, rest, watch
+from k8s_bench.utils.metrics import JOBS_FAILED, JOBS_SUCCEEDED, inc_jobs
+from k8s_bench.utils.resource_cache import (
+    INGRESS_HOSTS,
+    INGRESSES,
+    JOBS,
+    delete_cached_object,
+    get_resource_meta,
+    get_stored_object,
+    get_stored_objects,
+    set_cached_object,
+    set_resource_meta,
+)
+from k8s_bench.utils.settings import get_k8s_settings
+from k8s_bench.utils.upgrade_scheduler import enqueue_dispatch
+
+ADDED = "ADDED"
+MODIFIED = "MODIFIED"
+DELETED = "DELETED"
+BOOKMARK = "BOOKMARK"
+
+WATCH_TIMEOUT = 30
+RETRY_INTERVAL = 5
+
+
+class Informer(object):
+    def __init__(self, resource, list_func, namespace, label_selector=None):
+        self.resource = resource
+        self.list_func = list_func
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.handlers = []
+        self.resource_version = None
+        self.logger = frappe.logger("k8s_bench")
+
+        # resume from the last seen resourceVersion after a restart
+        meta = get_resource_meta(resource)
+        if meta and meta.get("namespace") == namespace:
+            self.resource_version = meta.get("resource_version")
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+
+    def run(self, stop_event=None):
+        while not (stop_event and stop_event.is_set()):
+            try:
+                if not self.resource_version:
+                    self.list()
+                self.watch(stop_event)
+            except rest.ApiException as e:
+                if e.status == 410:
+                    # resourceVersion compacted away, start over with a list
+                    self.resource_version = None
+                    continue
+                self.logger.error(f"{self.resource} informer: {e!r}")
+                time.sleep(RETRY_INTERVAL)
+            except Exception as e:
+                self.logger.error(f"{self.resource} informer: {e!r}")
+                time.sleep(RETRY_INTERVAL)
+
+    def list(self):
+        response = self.list_func(self.namespace, label_selector=self.label_selector)
+        objects = {obj.metadata.name: to_dict(obj) for obj in response.items}
+        cached = get_stored_objects(self.resource)
+
+        for name in set(cached) - set(objects):
+            delete_cached_object(self.resource, name)
+            self.notify(DELETED, name, None, cached.get(name))
+
+        for name, obj in objects.items():
+            old = cached.get(name)
+            if old != obj:
+                set_cached_object(self.resource, name, obj)
+                self.notify(MODIFIED if old else ADDED, name, obj, old)
+
+        self.resource_version = response.metadata.resource_version
+        self.sync()
+
+    def watch(self, stop_event=None):
+        stream = watch.Watch()
+        for event in stream.stream(
+            self.list_func,
+            self.namespace,
+            label_selector=self.label_selector,
+            resource_version=self.resource_version,
+            timeout_seconds=WATCH_TIMEOUT,
+            allow_watch_bookmarks=True,
+        ):
+            metadata = event["raw_object"].get("metadata", {})
+            self.resource_version = metadata.get("resourceVersion")
+
+            if event["type"] != BOOKMARK:
+                self.handle_event(
+                    event["type"], metadata.get("name"), event["object"]
+                )
+
+            self.sync()
+            if stop_event and stop_event.is_set():
+                stream.stop()
+
+        # watch timed out without events, the cache is still current
+        self.sync()
+
+    def handle_event(self, event_type, name, obj):
+        old = get_stored_object(self.resource, name)
+        if event_type == DELETED:
+            delete_cached_object(self.resource, name)
+            self.notify(DELETED, name, None, old)
+            return
+
+        obj = to_dict(obj)
+        set_cached_object(self.resource, name, obj)
+        self.notify(event_type, name, obj, old)
+
+    def notify(self, event_type, name, obj, old):
+        for handler in self.handlers:
+            try:
+                handler(event_type, name, obj, old)
+            except Exception as e:
+                self.logger.error(f"{self.resource} informer handler: {e!r}")
+
+    def sync(self):
+        set_resource_meta(self.resource, self.namespace, self.resource_version)
+
+
+def get_job_informer():
+    k8s_settings = get_k8s_settings()
+    batch_v1_api = get_api(client.BatchV1Api)
+    informer = Informer(
+        JOBS,
+        batch_v1_api.list_namespaced_job,
+        k8s_settings.namespace,
+        label_selector=UPGRADE_JOB_SELECTOR,
+    )
+    informer.add_handler(publish_job_status)
+    informer.add_handler(collect_finished_job)
+    return informer
+
+
+def publish_job_status(event_type, name, obj, old):
+    if event_type == DELETED:
+        return
+
+    phase = get_job_phase(obj.get("status"))
+    previous_phase = get_job_phase(old.get("status")) if old else None
+    if phase == previous_phase:
+        return
+
+    frappe.publish_realtime(
+        JOB_STATUS_EVENT,
+        {
+            "job_name": name,
+            "phase": phase,
+            "previous_phase": previous_phase,
+            "labels": obj.get("metadata", {}).get("labels"),
+            "status": obj.get("status"),
+        },
+    )
+
+
+def collect_finished_job(event_type, name, obj, old):
+    if event_type == DELETED:
+        return
+
+    phase = get_job_phase(obj.get("status"))
+    previous_phase = get_job_phase(old.get("status")) if old else None
+    if phase == previous_phase or phase not in (JOB_SUCCEEDED, JOB_FAILED):
+        return
+
+    inc_jobs(JOBS_SUCCEEDED if phase == JOB_SUCCEEDED else JOBS_FAILED)
+    frappe.enqueue("k8s_bench.utils.upgrade_runs.collect_upgrade_run", job_name=name)
+    if UPGRADE_REQUEST_LABEL in (obj.get("metadata", {}).get("labels") or {}):
+        # a slot on the job's database host is free
+        enqueue_dispatch()
+
+
+def get_ingress_informer():
+    k8s_settings = get_k8s_settings()
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+    informer = Informer(
+        INGRESSES,
+        networking_v1_api.list_namespaced_ingress,
+        k8s_settings.namespace,
+        label_selector=SITE_INGRESS_SELECTOR,
+    )
+    informer.add_handler(index_ingress_hosts)
+    return informer
+
+
+def index_ingress_hosts(event_type, name, obj, old):
+    hosts = get_ingress_hosts(obj)
+    for host in get_ingress_hosts(old) - hosts:
+        delete_cached_object(INGRESS_HOSTS, host)
+    for host in hosts:
+        set_cached_object(INGRESS_HOSTS, host, name)
+
+
+def get_ingress_hosts(ingress):
+    if not ingress:
+        return set()
+    rules = ingress.get("spec", {}).get("rules") or []
+    return {rule.get("host") for rule in rules if rule.get("host")}
+
+
+def run_informers(informers):
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+    stop_event = threading.Event()
+
+    def run(informer):
+        frappe.init(site=site, sites_path=sites_path)
+        try:
+            informer.run(stop_event)
+        finally:
+            frappe.destroy()
+
+    threads = [
+        threading.Thread(target=run, args=(informer,), daemon=True)
+        for informer in informers[1:]
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        informers[0].run(stop_event)
+    finally:
+        stop_event.set()
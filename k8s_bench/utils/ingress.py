@@ -0,0 +1,417 @@
+import bisect
+import hashlib
+import random
+import time
+
+from k8s_bench.utils.constants import (
+    INGRESS_SHARD_LABEL,
+    SITE_INGRESS_LABELS,
+    SITE_INGRESS_SHARD,
+)
+from k8s_bench.utils.concurrency import get_error_summary, run_concurrently
+from k8s_bench.utils.kube_client import client, get_api, get_api_client, rest
+from k8s_bench.utils.resource_cache import (
+    INGRESS_HOSTS,
+    INGRESSES,
+    get_stored_object,
+    is_synced,
+)
+
+DEFAULT_SHARD_MAX_RULES = 100
+SHARD_VNODES = 64
+# conflicting shard patches are retried against a fresh read until this deadline
+PATCH_DEADLINE = 30
+PATCH_BACKOFF_BASE = 0.05
+PATCH_BACKOFF_CAP = 1
+
+# consistent hash rings, keyed by the tuple of shard names
+_rings = {}
+
+
+def get_ingress_rule(k8s_settings, site_name):
+    return client.NetworkingV1beta1IngressRule(
+        host=site_name,
+        http=client.NetworkingV1beta1HTTPIngressRuleValue(
+            paths=[
+                client.NetworkingV1beta1HTTPIngressPath(
+                    backend=client.NetworkingV1beta1IngressBackend(
+                        service_name=k8s_settings.service_name, service_port=80
+                    )
+                )
+            ]
+        ),
+    )
+
+
+def get_ingress_body(k8s_settings, name, rules, labels=None):
+    body = client.NetworkingV1beta1Ingress()
+
+    body.metadata = client.V1ObjectMeta(
+        namespace=k8s_settings.namespace,
+        name=name,
+        labels=labels,
+        annotations={
+            "cert-manager.io/cluster-issuer": k8s_settings.cert_manager_cluster_issuer
+        },
+    )
+    body.status = client.V1JobStatus()
+
+    body.spec = client.NetworkingV1beta1IngressSpec(
+        rules=rules,
+        tls=[
+            client.NetworkingV1beta1IngressTLS(
+                hosts=[f"*.{k8s_settings.wildcard_domain}"],
+                secret_name=k8s_settings.wildcard_tls_secret_name,
+            ),
+        ],
+    )
+    return body
+
+
+def get_shard_names(k8s_settings):
+    return tuple(
+        f"{SITE_INGRESS_SHARD}-{i}" for i in range(int(k8s_settings.ingress_shards))
+    )
+
+
+def get_hash(value):
+    return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+
+def get_ring(shard_names):
+    ring = _rings.get(shard_names)
+    if ring is None:
+        ring = sorted(
+            (get_hash(f"{shard}#{vnode}"), shard)
+            for shard in shard_names
+            for vnode in range(SHARD_VNODES)
+        )
+        _rings[shard_names] = ring
+    return ring
+
+
+def get_shard_candidates(k8s_settings, site_name):
+    # shards in ring order from the site's point, the first one owns the site
+    ring = get_ring(get_shard_names(k8s_settings))
+    start = bisect.bisect(ring, (get_hash(site_name), ""))
+    candidates = []
+    for i in range(len(ring)):
+        shard = ring[(start + i) % len(ring)][1]
+        if shard not in candidates:
+            candidates.append(shard)
+    return candidates
+
+
+def get_rule_hosts(ingress):
+    return [rule.host for rule in (ingress.spec.rules or [])]
+
+
+def read_shard(k8s_settings, shard):
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+    try:
+        return networking_v1_api.read_namespaced_ingress(shard, k8s_settings.namespace)
+    except rest.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def find_site_shard(k8s_settings, site_name):
+    candidates = get_shard_candidates(k8s_settings, site_name)
+
+    # the informer host index usually knows the shard already
+    if is_synced(INGRESSES, k8s_settings.namespace):
+        shard = get_stored_object(INGRESS_HOSTS, site_name)
+        if shard in candidates:
+            candidates.remove(shard)
+            candidates.insert(0, shard)
+
+    for shard in candidates:
+        ingress = read_shard(k8s_settings, shard)
+        if ingress and site_name in get_rule_hosts(ingress):
+            return ingress, get_rule_hosts(ingress).index(site_name)
+
+    return None, None
+
+
+def add_site_to_shard(k8s_settings, site_name):
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+    rule = get_ingress_rule(k8s_settings, site_name)
+    max_rules = int(k8s_settings.ingress_shard_max_rules or DEFAULT_SHARD_MAX_RULES)
+
+    for shard in get_shard_candidates(k8s_settings, site_name):
+        ingress = read_shard(k8s_settings, shard)
+
+        if ingress is None:
+            body = get_ingress_body(
+                k8s_settings,
+                shard,
+                [rule],
+                dict(SITE_INGRESS_LABELS, **{INGRESS_SHARD_LABEL: "true"}),
+            )
+            try:
+                return networking_v1_api.create_namespaced_ingress(
+                    k8s_settings.namespace, body
+                )
+            except rest.ApiException as e:
+                # created concurrently by another worker
+                if e.status != 409:
+                    raise
+                ingress = read_shard(k8s_settings, shard)
+
+        hosts = get_rule_hosts(ingress)
+        if site_name in hosts:
+            return ingress
+        if len(hosts) >= max_rules:
+            continue
+
+        patch = [
+            {
+                "op": "add",
+                "path": "/spec/rules/-",
+                "value": get_api_client().sanitize_for_serialization(rule),
+            }
+        ]
+        return networking_v1_api.patch_namespaced_ingress(
+            shard, k8s_settings.namespace, patch
+        )
+
+    raise rest.ApiException(status=507, reason="All ingress shards are full")
+
+
+def locate_site_rule(k8s_settings, site_name, use_cache=False):
+    # (shard name, rule index, rule count, resourceVersion) of the site's rule
+    if use_cache and is_synced(INGRESSES, k8s_settings.namespace):
+        shard = get_stored_object(INGRESS_HOSTS, site_name)
+        ingress = get_stored_object(INGRESSES, shard) if shard else None
+        if ingress:
+            hosts = [rule.get("host") for rule in ingress["spec"].get("rules") or []]
+            if site_name in hosts:
+                return (
+                    shard,
+                    hosts.index(site_name),
+                    len(hosts),
+                    ingress["metadata"].get("resourceVersion"),
+                )
+
+    ingress, index = find_site_shard(k8s_settings, site_name)
+    if ingress is None:
+        return None
+    return (
+        ingress.metadata.name,
+        index,
+        len(ingress.spec.rules),
+        ingress.metadata.resource_version,
+    )
+
+
+def retry_on_conflict(func):
+    # 409 and 422 mean another writer moved the shard, func re-reads it each time
+    deadline = time.monotonic() + PATCH_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            return func(attempt)
+        except rest.ApiException as e:
+            if e.status not in (409, 422):
+                raise
+            backoff = random.uniform(
+                0, min(PATCH_BACKOFF_CAP, PATCH_BACKOFF_BASE * 2 ** attempt)
+            )
+            if time.monotonic() + backoff > deadline:
+                raise
+            time.sleep(backoff)
+            attempt += 1
+
+
+def patch_site_shard(k8s_settings, site_name, get_patch):
+    # json patch by rule index, the test op fails if the rules moved meanwhile
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+
+    def patch(attempt):
+        # the first attempt trusts the informer cache and skips the read
+        location = locate_site_rule(k8s_settings, site_name, use_cache=attempt == 0)
+        if location is None:
+            raise rest.ApiException(
+                status=404, reason=f"{site_name} not in ingress shards"
+            )
+
+        shard, index, rule_count, resource_version = location
+        patch = [
+            {"op": "test", "path": f"/spec/rules/{index}/host", "value": site_name}
+        ] + get_patch(index, rule_count)
+        return networking_v1_api.patch_namespaced_ingress(
+            shard, k8s_settings.namespace, patch
+        )
+
+    return retry_on_conflict(patch)
+
+
+def remove_sites_from_shards(k8s_settings, site_names, parallelism=None):
+    # {site_name: patched shard or exception}, one patch per shard for all its
+    # sites since patches of the same shard by rule index conflict with each other
+    selected = set(site_names)
+    if len(selected) == 1:
+        location = locate_site_rule(k8s_settings, site_names[0])
+        shards = [location[0]] if location else []
+    else:
+        shards = get_shard_names(k8s_settings)
+
+    def remove(shard):
+        try:
+            return remove_shard_rules(k8s_settings, shard, selected)
+        except Exception as e:
+            return {site_name: e for site_name in selected}
+
+    results = {}
+    for removed in run_concurrently(remove, shards, parallelism):
+        for site_name, result in removed.items():
+            # a failed shard reports every selected site, keep the ones it had
+            if not isinstance(result, Exception) or site_name not in results:
+                results[site_name] = result
+
+    for site_name in selected:
+        if site_name not in results:
+            results[site_name] = rest.ApiException(
+                status=404, reason=f"{site_name} not in ingress shards"
+            )
+    return results
+
+
+def remove_shard_rules(k8s_settings, shard, selected):
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+
+    def patch(attempt):
+        ingress = read_shard(k8s_settings, shard)
+        if ingress is None:
+            return {}
+
+        hosts = get_rule_hosts(ingress)
+        indexes = [index for index, host in enumerate(hosts) if host in selected]
+        if not indexes:
+            return {}
+
+        resource_version = ingress.metadata.resource_version
+        if len(indexes) == len(hosts):
+            # an Ingress without rules is invalid, drop the whole shard
+            result = networking_v1_api.delete_namespaced_ingress(
+                shard,
+                k8s_settings.namespace,
+                body=client.V1DeleteOptions(
+                    preconditions=client.V1Preconditions(
+                        resource_version=resource_version
+                    )
+                ),
+            )
+        else:
+            # highest index first, so earlier removals do not shift the later ones
+            result = networking_v1_api.patch_namespaced_ingress(
+                shard,
+                k8s_settings.namespace,
+                [
+                    {
+                        "op": "test",
+                        "path": "/metadata/resourceVersion",
+                        "value": resource_version,
+                    }
+                ]
+                + [
+                    {"op": "remove", "path": f"/spec/rules/{index}"}
+                    for index in reversed(indexes)
+                ],
+            )
+        return {hosts[index]: result for index in indexes}
+
+    return retry_on_conflict(patch)
+
+
+def remove_site_from_shard(k8s_settings, site_name):
+    result = remove_sites_from_shards(k8s_settings, [site_name])[site_name]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def set_site_shard_service(k8s_settings, site_name, service_name):
+    return patch_site_shard(
+        k8s_settings,
+        site_name,
+        lambda index, rule_count: [
+            {
+                "op": "replace",
+                "path": f"/spec/rules/{index}/http/paths/0/backend/serviceName",
+                "value": service_name,
+            }
+        ],
+    )
+
+
+def repoint_shards(k8s_settings, site_names=None, parallelism=None):
+    selected = set(site_names) if site_names else None
+
+    def repoint(shard):
+        try:
+            return repoint_shard(k8s_settings, shard, selected), {}
+        except Exception as e:
+            return [], {shard: get_error_summary(e)}
+
+    results = run_concurrently(repoint, get_shard_names(k8s_settings), parallelism)
+
+    patched = {site_name for sites, errors in results for site_name in sites}
+    missing = {
+        site_name: {"status": 404, "reason": "Not in ingress shards"}
+        for site_name in (selected or set()) - patched
+    }
+    return results + [([], missing)]
+
+
+def repoint_shard(k8s_settings, shard, selected=None):
+    # one patch per shard for every selected rule, guarded by resourceVersion
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+
+    def patch(attempt):
+        ingress = read_shard(k8s_settings, shard)
+        if ingress is None:
+            return []
+
+        patched = []
+        patch = [
+            {
+                "op": "test",
+                "path": "/metadata/resourceVersion",
+                "value": ingress.metadata.resource_version,
+            }
+        ]
+        for index, rule in enumerate(ingress.spec.rules or []):
+            if selected is not None and rule.host not in selected:
+                continue
+            if not rule.http or not rule.http.paths:
+                continue
+
+            patched.append(rule.host)
+            if rule.http.paths[0].backend.service_name != k8s_settings.service_name:
+                patch.append(
+                    {
+                        "op": "replace",
+                        "path": f"/spec/rules/{index}/http/paths/0/backend/serviceName",
+                        "value": k8s_settings.service_name,
+                    }
+                )
+
+        if len(patch) > 1:
+            networking_v1_api.patch_namespaced_ingress(
+                shard, k8s_settings.namespace, patch
+            )
+        return patched
+
+    return retry_on_conflict(patch)
+
+
+def get_site_rule_view(ingress, site_name):
+    # shard ingress as a dict with only the site's rule left in
+    rules = ingress.get("spec", {}).get("rules") or []
+    spec = dict(
+        ingress.get("spec", {}),
+        rules=[rule for rule in rules if rule.get("host") == site_name],
+    )
+    return dict(ingress, spec=spec)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from k8s_bench.utils.call_policy import CallPolicy, get_retry_after, is_transient
+from k8s_bench.utils.metrics import inc_retries, observe_call, track_in_flight
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+# operation of the call_api running on this thread, the path template keeps names out
+_operation = threading.local()
+
+
+class InstrumentedApiClient(client.ApiClient):
+    def __init__(self, *args, policy=None, **kwargs):
+        # None reads the policy from the site config on every request
+        self.policy = policy
+        super().__init__(*args, **kwargs)
+
+    def call_api(self, resource_path, method, *args, **kwargs):
+        _operation.name = f"{method} {resource_path}"
+        try:
+            return super().call_api(resource_path, method, *args, **kwargs)
+        finally:
+            _operation.name = None
+
+    def request(self, method, url, *args, **kwargs):
+        operation = getattr(_operation, "name", None) or method
+        policy = self.policy or CallPolicy.from_conf()
+
+        # watches hold the connection open for timeoutSeconds and are restarted by
+        # the informer, they keep their own timeout and are not retried
+        query_params = kwargs.get("query_params") or []
+        watch = any(key == "watch" and value for key, value in query_params)
+        if kwargs.get("_request_timeout") is None and not watch:
+            kwargs["_request_timeout"] = policy.timeout
+
+        attempts = policy.get_attempts(method, watch)
+        for attempt in range(attempts):
+            failures = policy.acquire()
+            try:
+                response = self.timed_request(operation, method, url, *args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    policy.record_success(failures)
+                    raise
+                policy.record_failure()
+                if attempt == attempts - 1:
+                    raise
+                inc_retries(operation)
+                time.sleep(policy.get_backoff(attempt, get_retry_after(e)))
+                continue
+
+            policy.record_success(failures)
+            return response
+
+    def timed_request(self, operation, method, url, *args, **kwargs):
+        status = "error"
+        track_in_flight(operation, 1)
+        start = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = response.status
+            return response
+        except ApiException as e:
+            status = e.status
+            raise
+        finally:
+            observe_call(operation, status, time.monotonic() - start)
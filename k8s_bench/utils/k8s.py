@@ -1,16 +1,66 @@
 import frappe
+import hashlib
 import json
+import re
+import time
 from k8s_bench.utils.constants import (
     ASSETS_CACHE,
+    BASE_BENCH_ANNOTATION,
     BASE_SITES_DIR,
+    BENCH_ANNOTATION,
+    JOB_ACTIVE,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_SUCCEEDED,
+    SITE_LABEL,
     SITES_DIR,
     UPGRADE_SITE,
     UPGRADE_SITE_SCRIPT,
+    UPGRADE_SITES,
+    UPGRADE_JOB_LABELS,
+    SITE_INGRESS_LABELS,
 )
-from kubernetes import client, config
-from kubernetes.client.rest import ApiException
+from k8s_bench.utils.assets_cache import get_ready_assets_cache
+from k8s_bench.utils.concurrency import get_error_summary, run_concurrently
+from k8s_bench.utils.ingress import (
+    add_site_to_shard,
+    find_site_shard,
+    get_ingress_body,
+    get_ingress_rule,
+    get_site_rule_view,
+    remove_site_from_shard,
+    remove_sites_from_shards,
+    repoint_shards,
+    set_site_shard_service,
+)
+from k8s_bench.utils.kube_client import client, get_api, get_api_client, rest
+from k8s_bench.utils.metrics import JOBS_CREATED, inc_jobs
+from k8s_bench.utils.resource_cache import (
+    INGRESS_HOSTS,
+    INGRESSES,
+    JOBS,
+    clear_local_cache,
+    get_cache_info,
+    get_cached_object,
+    get_stored_object,
+    is_synced,
+)
+from k8s_bench.utils.settings import (
+    NAMESPACE_FIELDS,
+    NOT_SET,
+    PATCH_INGRESS_FIELDS,
+    SITE_INGRESS_FIELDS,
+    UPGRADE_JOB_FIELDS,
+    get_k8s_settings,
+)
+from werkzeug.wrappers import Response
 import datetime
 
+LONG_POLL_TIMEOUT = 25
+MAX_LONG_POLL_TIMEOUT = 60
+LONG_POLL_INTERVAL = 1
+RAW_CHUNK_SIZE = 64 * 1024
+
 
 def to_dict(obj):
     if hasattr(obj, "attribute_map"):
@@ -22,70 +72,164 @@ def to_dict(obj):
         return result
     elif type(obj) == list:
         return [to_dict(x) for x in obj]
-    elif type(obj) == datetime:
+    elif isinstance(obj, (datetime.datetime, datetime.date)):
         return str(obj)
     else:
         return obj
 
 
-def load_config():
-    if frappe.get_conf().get("developer_mode"):
-        config.load_kube_config()
-    else:
-        config.load_incluster_config()
-
-
 def create_upgrade_job(site_name, base_pvc_name):
-    not_set = "NOT_SET"
-
     if not site_name or not base_pvc_name:
         frappe.local.response["http_status_code"] = 400
         return {
-            "site_name": site_name or not_set,
-            "base_pvc_name": base_pvc_name or not_set,
+            "site_name": site_name or NOT_SET,
+            "base_pvc_name": base_pvc_name or NOT_SET,
         }
 
-    k8s_settings = frappe.get_single("K8s Bench Settings")
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(UPGRADE_JOB_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
 
-    if (
-        not k8s_settings.namespace
-        or not k8s_settings.nginx_image
-        or not k8s_settings.python_image
-        or not k8s_settings.pvc_name
-    ):
+    try:
+        job_name = submit_upgrade_job(k8s_settings, site_name, base_pvc_name)
+        return job_name + " created"
+    except (rest.ApiException, Exception) as e:
+        status_code = getattr(e, "status", 500)
         out = {
-            "namespace": k8s_settings.namespace or not_set,
-            "nginx_image": k8s_settings.nginx_image or not_set,
-            "python_image": k8s_settings.python_image or not_set,
-            "pvc_name": k8s_settings.pvc_name or not_set,
+            "error": e,
+            "params": {"site_name": site_name, "base_pvc_name": base_pvc_name},
         }
+        reason = getattr(e, "reason")
+        if reason:
+            out["reason"] = reason
+
+        frappe.log_error(out, "Exception: BatchV1Api->create_namespaced_job")
+        frappe.local.response["http_status_code"] = status_code
+        return out
+
+
+def submit_upgrade_job(k8s_settings, site_name, base_pvc_name, labels=None):
+    batch_v1_api = get_api(client.BatchV1Api)
+    body = get_upgrade_job_body(k8s_settings, site_name, base_pvc_name, labels)
+    batch_v1_api.create_namespaced_job(k8s_settings.namespace, body)
+    inc_jobs(JOBS_CREATED)
+    return body.metadata.name
+
+
+def get_upgrade_job_name(site_name):
+    return f"{UPGRADE_SITE}-{site_name}"
+
+
+def create_batch_upgrade_job(site_names, base_pvc_name, parallelism=None):
+    if not site_names or not base_pvc_name:
+        frappe.local.response["http_status_code"] = 400
+        return {
+            "site_names": site_names or NOT_SET,
+            "base_pvc_name": base_pvc_name or NOT_SET,
+        }
+
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(UPGRADE_JOB_FIELDS)
+    if out:
         frappe.local.response["http_status_code"] = 501
         return out
 
-    job_name = f"{UPGRADE_SITE}-{site_name}"
-    load_config()
+    try:
+        job_name = submit_batch_upgrade_job(
+            k8s_settings, site_names, base_pvc_name, parallelism
+        )
+        return job_name + " created"
+    except (rest.ApiException, Exception) as e:
+        status_code = getattr(e, "status", 500)
+        out = {
+            "error": e,
+            "params": {"site_names": site_names, "base_pvc_name": base_pvc_name},
+        }
+        reason = getattr(e, "reason", None)
+        if reason:
+            out["reason"] = reason
+
+        frappe.log_error(out, "Exception: BatchV1Api->create_namespaced_job")
+        frappe.local.response["http_status_code"] = status_code
+        return out
+
+
+def submit_batch_upgrade_job(
+    k8s_settings, site_names, base_pvc_name, parallelism=None, labels=None
+):
+    batch_v1_api = get_api(client.BatchV1Api)
+    job_name = f"{UPGRADE_SITES}-{frappe.generate_hash(length=10)}"
+    body = get_batch_upgrade_job_body(
+        k8s_settings, job_name, site_names, base_pvc_name, parallelism, labels
+    )
+    batch_v1_api.create_namespaced_job(k8s_settings.namespace, body)
+    inc_jobs(JOBS_CREATED)
+    return job_name
+
+
+def get_upgrade_job_body(k8s_settings, site_name, base_pvc_name, labels=None):
+    return build_upgrade_job(
+        k8s_settings,
+        get_upgrade_job_name(site_name),
+        base_pvc_name,
+        [client.V1EnvVar(name="SITE_NAME", value=site_name)],
+        dict(labels or {}, **{SITE_LABEL: get_site_label_value(site_name)}),
+    )
+
+
+def get_batch_upgrade_job_body(
+    k8s_settings, job_name, site_names, base_pvc_name, parallelism=None, labels=None
+):
+    shards = max(1, min(int(parallelism or 1), len(site_names)))
+    body = build_upgrade_job(
+        k8s_settings,
+        job_name,
+        base_pvc_name,
+        [
+            client.V1EnvVar(name="SITE_NAMES", value=",".join(site_names)),
+            client.V1EnvVar(name="SITE_SHARDS", value=str(shards)),
+        ],
+        labels,
+    )
 
-    batch_v1_api = client.BatchV1Api()
+    # a retried pod would upgrade the already moved sites of its share again,
+    # shard pods exit 0 after reporting their failed sites so no shard is killed
+    body.spec.backoff_limit = 0
+
+    if shards == 1:
+        return body
+
+    body.spec.completions = shards
+    body.spec.parallelism = shards
+
+    # V1JobSpec of this client predates Indexed Jobs
+    body = get_api_client().sanitize_for_serialization(body)
+    body["spec"]["completionMode"] = "Indexed"
+    return body
+
+
+def build_upgrade_job(k8s_settings, job_name, base_pvc_name, env, labels=None):
+    assets_cache_key = get_ready_assets_cache(k8s_settings)
 
     body = client.V1Job(api_version="batch/v1", kind="Job")
-    body.metadata = client.V1ObjectMeta(namespace=k8s_settings.namespace, name=job_name)
+    body.metadata = client.V1ObjectMeta(
+        namespace=k8s_settings.namespace,
+        name=job_name,
+        labels=dict(UPGRADE_JOB_LABELS, **(labels or {})),
+        annotations={
+            BENCH_ANNOTATION: k8s_settings.pvc_name,
+            BASE_BENCH_ANNOTATION: base_pvc_name,
+        },
+    )
     body.status = client.V1JobStatus()
     body.spec = client.V1JobSpec(
         template=client.V1PodTemplateSpec(
             spec=client.V1PodSpec(
-                init_containers=[
-                    client.V1Container(
-                        name="populate-assets",
-                        image=k8s_settings.nginx_image,
-                        command=["/bin/bash", "-c"],
-                        args=["rsync -a --delete /var/www/html/assets/frappe /assets"],
-                        volume_mounts=[
-                            client.V1VolumeMount(
-                                name="assets-cache", mount_path="/assets"
-                            ),
-                        ],
-                    )
-                ],
+                init_containers=get_assets_init_containers(
+                    k8s_settings, assets_cache_key
+                ),
                 security_context=client.V1PodSecurityContext(
                     supplemental_groups=[1000]
                 ),
@@ -108,15 +252,19 @@ def create_upgrade_job(site_name, base_pvc_name):
                                 mount_path="/home/frappe/frappe-bench/commands",
                             ),
                             client.V1VolumeMount(
-                                name=ASSETS_CACHE, mount_path="/assets"
+                                name=ASSETS_CACHE,
+                                mount_path="/assets",
+                                sub_path=assets_cache_key,
+                                read_only=bool(assets_cache_key) or None,
                             ),
                         ],
-                        env=[
-                            client.V1EnvVar(name="SITE_NAME", value=site_name),
+                        env=env
+                        + [
                             client.V1EnvVar(
                                 name="FROM_BENCH_PATH", value="/opt/base-sites"
                             ),
-                        ],
+                        ]
+                        + get_shadow_rollback_env(k8s_settings),
                     )
                 ],
                 restart_policy="Never",
@@ -138,90 +286,108 @@ def create_upgrade_job(site_name, base_pvc_name):
                         name=UPGRADE_SITE,
                         config_map=client.V1ConfigMapVolumeSource(name=UPGRADE_SITE),
                     ),
-                    client.V1Volume(
-                        name=ASSETS_CACHE, empty_dir=client.V1EmptyDirVolumeSource()
-                    ),
+                    get_assets_cache_volume(k8s_settings, assets_cache_key),
                 ],
             )
         )
     )
+    return body
+
+
+def get_assets_init_containers(k8s_settings, assets_cache_key):
+    # the shared cache already holds this image's assets
+    if assets_cache_key:
+        return None
+
+    return [
+        client.V1Container(
+            name="populate-assets",
+            image=k8s_settings.nginx_image,
+            command=["/bin/bash", "-c"],
+            args=["rsync -a --delete /var/www/html/assets/frappe /assets"],
+            volume_mounts=[
+                client.V1VolumeMount(name="assets-cache", mount_path="/assets"),
+            ],
+        )
+    ]
 
-    try:
-        api_response = batch_v1_api.create_namespaced_job(
-            k8s_settings.namespace, body, pretty=True
+
+def get_assets_cache_volume(k8s_settings, assets_cache_key):
+    if not assets_cache_key:
+        return client.V1Volume(
+            name=ASSETS_CACHE, empty_dir=client.V1EmptyDirVolumeSource()
         )
-        return job_name + " created"
-    except (ApiException, Exception) as e:
-        status_code = getattr(e, "status", 500)
-        out = {
-            "error": e,
-            "params": {"site_name": site_name, "base_pvc_name": base_pvc_name},
-        }
-        reason = getattr(e, "reason")
-        if reason:
-            out["reason"] = reason
 
-        frappe.log_error(out, "Exception: BatchV1Api->create_namespaced_job")
-        frappe.local.response["http_status_code"] = status_code
-        return out
+    return client.V1Volume(
+        name=ASSETS_CACHE,
+        persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
+            claim_name=k8s_settings.assets_cache_pvc_name, read_only=True
+        ),
+    )
 
 
-def create_site_ingress(site_name):
-    k8s_settings = frappe.get_single("K8s Bench Settings")
-
-    if (
-        not k8s_settings.namespace
-        or not k8s_settings.wildcard_domain
-        or not k8s_settings.wildcard_tls_secret_name
-        or not k8s_settings.cert_manager_cluster_issuer
-    ):
-        not_set = "NOT_SET"
-        out = {
-            "namespace": k8s_settings.namespace or not_set,
-            "wildcard_domain": k8s_settings.wildcard_domain or not_set,
-            "wildcard_tls_secret_name": k8s_settings.wildcard_tls_secret_name
-            or not_set,
-            "cert_manager_cluster_issuer": k8s_settings.cert_manager_cluster_issuer
-            or not_set,
-        }
-        frappe.local.response["http_status_code"] = 501
-        return out
+def get_shadow_rollback_env(k8s_settings):
+    if not k8s_settings.shadow_rollback:
+        return []
 
-    load_config()
-    networking_v1_api = client.NetworkingV1beta1Api()
+    env = [client.V1EnvVar(name="SHADOW_ROLLBACK", value="1")]
+    if k8s_settings.db_root_password_secret:
+        env.append(
+            client.V1EnvVar(
+                name="DB_ROOT_PASSWORD",
+                value_from=client.V1EnvVarSource(
+                    secret_key_ref=client.V1SecretKeySelector(
+                        name=k8s_settings.db_root_password_secret, key="password"
+                    )
+                ),
+            )
+        )
+    return env
 
-    body = client.NetworkingV1beta1Ingress()
 
-    body.metadata = client.V1ObjectMeta(
-        namespace=k8s_settings.namespace,
-        name=site_name,
-        annotations={
-            "cert-manager.io/cluster-issuer": k8s_settings.cert_manager_cluster_issuer
-        },
-    )
-    body.status = client.V1JobStatus()
+def get_job_phase(status):
+    status = status or {}
+    for condition in status.get("conditions") or []:
+        if condition.get("status") != "True":
+            continue
+        if condition.get("type") == "Complete":
+            return JOB_SUCCEEDED
+        if condition.get("type") == "Failed":
+            return JOB_FAILED
 
-    body.spec = client.NetworkingV1beta1IngressSpec(
-        rules=[
-            client.NetworkingV1beta1IngressRule(
-                host=site_name,
-                http=client.NetworkingV1beta1HTTPIngressRuleValue(
-                    paths=[
-                        client.NetworkingV1beta1HTTPIngressPath(
-                            backend=client.NetworkingV1beta1IngressBackend(
-                                service_name=k8s_settings.service_name, service_port=80
-                            )
-                        )
-                    ]
-                ),
-            ),
-        ],
-        tls=[
-            client.NetworkingV1beta1IngressTLS(
-                hosts=[f"*.{k8s_settings.wildcard_domain}"],
-                secret_name=k8s_settings.wildcard_tls_secret_name,
-            ),
-        ],
+    if status.get("active"):
+        return JOB_ACTIVE
+    return JOB_PENDING
+
+
+def create_site_ingress(site_name):
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(SITE_INGRESS_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    if k8s_settings.ingress_shards:
+        try:
+            return to_dict(add_site_to_shard(k8s_settings, site_name))
+        except (rest.ApiException, Exception) as e:
+            status_code = getattr(e, "status", 500)
+            out = {"error": e, "params": {"site_name": site_name}}
+            reason = getattr(e, "reason", None)
+            if reason:
+                out["reason"] = reason
+            frappe.log_error(
+                out, "Exception: create_site_ingress - add_site_to_shard"
+            )
+            frappe.local.response["http_status_code"] = status_code
+            return out
+
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+    body = get_ingress_body(
+        k8s_settings,
+        site_name,
+        [get_ingress_rule(k8s_settings, site_name)],
+        dict(SITE_INGRESS_LABELS, **{SITE_LABEL: get_site_label_value(site_name)}),
     )
 
     try:
@@ -229,7 +395,7 @@ def create_site_ingress(site_name):
             k8s_settings.namespace, body
         )
         return to_dict(ingress)
-    except (ApiException, Exception) as e:
+    except (rest.ApiException, Exception) as e:
         status_code = getattr(e, "status", 500)
         out = {"error": e, "params": {"site_name": site_name}}
         reason = getattr(e, "reason")
@@ -243,34 +409,15 @@ def create_site_ingress(site_name):
 
 
 def patch_ingress(site_name):
-    k8s_settings = frappe.get_single("K8s Bench Settings")
-    not_set = "NOT_SET"
-    if not k8s_settings.service_name or not k8s_settings.namespace:
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(PATCH_INGRESS_FIELDS)
+    if out:
         frappe.local.response["http_status_code"] = 501
-        return {
-            "namespace": k8s_settings.namespace or not_set,
-            "service_name": k8s_settings.service_name or not_set,
-        }
-
-    load_config()
-    networking_v1_api = client.NetworkingV1beta1Api()
+        return out
 
     try:
-        body = networking_v1_api.read_namespaced_ingress(
-            site_name, k8s_settings.namespace
-        )
-        if len(body.spec.rules) > 0:
-            if len(body.spec.rules[0].http.paths) > 0:
-                body.spec.rules[0].http.paths[
-                    0
-                ].backend.service_name = k8s_settings.service_name
-
-            networking_v1_api.patch_namespaced_ingress(
-                site_name, k8s_settings.namespace, body
-            )
-
-        return to_dict(body)
-    except (ApiException, Exception) as e:
+        return repoint_site_ingress(k8s_settings, site_name)
+    except (rest.ApiException, Exception) as e:
         status_code = getattr(e, "status", 500)
         out = {"error": e, "params": {"site_name": site_name}}
         reason = getattr(e, "reason")
@@ -281,69 +428,186 @@ def patch_ingress(site_name):
         return out
 
 
+def repoint_site_ingress(k8s_settings, site_name):
+    if k8s_settings.ingress_shards:
+        ingress = set_site_shard_service(
+            k8s_settings, site_name, k8s_settings.service_name
+        )
+        return get_site_rule_view(to_dict(ingress), site_name)
+
+    # one json patch instead of a read-modify-write of the whole Ingress
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
+    ingress = networking_v1_api.patch_namespaced_ingress(
+        site_name,
+        k8s_settings.namespace,
+        [
+            {
+                "op": "replace",
+                "path": "/spec/rules/0/http/paths/0/backend/serviceName",
+                "value": k8s_settings.service_name,
+            }
+        ],
+    )
+    return to_dict(ingress)
+
+
+def patch_ingresses(site_names=None, parallelism=None):
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(PATCH_INGRESS_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    res = {"service_name": k8s_settings.service_name, "patched": [], "errors": {}}
+
+    if k8s_settings.ingress_shards:
+        results = repoint_shards(k8s_settings, site_names, parallelism)
+    else:
+        site_names = site_names or frappe.get_all("Site", pluck="name")
+
+        def repoint(site_name):
+            try:
+                repoint_site_ingress(k8s_settings, site_name)
+                return [site_name], {}
+            except Exception as e:
+                return [], {site_name: get_error_summary(e)}
+
+        results = run_concurrently(repoint, site_names, parallelism)
+
+    for patched, errors in results:
+        res["patched"].extend(patched)
+        res["errors"].update(errors)
+
+    if res["errors"]:
+        frappe.log_error(res, "Exception: NetworkingV1beta1Api - patch_ingresses")
+    return res
+
+
 def delete_site_resources(site_name):
-    not_set = "NOT_SET"
-    k8s_settings = frappe.get_single("K8s Bench Settings")
-    if not k8s_settings.namespace:
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(NAMESPACE_FIELDS)
+    if out:
         frappe.local.response["http_status_code"] = 501
-        return {
-            "namespace": k8s_settings.namespace or not_set,
-        }
+        return out
+
+    res = remove_site_resources(k8s_settings, site_name)
+    log_delete_errors(res)
+    return res
+
+
+def delete_sites_resources(site_names, parallelism=None):
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(NAMESPACE_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    removed = None
+    if k8s_settings.ingress_shards:
+        # one patch per shard for all the sites instead of one per site
+        removed = remove_sites_from_shards(k8s_settings, site_names, parallelism)
+
+    results = run_concurrently(
+        lambda site_name: remove_site_resources(k8s_settings, site_name, removed),
+        site_names,
+        parallelism,
+    )
+    for res in results:
+        log_delete_errors(res)
+
+    return {"status": "Accepted", "sites": dict(zip(site_names, results))}
 
-    load_config()
-    networking_v1_api = client.NetworkingV1beta1Api()
+
+def remove_site_resources(k8s_settings, site_name, removed=None):
+    # everything k8s_bench creates for a site carries the site label
+    label_selector = f"{SITE_LABEL}={get_site_label_value(site_name)}"
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
     res = {"status": "Accepted"}
     try:
-        ing = networking_v1_api.delete_namespaced_ingress(
-            site_name, k8s_settings.namespace
-        )
+        if removed is not None:
+            ing = removed[site_name]
+            if isinstance(ing, Exception):
+                raise ing
+        elif k8s_settings.ingress_shards:
+            ing = remove_site_from_shard(k8s_settings, site_name)
+        else:
+            ing = networking_v1_api.delete_collection_namespaced_ingress(
+                k8s_settings.namespace,
+                label_selector=label_selector,
+                propagation_policy="Background",
+            )
         res["ingress_deleted"] = to_dict(ing)
     except Exception as e:
         out = {"error": e, "params": {"site_name": site_name}}
-        reason = getattr(e, "reason")
+        reason = getattr(e, "reason", None)
         if reason:
             out["reason"] = reason
         res["ingress_delete_error"] = out
-        frappe.log_error(
-            out,
-            "Exception: delete_site_resources - NetworkingV1beta1Api->delete_namespaced_ingress",
-        )
 
-    batch_v1_api = client.BatchV1Api()
+    batch_v1_api = get_api(client.BatchV1Api)
 
     try:
-        job = batch_v1_api.delete_namespaced_job(
-            f"{UPGRADE_SITE}-{site_name}", k8s_settings.namespace
+        job = batch_v1_api.delete_collection_namespaced_job(
+            k8s_settings.namespace,
+            label_selector=label_selector,
+            propagation_policy="Background",
         )
         res["upgrade_job_deleted"] = to_dict(job)
-    except (ApiException, Exception) as e:
+    except (rest.ApiException, Exception) as e:
         out = {"error": e, "params": {"site_name": site_name}}
-        reason = getattr(e, "reason")
+        reason = getattr(e, "reason", None)
         if reason:
             out["reason"] = reason
         res["job_delete_error"] = out
+
+    return res
+
+
+def log_delete_errors(res):
+    if res.get("ingress_delete_error"):
         frappe.log_error(
-            out, "Exception: delete_site_resources - BatchV1Api->delete_namespaced_job"
+            res["ingress_delete_error"],
+            "Exception: delete_site_resources - NetworkingV1beta1Api->delete_collection_namespaced_ingress",
+        )
+    if res.get("job_delete_error"):
+        frappe.log_error(
+            res["job_delete_error"],
+            "Exception: delete_site_resources - BatchV1Api->delete_collection_namespaced_job",
         )
 
-    return res
 
+def get_site_label_value(site_name):
+    # label values are limited to 63 chars of [A-Za-z0-9_.-]
+    if re.match(r"^[A-Za-z0-9]([A-Za-z0-9_.-]{0,61}[A-Za-z0-9])?$", site_name):
+        return site_name
+    return hashlib.sha1(site_name.encode()).hexdigest()
 
-def get_job_status(job_name):
-    not_set = "NOT_SET"
-    k8s_settings = frappe.get_single("K8s Bench Settings")
-    if not k8s_settings.namespace:
+
+def get_job_status(job_name, raw=False, fields=None):
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(NAMESPACE_FIELDS)
+    if out:
         frappe.local.response["http_status_code"] = 501
-        return {
-            "namespace": k8s_settings.namespace or not_set,
-        }
+        return out
+
+    fields = parse_fields(fields)
+
+    # answered from the informer cache while `bench k8s-informer` keeps it synced
+    job = get_cached_object(JOBS, k8s_settings.namespace, job_name)
+    if job:
+        return project(job, fields)
 
-    load_config()
-    batch_v1_api = client.BatchV1Api()
+    batch_v1_api = get_api(client.BatchV1Api)
     try:
+        if raw:
+            response = batch_v1_api.read_namespaced_job_status(
+                job_name, k8s_settings.namespace, _preload_content=False
+            )
+            return get_raw_response(response, fields)
+
         job = batch_v1_api.read_namespaced_job_status(job_name, k8s_settings.namespace)
-        return to_dict(job)
-    except (ApiException, Exception) as e:
+        return project(to_dict(job), fields)
+    except (rest.ApiException, Exception) as e:
         status_code = getattr(e, "status", 500)
         out = {
             "error": e,
@@ -357,23 +621,120 @@ def get_job_status(job_name):
         return out
 
 
-def read_ingress(site_name):
-    not_set = "NOT_SET"
-    k8s_settings = frappe.get_single("K8s Bench Settings")
-    if not k8s_settings.namespace:
+def parse_fields(fields):
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return [field.strip().split(".") for field in fields if field.strip()]
+
+
+def project(obj, fields):
+    # keep only the requested dotted paths, e.g. status.succeeded
+    if not fields:
+        return obj
+
+    out = {}
+    for path in fields:
+        value = obj
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = out
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+    return out
+
+
+def get_raw_response(response, fields=None):
+    # apiserver json is passed on as is, without building the client models
+    if fields:
+        try:
+            return project(json.loads(response.data), fields)
+        finally:
+            response.release_conn()
+
+    def stream():
+        try:
+            for chunk in response.stream(RAW_CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.release_conn()
+
+    return Response(stream(), mimetype="application/json", direct_passthrough=True)
+
+
+def get_cached_ingress(namespace, site_name):
+    if not is_synced(INGRESSES, namespace):
+        return None
+
+    ingress = get_stored_object(INGRESSES, site_name)
+    if ingress:
+        return ingress
+
+    ingress_name = get_stored_object(INGRESS_HOSTS, site_name)
+    if ingress_name:
+        return get_stored_object(INGRESSES, ingress_name)
+
+
+def wait_for_job_status(job_name, since=None, timeout=None):
+    timeout = min(float(timeout or LONG_POLL_TIMEOUT), MAX_LONG_POLL_TIMEOUT)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        job = get_job_status(job_name)
+        if frappe.local.response.get("http_status_code"):
+            return job
+
+        phase = get_job_phase(job.get("status"))
+        if phase != since or time.monotonic() >= deadline:
+            return {"phase": phase, "changed": phase != since, "job": job}
+
+        time.sleep(LONG_POLL_INTERVAL)
+        clear_local_cache(JOBS)
+
+
+def read_ingress(site_name, fresh=False, raw=False, fields=None):
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(NAMESPACE_FIELDS)
+    if out:
         frappe.local.response["http_status_code"] = 501
-        return {
-            "namespace": k8s_settings.namespace or not_set,
-        }
+        return out
 
-    load_config()
-    networking_v1_api = client.NetworkingV1beta1Api()
+    fields = parse_fields(fields)
+
+    if not fresh:
+        ingress = get_cached_ingress(k8s_settings.namespace, site_name)
+        if ingress:
+            frappe.local.response["k8s_cache"] = get_cache_info(INGRESSES, ingress)
+            if k8s_settings.ingress_shards:
+                ingress = get_site_rule_view(ingress, site_name)
+            return project(ingress, fields)
+
+    networking_v1_api = get_api(client.NetworkingV1beta1Api)
     try:
+        if k8s_settings.ingress_shards:
+            ingress, index = find_site_shard(k8s_settings, site_name)
+            if ingress is None:
+                raise rest.ApiException(
+                    status=404, reason=f"{site_name} not in ingress shards"
+                )
+            return project(get_site_rule_view(to_dict(ingress), site_name), fields)
+
+        if raw:
+            response = networking_v1_api.read_namespaced_ingress(
+                site_name, k8s_settings.namespace, _preload_content=False
+            )
+            return get_raw_response(response, fields)
+
         ingress = networking_v1_api.read_namespaced_ingress(
             site_name, k8s_settings.namespace
         )
-        return to_dict(ingress)
-    except (ApiException, Exception) as e:
+        return project(to_dict(ingress), fields)
+    except (rest.ApiException, Exception) as e:
         status_code = getattr(e, "status", 500)
         out = {
             "error": e,
@@ -0,0 +1,174 @@
+import os
+import socket
+import threading
+from contextlib import contextmanager
+
+import frappe
+from k8s_bench.utils.lazy_import import LazyModule
+from urllib3.connection import HTTPConnection
+
+# the kubernetes package loads hundreds of generated models, import it on first use
+client = LazyModule("kubernetes.client")
+config = LazyModule("kubernetes.config")
+incluster_config = LazyModule("kubernetes.config.incluster_config")
+kube_config = LazyModule("kubernetes.config.kube_config")
+rest = LazyModule("kubernetes.client.rest")
+watch = LazyModule("kubernetes.watch")
+
+DEFAULT_POOL_MAXSIZE = 16
+
+
+class KubeClientManager(object):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._api_client = None
+        self._apis = {}
+        self._stamp = None
+        self._pinned = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def get_api_client(self):
+        if self._pinned is not None:
+            return self._pinned
+
+        stamp = get_config_stamp()
+        api_client = self._api_client
+        if api_client is not None and stamp == self._stamp:
+            self.hits += 1
+            return api_client
+
+        with self._lock:
+            if self._api_client is not None and stamp == self._stamp:
+                self.hits += 1
+                return self._api_client
+
+            self.misses += 1
+            if self._api_client is not None:
+                # credentials rotated, drop pooled connections of stale client
+                self.reloads += 1
+                self.close()
+
+            self._api_client = build_api_client()
+            self._stamp = stamp
+            return self._api_client
+
+    def get_api(self, api_class):
+        api_client = self.get_api_client()
+        api = self._apis.get(api_class)
+        if api is None or api.api_client is not api_client:
+            api = api_class(api_client)
+            self._apis[api_class] = api
+        return api
+
+    @contextmanager
+    def pin(self, api_client):
+        # serve every call from api_client, e.g. one pointed at a fake apiserver
+        self._pinned = api_client
+        try:
+            yield api_client
+        finally:
+            self._pinned = None
+
+    def close(self):
+        with self._lock:
+            if self._api_client is not None:
+                self._api_client.rest_client.pool_manager.clear()
+            self._api_client = None
+            self._apis = {}
+            self._stamp = None
+
+    def stats(self):
+        out = {
+            "client_hits": self.hits,
+            "client_misses": self.misses,
+            "client_reloads": self.reloads,
+            "pools": [],
+            "requests": 0,
+            "connections": 0,
+        }
+
+        api_client = self._api_client
+        if api_client is None:
+            return out
+
+        pool_manager = api_client.rest_client.pool_manager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            out["pools"].append(
+                {
+                    "host": pool.host,
+                    "port": pool.port,
+                    "maxsize": pool.pool.maxsize if pool.pool else 0,
+                    "idle": pool.pool.qsize() if pool.pool else 0,
+                    "requests": pool.num_requests,
+                    "connections": pool.num_connections,
+                }
+            )
+            out["requests"] += pool.num_requests
+            out["connections"] += pool.num_connections
+
+        # a request served over an already open connection is a pool hit
+        out["pool_hits"] = max(out["requests"] - out["connections"], 0)
+        out["pool_misses"] = out["connections"]
+        return out
+
+
+def get_config_stamp():
+    if frappe.get_conf().get("developer_mode"):
+        path = os.path.expanduser(
+            os.environ.get(
+                "KUBECONFIG", kube_config.KUBE_CONFIG_DEFAULT_LOCATION
+            ).split(os.pathsep)[0]
+        )
+    else:
+        path = incluster_config.SERVICE_TOKEN_FILENAME
+
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_mtime, stat.st_size)
+    except OSError:
+        return (path, None, None)
+
+
+def build_api_client():
+    from k8s_bench.utils.instrumented_client import InstrumentedApiClient
+
+    conf = frappe.get_conf()
+    configuration = client.Configuration()
+
+    if conf.get("developer_mode"):
+        config.load_kube_config(client_configuration=configuration)
+    else:
+        config.load_incluster_config(client_configuration=configuration)
+
+    configuration.connection_pool_maxsize = int(
+        conf.get("k8s_pool_maxsize") or DEFAULT_POOL_MAXSIZE
+    )
+
+    api_client = InstrumentedApiClient(configuration=configuration)
+    if conf.get("k8s_tcp_keepalive", 1):
+        api_client.rest_client.pool_manager.connection_pool_kw["socket_options"] = (
+            HTTPConnection.default_socket_options
+            + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        )
+
+    return api_client
+
+
+manager = KubeClientManager()
+
+
+def get_api(api_class):
+    return manager.get_api(api_class)
+
+
+def get_api_client():
+    return manager.get_api_client()
+
+
+def get_pool_stats():
+    return manager.stats()
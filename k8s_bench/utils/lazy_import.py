@@ -0,0 +1,24 @@
+import importlib
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule(object):
+    # stands in for a module until the first attribute access imports it
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
@@ -0,0 +1,298 @@
+import bisect
+
+import frappe
+from redis import Redis
+from werkzeug.wrappers import Response
+
+METRICS_KEY = "k8s_bench_metrics"
+METRICS_PREFIX = "k8s_bench"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CLAIM_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LATENCY_BUCKET = "latency_bucket"
+LATENCY_SUM = "latency_sum"
+LATENCY_COUNT = "latency_count"
+REQUESTS = "requests"
+IN_FLIGHT = "in_flight"
+RETRIES = "retries"
+REJECTED = "rejected"
+JOBS = "jobs"
+WARM_POOL = "warm_pool"
+CLAIM_BUCKET = "claim_bucket"
+CLAIM_SUM = "claim_sum"
+CLAIM_COUNT = "claim_count"
+REFILL_SUM = "refill_sum"
+
+JOBS_CREATED = "created"
+JOBS_SUCCEEDED = "succeeded"
+JOBS_FAILED = "failed"
+
+REJECTED_RATE_LIMITED = "rate_limited"
+REJECTED_CIRCUIT_OPEN = "circuit_open"
+
+WARM_POOL_CLAIMED = "claimed"
+WARM_POOL_MISSED = "missed"
+WARM_POOL_CLAIM_FAILED = "claim_failed"
+WARM_POOL_REFILLED = "refilled"
+WARM_POOL_REFILL_FAILED = "refill_failed"
+
+
+def get_metrics_key():
+    return frappe.cache().make_key(METRICS_KEY)
+
+
+def track_in_flight(operation, delta):
+    try:
+        frappe.cache().hincrby(get_metrics_key(), f"{IN_FLIGHT}|{operation}", delta)
+    except Exception:
+        # metrics must never fail the k8s call they measure
+        pass
+
+
+def observe_call(operation, status, duration):
+    # one round trip per call, buckets are stored per bucket and summed on render
+    bucket = bisect.bisect_left(LATENCY_BUCKETS, duration)
+    le = LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else "+Inf"
+    try:
+        key = get_metrics_key()
+        pipe = frappe.cache().pipeline(transaction=False)
+        pipe.hincrby(key, f"{IN_FLIGHT}|{operation}", -1)
+        pipe.hincrby(key, f"{LATENCY_BUCKET}|{operation}|{le}", 1)
+        pipe.hincrbyfloat(key, f"{LATENCY_SUM}|{operation}", duration)
+        pipe.hincrby(key, f"{LATENCY_COUNT}|{operation}", 1)
+        pipe.hincrby(key, f"{REQUESTS}|{operation}|{status}", 1)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def inc_retries(operation):
+    try:
+        frappe.cache().hincrby(get_metrics_key(), f"{RETRIES}|{operation}", 1)
+    except Exception:
+        pass
+
+
+def inc_rejected(reason):
+    try:
+        frappe.cache().hincrby(get_metrics_key(), f"{REJECTED}|{reason}", 1)
+    except Exception:
+        pass
+
+
+def inc_jobs(event, count=1):
+    try:
+        frappe.cache().hincrby(get_metrics_key(), f"{JOBS}|{event}", count)
+    except Exception:
+        pass
+
+
+def inc_warm_pool(event, count=1):
+    try:
+        frappe.cache().hincrby(get_metrics_key(), f"{WARM_POOL}|{event}", count)
+    except Exception:
+        pass
+
+
+def observe_warm_pool_claim(duration):
+    # signup to usable site, including the queue wait of the claim job
+    bucket = bisect.bisect_left(CLAIM_BUCKETS, duration)
+    le = CLAIM_BUCKETS[bucket] if bucket < len(CLAIM_BUCKETS) else "+Inf"
+    try:
+        key = get_metrics_key()
+        pipe = frappe.cache().pipeline(transaction=False)
+        pipe.hincrby(key, f"{CLAIM_BUCKET}|{le}", 1)
+        pipe.hincrbyfloat(key, CLAIM_SUM, duration)
+        pipe.hincrby(key, CLAIM_COUNT, 1)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def observe_warm_pool_refill(duration):
+    try:
+        frappe.cache().hincrbyfloat(get_metrics_key(), REFILL_SUM, duration)
+    except Exception:
+        pass
+
+
+def get_metric_values():
+    # the counters are raw hincrby values under an already made key,
+    # RedisWrapper.hgetall would prefix the key again and unpickle them
+    values = Redis.hgetall(frappe.cache(), get_metrics_key()) or {}
+    return {
+        frappe.safe_decode(field): float(frappe.safe_decode(value))
+        for field, value in values.items()
+    }
+
+
+def render_metrics():
+    buckets, sums, counts, requests, in_flight, jobs = {}, {}, {}, {}, {}, {}
+    warm_pool, claim_buckets, retries, rejected = {}, {}, {}, {}
+    for field, value in get_metric_values().items():
+        kind, _, rest = field.partition("|")
+        if kind == LATENCY_BUCKET:
+            operation, _, le = rest.rpartition("|")
+            buckets.setdefault(operation, {})[le] = value
+        elif kind == LATENCY_SUM:
+            sums[rest] = value
+        elif kind == LATENCY_COUNT:
+            counts[rest] = value
+        elif kind == REQUESTS:
+            operation, _, status = rest.rpartition("|")
+            requests[(operation, status)] = value
+        elif kind == IN_FLIGHT:
+            in_flight[rest] = value
+        elif kind == RETRIES:
+            retries[rest] = value
+        elif kind == REJECTED:
+            rejected[rest] = value
+        elif kind == JOBS:
+            jobs[rest] = value
+        elif kind == WARM_POOL:
+            warm_pool[rest] = value
+        elif kind == CLAIM_BUCKET:
+            claim_buckets[rest] = value
+        elif kind in (CLAIM_SUM, CLAIM_COUNT, REFILL_SUM):
+            warm_pool[kind] = value
+
+    lines = []
+    name = f"{METRICS_PREFIX}_api_request_duration_seconds"
+    lines += [
+        f"# HELP {name} Latency of Kubernetes API calls.",
+        f"# TYPE {name} histogram",
+    ]
+    for operation in sorted(counts):
+        labels = f'operation="{escape(operation)}"'
+        cumulative = 0
+        for le in LATENCY_BUCKETS:
+            cumulative += buckets.get(operation, {}).get(str(le), 0)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {format_value(cumulative)}')
+        lines.append(
+            f'{name}_bucket{{{labels},le="+Inf"}} {format_value(counts[operation])}'
+        )
+        lines.append(f"{name}_sum{{{labels}}} {sums.get(operation, 0)}")
+        lines.append(f"{name}_count{{{labels}}} {format_value(counts[operation])}")
+
+    name = f"{METRICS_PREFIX}_api_requests_total"
+    lines += [
+        f"# HELP {name} Kubernetes API calls by HTTP status.",
+        f"# TYPE {name} counter",
+    ]
+    for (operation, status), value in sorted(requests.items()):
+        lines.append(
+            f'{name}{{operation="{escape(operation)}",status="{status}"}}'
+            f" {format_value(value)}"
+        )
+
+    name = f"{METRICS_PREFIX}_api_requests_in_flight"
+    lines += [
+        f"# HELP {name} Kubernetes API calls currently running.",
+        f"# TYPE {name} gauge",
+    ]
+    for operation, value in sorted(in_flight.items()):
+        lines.append(
+            f'{name}{{operation="{escape(operation)}"}} {format_value(max(value, 0))}'
+        )
+
+    name = f"{METRICS_PREFIX}_api_retries_total"
+    lines += [
+        f"# HELP {name} Kubernetes API reads retried after a transient error.",
+        f"# TYPE {name} counter",
+    ]
+    for operation, value in sorted(retries.items()):
+        lines.append(
+            f'{name}{{operation="{escape(operation)}"}} {format_value(value)}'
+        )
+
+    name = f"{METRICS_PREFIX}_api_requests_rejected_total"
+    lines += [
+        f"# HELP {name} Kubernetes API calls refused by the client rate limit or"
+        " circuit breaker.",
+        f"# TYPE {name} counter",
+    ]
+    for reason in (REJECTED_RATE_LIMITED, REJECTED_CIRCUIT_OPEN):
+        lines.append(
+            f'{name}{{reason="{reason}"}} {format_value(rejected.get(reason, 0))}'
+        )
+
+    name = f"{METRICS_PREFIX}_jobs_total"
+    lines += [
+        f"# HELP {name} Upgrade Jobs created, succeeded and failed.",
+        f"# TYPE {name} counter",
+    ]
+    for event in (JOBS_CREATED, JOBS_SUCCEEDED, JOBS_FAILED):
+        lines.append(f'{name}{{event="{event}"}} {format_value(jobs.get(event, 0))}')
+
+    lines += render_warm_pool(warm_pool, claim_buckets)
+    return "\n".join(lines) + "\n"
+
+
+def render_warm_pool(warm_pool, claim_buckets):
+    from k8s_bench.utils.warm_pool import get_pool_config, get_pool_depth
+
+    lines = []
+    name = f"{METRICS_PREFIX}_warm_pool_sites"
+    lines += [
+        f"# HELP {name} Pre-provisioned sites waiting to be claimed.",
+        f"# TYPE {name} gauge",
+        f"{name} {get_pool_depth()}",
+    ]
+
+    name = f"{METRICS_PREFIX}_warm_pool_target_sites"
+    lines += [
+        f"# HELP {name} Configured warm pool size.",
+        f"# TYPE {name} gauge",
+        f"{name} {get_pool_config()[0]}",
+    ]
+
+    name = f"{METRICS_PREFIX}_warm_pool_events_total"
+    lines += [
+        f"# HELP {name} Warm pool claims, misses and refills.",
+        f"# TYPE {name} counter",
+    ]
+    for event in (
+        WARM_POOL_CLAIMED,
+        WARM_POOL_MISSED,
+        WARM_POOL_CLAIM_FAILED,
+        WARM_POOL_REFILLED,
+        WARM_POOL_REFILL_FAILED,
+    ):
+        lines.append(
+            f'{name}{{event="{event}"}} {format_value(warm_pool.get(event, 0))}'
+        )
+
+    name = f"{METRICS_PREFIX}_warm_pool_claim_duration_seconds"
+    lines += [
+        f"# HELP {name} Time from signup to a usable site for warm pool claims.",
+        f"# TYPE {name} histogram",
+    ]
+    cumulative = 0
+    for le in CLAIM_BUCKETS:
+        cumulative += claim_buckets.get(str(le), 0)
+        lines.append(f'{name}_bucket{{le="{le}"}} {format_value(cumulative)}')
+    count = format_value(warm_pool.get(CLAIM_COUNT, 0))
+    lines.append(f'{name}_bucket{{le="+Inf"}} {count}')
+    lines.append(f"{name}_sum {warm_pool.get(CLAIM_SUM, 0)}")
+    lines.append(f"{name}_count {count}")
+
+    name = f"{METRICS_PREFIX}_warm_pool_refill_seconds_total"
+    lines += [
+        f"# HELP {name} Time spent installing warm pool sites.",
+        f"# TYPE {name} counter",
+        f"{name} {warm_pool.get(REFILL_SUM, 0)}",
+    ]
+    return lines
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def get_metrics_response():
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,216 @@
+import hashlib
+import time
+
+import frappe
+from k8s_bench.utils.constants import (
+    PAUSE_IMAGE,
+    PRE_PULL_IMAGES,
+    PRE_PULL_LABEL,
+    PRE_PULL_LABELS,
+    PRE_PULL_SELECTOR,
+)
+from k8s_bench.utils.kube_client import client, get_api, rest
+from k8s_bench.utils.settings import UPGRADE_JOB_FIELDS, get_k8s_settings
+
+DEFAULT_PRE_PULL_TIMEOUT = 15 * 60
+PRE_PULL_POLL_INTERVAL = 5
+
+
+def get_pre_pull_images(k8s_settings):
+    return [k8s_settings.python_image, k8s_settings.nginx_image]
+
+
+def get_pause_image():
+    # air-gapped clusters point this at their own registry mirror
+    return frappe.get_conf().get("k8s_pause_image") or PAUSE_IMAGE
+
+
+def get_pre_pull_hash(images):
+    return hashlib.md5(",".join(images).encode()).hexdigest()[:10]
+
+
+def get_pre_pull_name(images):
+    return f"{PRE_PULL_IMAGES}-{get_pre_pull_hash(images)}"
+
+
+def get_pre_pull_body(k8s_settings, images):
+    name = get_pre_pull_name(images)
+    labels = dict(PRE_PULL_LABELS, **{PRE_PULL_LABEL: get_pre_pull_hash(images)})
+
+    body = client.V1DaemonSet(api_version="apps/v1", kind="DaemonSet")
+    body.metadata = client.V1ObjectMeta(
+        namespace=k8s_settings.namespace, name=name, labels=labels
+    )
+    body.spec = client.V1DaemonSetSpec(
+        selector=client.V1LabelSelector(match_labels=labels),
+        template=client.V1PodTemplateSpec(
+            metadata=client.V1ObjectMeta(labels=labels),
+            spec=client.V1PodSpec(
+                # every image is pulled by an init container that exits at once
+                init_containers=[
+                    client.V1Container(
+                        name=f"pull-{i}",
+                        image=image,
+                        command=["/bin/sh", "-c", "true"],
+                        resources=get_pre_pull_resources(),
+                    )
+                    for i, image in enumerate(images)
+                ],
+                containers=[
+                    client.V1Container(
+                        name="pause",
+                        image=get_pause_image(),
+                        resources=get_pre_pull_resources(),
+                    )
+                ],
+                termination_grace_period_seconds=0,
+            ),
+        ),
+    )
+    return body
+
+
+def get_pre_pull_resources():
+    return client.V1ResourceRequirements(
+        requests={"cpu": "10m", "memory": "16Mi"},
+        limits={"cpu": "100m", "memory": "64Mi"},
+    )
+
+
+def start_pre_pull(k8s_settings):
+    apps_v1_api = get_api(client.AppsV1Api)
+    images = get_pre_pull_images(k8s_settings)
+    name = get_pre_pull_name(images)
+
+    # DaemonSets left over for previous images only hold nodes busy
+    for daemon_set in apps_v1_api.list_namespaced_daemon_set(
+        k8s_settings.namespace, label_selector=PRE_PULL_SELECTOR
+    ).items:
+        if daemon_set.metadata.name != name:
+            delete_pre_pull(k8s_settings, daemon_set.metadata.name)
+
+    try:
+        apps_v1_api.create_namespaced_daemon_set(
+            k8s_settings.namespace, get_pre_pull_body(k8s_settings, images)
+        )
+    except rest.ApiException as e:
+        # already pulling these images
+        if e.status != 409:
+            raise
+
+    return name
+
+
+def get_pre_pull_state(k8s_settings, name=None):
+    apps_v1_api = get_api(client.AppsV1Api)
+    core_v1_api = get_api(client.CoreV1Api)
+    images = get_pre_pull_images(k8s_settings)
+    name = name or get_pre_pull_name(images)
+
+    daemon_set = apps_v1_api.read_namespaced_daemon_set(name, k8s_settings.namespace)
+    pods = core_v1_api.list_namespaced_pod(
+        k8s_settings.namespace,
+        label_selector=f"{PRE_PULL_LABEL}={daemon_set.metadata.labels.get(PRE_PULL_LABEL)}",
+    )
+
+    nodes = {}
+    for pod in pods.items:
+        if pod.spec.node_name:
+            nodes[pod.spec.node_name] = is_pod_ready(pod)
+
+    desired = daemon_set.status.desired_number_scheduled or 0
+    ready = daemon_set.status.number_ready or 0
+    return {
+        "name": name,
+        "images": images,
+        "desired": desired,
+        "ready": ready,
+        "nodes": nodes,
+        "complete": bool(desired)
+        and ready >= desired
+        and daemon_set.status.observed_generation
+        == daemon_set.metadata.generation,
+    }
+
+
+def is_pod_ready(pod):
+    for condition in pod.status.conditions or []:
+        if condition.type == "Ready":
+            return condition.status == "True"
+    return False
+
+
+def wait_for_pre_pull(k8s_settings, timeout=None):
+    # start the DaemonSet, block until every node is ready, then remove it
+    timeout = int(
+        timeout
+        or frappe.get_conf().get("k8s_pre_pull_timeout")
+        or DEFAULT_PRE_PULL_TIMEOUT
+    )
+    name = start_pre_pull(k8s_settings)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        state = get_pre_pull_state(k8s_settings, name)
+        if state["complete"] or time.monotonic() >= deadline:
+            break
+        time.sleep(PRE_PULL_POLL_INTERVAL)
+
+    delete_pre_pull(k8s_settings, name)
+    return state
+
+
+def delete_pre_pull(k8s_settings, name):
+    apps_v1_api = get_api(client.AppsV1Api)
+    try:
+        apps_v1_api.delete_namespaced_daemon_set(
+            name, k8s_settings.namespace, propagation_policy="Background"
+        )
+    except rest.ApiException as e:
+        if e.status != 404:
+            raise
+
+
+def pre_pull_images():
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(UPGRADE_JOB_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    try:
+        name = start_pre_pull(k8s_settings)
+        return get_pre_pull_state(k8s_settings, name)
+    except (rest.ApiException, Exception) as e:
+        status_code = getattr(e, "status", 500)
+        out = {"error": e, "params": {"images": get_pre_pull_images(k8s_settings)}}
+        reason = getattr(e, "reason", None)
+        if reason:
+            out["reason"] = reason
+        frappe.log_error(out, "Exception: AppsV1Api->create_namespaced_daemon_set")
+        frappe.local.response["http_status_code"] = status_code
+        return out
+
+
+def get_pre_pull_status(cleanup=False):
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(UPGRADE_JOB_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    try:
+        state = get_pre_pull_state(k8s_settings)
+        if cleanup and state["complete"]:
+            delete_pre_pull(k8s_settings, state["name"])
+            state["deleted"] = True
+        return state
+    except (rest.ApiException, Exception) as e:
+        status_code = getattr(e, "status", 500)
+        out = {"error": e, "params": {"images": get_pre_pull_images(k8s_settings)}}
+        reason = getattr(e, "reason", None)
+        if reason:
+            out["reason"] = reason
+        frappe.log_error(out, "Exception: AppsV1Api->read_namespaced_daemon_set")
+        frappe.local.response["http_status_code"] = status_code
+        return out
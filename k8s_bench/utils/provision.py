@@ -0,0 +1,183 @@
+import json
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.realtime import emit_via_redis
+
+PROVISION_SUCCESS = "Success"
+PROVISION_FAILED = "Failed"
+
+
+def enqueue_provision_site(
+    site_name, key, first_name, last_name, password, email, apps=None, template=None
+):
+    frappe.enqueue(
+        "k8s_bench.utils.provision.provision_site",
+        queue="long",
+        timeout=1800,
+        site_name=site_name,
+        key=key,
+        first_name=first_name,
+        last_name=last_name,
+        password=password,
+        email=email,
+        apps=parse_apps(apps),
+        template=template,
+    )
+
+
+def parse_apps(apps):
+    if isinstance(apps, str):
+        apps = apps.split(",")
+    return [app.strip() for app in apps or [] if app and app.strip()]
+
+
+def provision_site(
+    site_name,
+    key,
+    first_name,
+    last_name,
+    password,
+    email,
+    apps=None,
+    template=None,
+):
+    # new site, apps and system manager in one process instead of one bench call each
+    from frappe.utils.user import add_system_manager
+    from k8s_bench.utils.site_template import get_site_template
+
+    publish = get_publisher(key)
+    conf = frappe.get_conf()
+    sites_path = frappe.local.sites_path
+    steps = []
+    status = PROVISION_SUCCESS
+    error = None
+    publish(f"Provisioning {site_name}\n")
+    try:
+        template_path = get_site_template(apps or [], conf, steps, publish, template)
+        with switch_site():
+            create_site_database(
+                site_name, sites_path, apps, conf, steps, publish, template_path
+            )
+            with timed_step(steps, "add_system_manager", publish):
+                add_system_manager(email, first_name, last_name, password=password)
+                frappe.db.commit()
+    except (Exception, SystemExit) as e:
+        status = PROVISION_FAILED
+        error = repr(e)
+
+    result = get_result(site_name, status, steps, error)
+    log_result(result, "Exception: provision_site")
+    publish(f"{status}: {site_name} in {result['duration']}s\n")
+    return result
+
+
+def create_site_database(
+    site_name, sites_path, apps, conf, steps, publish=None, template_path=None
+):
+    # restores the golden template when there is one, installs the apps otherwise
+    if template_path:
+        from k8s_bench.utils.site_template import restore_site_template
+
+        restore_site_template(
+            site_name, sites_path, template_path, conf, steps, publish
+        )
+    else:
+        install_site(site_name, apps, conf, steps, publish)
+
+
+def install_site(site_name, apps, conf, steps, publish=None):
+    from frappe.installer import _new_site, install_app
+
+    # _new_site exits when db_type is missing, bench new-site defaults it
+    db_type = conf.get("db_type") or "mariadb"
+    with timed_step(steps, "new_site", publish):
+        _new_site(
+            None,
+            site_name,
+            mariadb_root_username=conf.get("root_login") or "root",
+            mariadb_root_password=conf.get("root_password"),
+            admin_password=conf.get("admin_password"),
+            install_apps=[],
+            # only valid for mariadb, _new_site exits for postgres
+            no_mariadb_socket=db_type == "mariadb",
+            db_type=db_type,
+            db_host=conf.get("db_host"),
+            db_port=conf.get("db_port"),
+        )
+
+    for app in apps or []:
+        if app == "frappe":
+            continue
+        with timed_step(steps, f"install_app {app}", publish):
+            install_app(app, set_as_patched=True)
+
+
+@contextmanager
+def switch_site(site_name=None):
+    # frappe.init is a no-op while a site is initialized, so the worker's site is
+    # dropped first and handed back to the job runner afterwards
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+    user = frappe.session.user
+    frappe.destroy()
+    try:
+        if site_name:
+            frappe.init(site=site_name, sites_path=sites_path)
+            frappe.connect()
+        yield
+    finally:
+        frappe.destroy()
+        frappe.init(site=site, sites_path=sites_path)
+        frappe.connect()
+        frappe.set_user(user)
+
+
+def get_publisher(key):
+    # frappe.local points at the provisioned site meanwhile, keep the caller's room
+    room = f"{frappe.local.site}:user:{frappe.session.user}"
+
+    def publish(message):
+        emit_via_redis(key, message, room=room)
+
+    return publish
+
+
+def get_result(site_name, status, steps, error=None):
+    result = {
+        "site_name": site_name,
+        "status": status,
+        "duration": round(sum(step["duration"] for step in steps), 3),
+        "steps": steps,
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+def log_result(result, title):
+    if result.get("error"):
+        frappe.log_error(result, title)
+    frappe.logger("k8s_bench").info(json.dumps(result))
+
+
+@contextmanager
+def timed_step(steps, step, publish=None):
+    record = {"step": step}
+    if publish:
+        publish(f"{step} ...\n")
+    start = time.monotonic()
+    try:
+        yield
+    except BaseException as e:
+        record["error"] = repr(e)
+        raise
+    finally:
+        record["duration"] = round(time.monotonic() - start, 3)
+        steps.append(record)
+        if publish:
+            publish(
+                f"{step} {'failed' if 'error' in record else 'done'}"
+                f" in {record['duration']}s\n"
+            )
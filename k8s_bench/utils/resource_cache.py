@@ -0,0 +1,89 @@
+import time
+
+import frappe
+
+RESOURCE_CACHE_KEY = "k8s_bench_resources"
+RESOURCE_META_KEY = "k8s_bench_resources_meta"
+DEFAULT_STALE_AFTER = 90
+
+JOBS = "jobs"
+INGRESSES = "ingresses"
+INGRESS_HOSTS = "ingress_hosts"
+
+
+def get_store_key(resource):
+    return f"{RESOURCE_CACHE_KEY}|{resource}"
+
+
+def get_meta_key(resource):
+    return f"{RESOURCE_META_KEY}|{resource}"
+
+
+def get_resource_meta(resource):
+    # expires=True keeps the heartbeat out of the per request local cache
+    return frappe.cache().get_value(get_meta_key(resource), expires=True)
+
+
+def set_resource_meta(resource, namespace, resource_version):
+    frappe.cache().set_value(
+        get_meta_key(resource),
+        {
+            "namespace": namespace,
+            "resource_version": resource_version,
+            "synced_at": time.time(),
+        },
+    )
+
+
+def is_synced(resource, namespace):
+    meta = get_resource_meta(resource)
+    if not meta or meta.get("namespace") != namespace:
+        return False
+
+    stale_after = (
+        frappe.get_conf().get("k8s_informer_stale_after") or DEFAULT_STALE_AFTER
+    )
+    return time.time() - meta.get("synced_at", 0) <= stale_after
+
+
+def get_cache_info(resource, obj):
+    meta = get_resource_meta(resource) or {}
+    return {
+        "resource_version": obj.get("metadata", {}).get("resourceVersion"),
+        "informer_resource_version": meta.get("resource_version"),
+        "synced_at": meta.get("synced_at"),
+        "age": round(time.time() - meta.get("synced_at", 0), 3),
+    }
+
+
+def get_cached_object(resource, namespace, name):
+    if not is_synced(resource, namespace):
+        return None
+    return get_stored_object(resource, name)
+
+
+def get_cached_objects(resource, namespace):
+    if not is_synced(resource, namespace):
+        return None
+    return get_stored_objects(resource)
+
+
+def get_stored_object(resource, name):
+    return frappe.cache().hget(get_store_key(resource), name)
+
+
+def get_stored_objects(resource):
+    objects = frappe.cache().hgetall(get_store_key(resource)) or {}
+    return {frappe.safe_decode(name): obj for name, obj in objects.items()}
+
+
+def clear_local_cache(resource):
+    frappe.local.cache.pop(frappe.cache().make_key(get_store_key(resource)), None)
+
+
+def set_cached_object(resource, name, obj):
+    frappe.cache().hset(get_store_key(resource), name, obj)
+
+
+def delete_cached_object(resource, name):
+    frappe.cache().hdel(get_store_key(resource), name)
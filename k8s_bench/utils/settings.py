@@ -0,0 +1,134 @@
+from collections import namedtuple
+from contextlib import contextmanager
+
+import frappe
+
+NOT_SET = "NOT_SET"
+K8S_BENCH_SETTINGS = "K8s Bench Settings"
+SETTINGS_CACHE_KEY = "k8s_bench_settings"
+SETTINGS_VERSION_KEY = "k8s_bench_settings_version"
+# backstop for an invalidation that raced a reader, the snapshot is rebuilt after it
+SETTINGS_CACHE_EXPIRY = 300
+
+SETTINGS_FIELDS = (
+    "namespace",
+    "nginx_image",
+    "python_image",
+    "cert_manager_cluster_issuer",
+    "pvc_name",
+    "service_name",
+    "wildcard_domain",
+    "wildcard_tls_secret_name",
+    "ingress_shards",
+    "ingress_shard_max_rules",
+    "shadow_rollback",
+    "db_root_password_secret",
+    "assets_cache_pvc_name",
+)
+
+# fields required by each kind of k8s call, reported as NOT_SET with a 501
+NAMESPACE_FIELDS = ("namespace",)
+UPGRADE_JOB_FIELDS = ("namespace", "nginx_image", "python_image", "pvc_name")
+SITE_INGRESS_FIELDS = (
+    "namespace",
+    "wildcard_domain",
+    "wildcard_tls_secret_name",
+    "cert_manager_cluster_issuer",
+)
+PATCH_INGRESS_FIELDS = ("namespace", "service_name")
+
+REQUIRED_FIELDS = (
+    NAMESPACE_FIELDS,
+    UPGRADE_JOB_FIELDS,
+    SITE_INGRESS_FIELDS,
+    PATCH_INGRESS_FIELDS,
+)
+
+# per process snapshots, keyed by site
+_snapshots = {}
+
+# process wide settings that bypass the site, used by the benchmark harness
+_override = None
+
+
+class K8sSettings(namedtuple("K8sSettings", SETTINGS_FIELDS + ("version", "not_set"))):
+    __slots__ = ()
+
+    def get_not_set(self, fields):
+        not_set = self.not_set.get(fields)
+        return dict(not_set) if not_set else None
+
+
+def get_k8s_settings():
+    if _override is not None:
+        return _override
+
+    site = frappe.local.site
+    cache = frappe.cache()
+
+    version = cache.get_value(SETTINGS_VERSION_KEY)
+    snapshot = _snapshots.get(site)
+    if snapshot and version and snapshot.version == version:
+        return snapshot
+
+    values = cache.get_value(SETTINGS_CACHE_KEY)
+    if not values or values.get("version") != version:
+        values = get_settings_values()
+        cache.set_value(
+            SETTINGS_CACHE_KEY, values, expires_in_sec=SETTINGS_CACHE_EXPIRY
+        )
+        cache.set_value(
+            SETTINGS_VERSION_KEY,
+            values.get("version"),
+            expires_in_sec=SETTINGS_CACHE_EXPIRY,
+        )
+
+    snapshot = make_snapshot(values)
+    _snapshots[site] = snapshot
+    return snapshot
+
+
+def get_settings_values():
+    singles = frappe.db.get_singles_dict(K8S_BENCH_SETTINGS)
+    values = {field: singles.get(field) for field in SETTINGS_FIELDS}
+    values["version"] = frappe.generate_hash(length=10)
+    return values
+
+
+def make_snapshot(values):
+    not_set = {}
+    for fields in REQUIRED_FIELDS:
+        if not all(values.get(field) for field in fields):
+            not_set[fields] = {field: values.get(field) or NOT_SET for field in fields}
+
+    return K8sSettings(
+        version=values.get("version"),
+        not_set=not_set,
+        **{field: values.get(field) for field in SETTINGS_FIELDS},
+    )
+
+
+def clear_settings_cache():
+    # a reader between this save and its commit can cache the old values under a
+    # fresh version, so the keys are dropped again once the transaction commits
+    delete_settings_cache()
+    frappe.enqueue(
+        "k8s_bench.utils.settings.delete_settings_cache",
+        queue="short",
+        enqueue_after_commit=True,
+    )
+
+
+def delete_settings_cache():
+    frappe.cache().delete_value([SETTINGS_CACHE_KEY, SETTINGS_VERSION_KEY])
+    _snapshots.pop(getattr(frappe.local, "site", None), None)
+
+
+@contextmanager
+def override_k8s_settings(values):
+    global _override
+    _override = make_snapshot(dict(values, version=frappe.generate_hash(length=10)))
+    try:
+        yield _override
+    finally:
+        _override = None
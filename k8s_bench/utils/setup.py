@@ -1,4 +1,5 @@
 import frappe
+from k8s_bench.utils.settings import K8S_BENCH_SETTINGS
 
 
 def setup_bench(
@@ -10,8 +11,13 @@ def setup_bench(
     service_name=None,
     wildcard_domain=None,
     wildcard_tls_secret_name=None,
+    ingress_shards=None,
+    ingress_shard_max_rules=None,
+    shadow_rollback=None,
+    db_root_password_secret=None,
+    assets_cache_pvc_name=None,
 ):
-    k8s_settings = frappe.get_single("K8s Bench Settings")
+    k8s_settings = frappe.get_single(K8S_BENCH_SETTINGS)
 
     if namespace:
         k8s_settings.namespace = namespace
@@ -29,6 +35,17 @@ def setup_bench(
         k8s_settings.wildcard_domain = wildcard_domain
     if wildcard_tls_secret_name:
         k8s_settings.wildcard_tls_secret_name = wildcard_tls_secret_name
+    if ingress_shards is not None:
+        k8s_settings.ingress_shards = ingress_shards
+    if ingress_shard_max_rules:
+        k8s_settings.ingress_shard_max_rules = ingress_shard_max_rules
+    if shadow_rollback is not None:
+        k8s_settings.shadow_rollback = shadow_rollback
+    if db_root_password_secret:
+        k8s_settings.db_root_password_secret = db_root_password_secret
+    if assets_cache_pvc_name:
+        k8s_settings.assets_cache_pvc_name = assets_cache_pvc_name
 
+    # on_update clears the settings cache once the save commits
     k8s_settings.save()
     return k8s_settings
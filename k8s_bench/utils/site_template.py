@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+
+import frappe
+from frappe.utils import cint, now
+from k8s_bench.utils.provision import install_site, switch_site, timed_step
+
+SITE_TEMPLATE_KEY = "k8s_bench_site_template"
+TEMPLATES_DIR = ".k8s_bench_templates"
+TEMPLATE_SITE_PREFIX = "k8s-bench-template-"
+TEMPLATE_BUILD_TIMEOUT = 1800
+DATABASE_FILE = "database.sql.gz"
+FILES_FILE = "files.tar"
+TEMPLATE_FILE = "template.json"
+FILES_FOLDERS = ("public/files", "private/files")
+
+
+class SiteTemplateError(Exception):
+    pass
+
+
+def use_site_template(template=None, conf=None):
+    if template is not None and template != "":
+        return bool(cint(template))
+    return bool(cint((conf or frappe.get_conf()).get("k8s_site_template")))
+
+
+def get_app_versions(apps):
+    from frappe.utils.change_log import get_app_last_commit
+
+    versions = {}
+    for app in ["frappe"] + sorted(set(apps) - {"frappe"}):
+        version = getattr(frappe.get_module(app), "__version__", "")
+        commit = get_app_last_commit(app)
+        versions[app] = f"{version}+{commit}" if commit else version
+    return versions
+
+
+def get_template_key(versions):
+    # any app upgrade changes the key, so stale templates are never restored
+    digest = hashlib.sha256(json.dumps(versions, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def get_templates_path():
+    return os.path.join(frappe.local.sites_path, TEMPLATES_DIR)
+
+
+def get_site_template(apps, conf, steps, publish=None, template=None):
+    # template directory for the app set, built on first use, None to install
+    # instead, raises SiteTemplateError when the build fails
+    if not use_site_template(template, conf):
+        return None
+
+    versions = get_app_versions(apps)
+    key = get_template_key(versions)
+    template_path = os.path.join(get_templates_path(), key)
+    if os.path.exists(os.path.join(template_path, TEMPLATE_FILE)):
+        return template_path
+
+    cache = frappe.cache()
+    lock_key = f"{SITE_TEMPLATE_KEY}|{key}"
+    if not cache.set(cache.make_key(lock_key), 1, nx=True, ex=TEMPLATE_BUILD_TIMEOUT):
+        # another worker is building it, do not wait on it
+        return None
+
+    try:
+        with timed_step(steps, "build_template", publish):
+            build_site_template(template_path, key, versions, conf)
+        prune_site_templates(versions, key)
+        return template_path
+    except (Exception, SystemExit) as e:
+        frappe.log_error(
+            {"error": repr(e), "params": {"key": key, "versions": versions}},
+            "Exception: build_site_template",
+        )
+        # a broken template must show up, not hide behind slow cold installs
+        raise SiteTemplateError(f"Could not build site template {key}: {e!r}")
+    finally:
+        cache.delete_value(lock_key)
+
+
+def build_site_template(template_path, key, versions, conf):
+    template_site = f"{TEMPLATE_SITE_PREFIX}{key}"
+    build_path = f"{template_path}.build-{frappe.generate_hash(length=6)}"
+    os.makedirs(build_path)
+
+    try:
+        with switch_site():
+            install_site(template_site, list(versions), conf, [])
+            frappe.db.sql("delete from `tabSessions`")
+            frappe.db.sql("delete from `tabError Log`")
+            frappe.db.commit()
+
+            site_path = frappe.local.site_path
+            db_name = frappe.conf.db_name
+            run_pipeline(
+                get_mysqldump_command(conf, db_name, frappe.conf.db_password),
+                get_compress_command(),
+                os.path.join(build_path, DATABASE_FILE),
+            )
+            with tarfile.open(os.path.join(build_path, FILES_FILE), "w") as tar:
+                for folder in FILES_FOLDERS:
+                    if os.path.exists(os.path.join(site_path, folder)):
+                        tar.add(os.path.join(site_path, folder), arcname=folder)
+
+        with open(os.path.join(build_path, TEMPLATE_FILE), "w") as template_file:
+            json.dump(
+                {"key": key, "versions": versions, "created": now()}, template_file
+            )
+        # a half written template is never visible under its key
+        os.rename(build_path, template_path)
+    finally:
+        shutil.rmtree(build_path, ignore_errors=True)
+        drop_template_site(template_site, conf)
+
+
+def drop_template_site(template_site, conf):
+    site_path = os.path.join(frappe.local.sites_path, template_site)
+    config_path = os.path.join(site_path, "site_config.json")
+    if os.path.exists(config_path):
+        with open(config_path) as config_file:
+            db_name = json.load(config_file).get("db_name")
+        if db_name:
+            run_root_sql(
+                conf,
+                f"DROP DATABASE IF EXISTS `{db_name}`;"
+                f" DROP USER IF EXISTS '{db_name}'@'%';",
+            )
+    shutil.rmtree(site_path, ignore_errors=True)
+
+
+def prune_site_templates(versions, key):
+    # older templates of the same app set are dead once the apps moved on
+    templates_path = get_templates_path()
+    for name in os.listdir(templates_path):
+        if name == key:
+            continue
+        path = os.path.join(templates_path, name)
+        try:
+            with open(os.path.join(path, TEMPLATE_FILE)) as template_file:
+                template = json.load(template_file)
+        except (OSError, ValueError):
+            continue
+        if list(template.get("versions", {})) == list(versions):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def restore_site_template(
+    site_name, sites_path, template_path, conf, steps, publish=None
+):
+    # runs inside switch_site, the new site is initialized here
+    from frappe.installer import make_site_config, make_site_dirs
+    from frappe.utils.password import update_password
+
+    db_name = "_" + hashlib.sha1(site_name.encode()).hexdigest()[:16]
+    db_password = frappe.generate_hash(length=16)
+
+    with timed_step(steps, "create_database", publish):
+        frappe.init(site=site_name, sites_path=sites_path)
+        if os.path.exists(frappe.local.site_path):
+            raise FileExistsError(frappe.local.site_path)
+        make_site_config(db_name, db_password)
+        make_site_dirs()
+        run_root_sql(
+            conf,
+            f"CREATE DATABASE `{db_name}`;"
+            f" CREATE USER '{db_name}'@'%' IDENTIFIED BY '{db_password}';"
+            f" GRANT ALL PRIVILEGES ON `{db_name}`.* TO '{db_name}'@'%';"
+            " FLUSH PRIVILEGES;",
+        )
+
+    with timed_step(steps, "restore_template", publish):
+        run_pipeline(
+            get_decompress_command(os.path.join(template_path, DATABASE_FILE)),
+            get_mysql_command(conf, db_name, db_password) + [db_name],
+        )
+        with tarfile.open(os.path.join(template_path, FILES_FILE)) as tar:
+            tar.extractall(frappe.local.site_path)
+
+    with timed_step(steps, "rewrite_site_settings", publish):
+        frappe.connect()
+        update_password("Administrator", conf.get("admin_password") or "admin")
+        # secrets encrypted with the template's key cannot be read by this site
+        frappe.db.sql("delete from `__Auth` where encrypted=1")
+        frappe.db.sql("delete from `tabSessions`")
+        frappe.db.commit()
+        frappe.clear_cache()
+
+
+def get_mysql_command(conf, user, password):
+    return [
+        "mysql",
+        f"-u{user}",
+        f"-h{conf.get('db_host') or 'localhost'}",
+        f"-p{password}",
+        f"-P{conf.get('db_port') or 3306}",
+    ]
+
+
+def get_mysqldump_command(conf, db_name, db_password):
+    command = get_mysql_command(conf, db_name, db_password)
+    command[0] = "mysqldump"
+    return command + ["--single-transaction", "--quick", db_name]
+
+
+def get_compress_command():
+    return ["pigz", "-c"] if shutil.which("pigz") else ["gzip", "-c"]
+
+
+def get_decompress_command(path):
+    return ["pigz", "-dc", path] if shutil.which("pigz") else ["gunzip", "-c", path]
+
+
+def run_root_sql(conf, sql):
+    command = get_mysql_command(
+        conf, conf.get("root_login") or "root", conf.get("root_password")
+    )
+    result = subprocess.run(command, input=sql.encode(), capture_output=True)
+    if result.returncode:
+        raise subprocess.CalledProcessError(
+            result.returncode, command[0], result.stdout, result.stderr
+        )
+
+
+def run_pipeline(source_command, sink_command, output_path=None):
+    output = open(output_path, "wb") if output_path else subprocess.DEVNULL
+    try:
+        source = subprocess.Popen(
+            source_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        sink = subprocess.Popen(
+            sink_command, stdin=source.stdout, stdout=output, stderr=subprocess.PIPE
+        )
+        # let the source get SIGPIPE if the sink exits early
+        source.stdout.close()
+        sink_error = sink.communicate()[1]
+        source_error = source.stderr.read()
+        source.wait()
+    finally:
+        if output_path:
+            output.close()
+
+    for command, process, error in (
+        (source_command, source, source_error),
+        (sink_command, sink, sink_error),
+    ):
+        if process.returncode:
+            # the command name only, the arguments carry the password
+            raise subprocess.CalledProcessError(
+                process.returncode, command[0], stderr=error
+            )
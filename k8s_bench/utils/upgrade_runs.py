@@ -0,0 +1,166 @@
+import json
+
+import frappe
+from k8s_bench.utils.constants import (
+    BASE_BENCH_ANNOTATION,
+    BENCH_ANNOTATION,
+    FLEET_UPGRADE_LABEL,
+    UPGRADE_SITE,
+    UPGRADE_SITE_EVENT,
+)
+from k8s_bench.utils.kube_client import client, get_api, rest
+from k8s_bench.utils.settings import NAMESPACE_FIELDS, get_k8s_settings
+
+UPGRADE_RUN = "Upgrade Run"
+PHASE_FIELDS = ("phase", "status", "duration", "bytes", "rows", "files", "error")
+STATS_FILTERS = ("site", "bench", "base_bench", "fleet_upgrade_id", "status")
+
+
+def collect_upgrade_run(job_name):
+    k8s_settings = get_k8s_settings()
+    out = k8s_settings.get_not_set(NAMESPACE_FIELDS)
+    if out:
+        frappe.local.response["http_status_code"] = 501
+        return out
+
+    try:
+        return {"upgrade_runs": save_upgrade_runs(k8s_settings, job_name)}
+    except (rest.ApiException, Exception) as e:
+        status_code = getattr(e, "status", 500)
+        out = {"error": e, "params": {"job_name": job_name}}
+        reason = getattr(e, "reason", None)
+        if reason:
+            out["reason"] = reason
+        frappe.log_error(out, "Exception: CoreV1Api->read_namespaced_pod_log")
+        frappe.local.response["http_status_code"] = status_code
+        return out
+
+
+def save_upgrade_runs(k8s_settings, job_name):
+    batch_v1_api = get_api(client.BatchV1Api)
+    core_v1_api = get_api(client.CoreV1Api)
+
+    job = batch_v1_api.read_namespaced_job(job_name, k8s_settings.namespace)
+    annotations = job.metadata.annotations or {}
+    labels = job.metadata.labels or {}
+    pods = core_v1_api.list_namespaced_pod(
+        k8s_settings.namespace, label_selector=f"job-name={job_name}"
+    )
+
+    saved = []
+    for pod in pods.items:
+        for result in get_site_results(core_v1_api, k8s_settings, pod):
+            if frappe.db.exists(
+                UPGRADE_RUN, {"job_name": job_name, "site": result.get("site")}
+            ):
+                continue
+
+            doc = frappe.get_doc(
+                {
+                    "doctype": UPGRADE_RUN,
+                    "site": result.get("site"),
+                    "bench": annotations.get(BENCH_ANNOTATION),
+                    "base_bench": annotations.get(BASE_BENCH_ANNOTATION),
+                    "job_name": job_name,
+                    "fleet_upgrade_id": labels.get(FLEET_UPGRADE_LABEL),
+                    "status": result.get("status"),
+                    "duration": result.get("duration"),
+                    "error": result.get("error"),
+                    "phases": [
+                        {field: phase.get(field) for field in PHASE_FIELDS}
+                        for phase in result.get("phases") or []
+                    ],
+                }
+            )
+            doc.insert(ignore_permissions=True)
+            saved.append(doc.name)
+
+    frappe.db.commit()
+    return saved
+
+
+def get_site_results(core_v1_api, k8s_settings, pod):
+    # the termination message is free to read, the pod log only when it was cut short
+    for status in (pod.status and pod.status.container_statuses) or []:
+        if status.name != UPGRADE_SITE or not status.state.terminated:
+            continue
+        try:
+            results = json.loads(status.state.terminated.message or "")
+        except ValueError:
+            break
+        if isinstance(results, list) and all("phases" in r for r in results):
+            return results
+        break
+
+    try:
+        log = core_v1_api.read_namespaced_pod_log(
+            pod.metadata.name, k8s_settings.namespace, container=UPGRADE_SITE
+        )
+    except rest.ApiException as e:
+        # pod already garbage collected
+        if e.status == 404:
+            return []
+        raise
+
+    results = []
+    for line in log.splitlines():
+        if UPGRADE_SITE_EVENT not in line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("event") == UPGRADE_SITE_EVENT:
+            results.append(record)
+    return results
+
+
+def get_phase_stats(filters=None, from_date=None, to_date=None):
+    filters = frappe.parse_json(filters) if filters else {}
+    conditions = ["phase.parenttype = %(parenttype)s"]
+    values = {"parenttype": UPGRADE_RUN}
+
+    for field in STATS_FILTERS:
+        if filters.get(field):
+            conditions.append(f"run.{field} = %({field})s")
+            values[field] = filters.get(field)
+    if from_date:
+        conditions.append("run.creation >= %(from_date)s")
+        values["from_date"] = from_date
+    if to_date:
+        conditions.append("run.creation <= %(to_date)s")
+        values["to_date"] = to_date
+
+    rows = frappe.db.sql(
+        f"""
+        select phase.phase, phase.duration
+        from `tabUpgrade Run Phase` phase
+        inner join `tabUpgrade Run` run on run.name = phase.parent
+        where {" and ".join(conditions)}
+        """,
+        values,
+    )
+
+    durations = {}
+    for phase, duration in rows:
+        durations.setdefault(phase, []).append(duration or 0)
+
+    stats = {}
+    for phase, phase_durations in durations.items():
+        phase_durations.sort()
+        total = sum(phase_durations)
+        stats[phase] = {
+            "count": len(phase_durations),
+            "mean": round(total / len(phase_durations), 3),
+            "p50": get_percentile(phase_durations, 50),
+            "p95": get_percentile(phase_durations, 95),
+            "max": phase_durations[-1],
+            "total": round(total, 3),
+        }
+    return stats
+
+
+def get_percentile(sorted_values, percentile):
+    # nearest rank
+    index = max(0, -(-len(sorted_values) * percentile // 100) - 1)
+    return sorted_values[int(index)]
@@ -0,0 +1,352 @@
+import os
+
+import frappe
+from dateutil.parser import parse as parse_datetime
+from frappe.utils import cint, now_datetime, time_diff_in_seconds
+from k8s_bench.utils.concurrency import get_error_summary
+from k8s_bench.utils.constants import (
+    JOB_FAILED,
+    JOB_SUCCEEDED,
+    UPGRADE_REQUEST_LABEL,
+)
+from k8s_bench.utils.fleet import get_site_names
+from k8s_bench.utils.k8s import get_job_phase, submit_upgrade_job, to_dict
+from k8s_bench.utils.kube_client import client, get_api
+from k8s_bench.utils.resource_cache import JOBS, get_cached_objects
+from k8s_bench.utils.settings import NOT_SET, UPGRADE_JOB_FIELDS, get_k8s_settings
+
+UPGRADE_REQUEST = "Upgrade Request"
+REQUEST_QUEUED = "Queued"
+REQUEST_DISPATCHED = "Dispatched"
+REQUEST_SUCCEEDED = "Succeeded"
+REQUEST_FAILED = "Failed"
+
+SCHEDULER_STATE_KEY = "k8s_bench_upgrade_scheduler"
+DISPATCH_LOCK_KEY = "k8s_bench_upgrade_dispatch"
+DISPATCH_PENDING_KEY = "k8s_bench_upgrade_dispatch_pending"
+DISPATCH_LOCK_EXPIRY = 600
+
+DEFAULT_MAX_PER_DB_HOST = 4
+# a job slower than this factor over the host's baseline means the host is saturated
+SLOWDOWN_FACTOR = 1.5
+DECREASE_FACTOR = 0.5
+EWMA_WEIGHT = 0.3
+BASELINE_DRIFT = 1.01
+# a dispatched job missing for longer than this was deleted outside k8s_bench
+MISSING_JOB_GRACE = 300
+
+
+def schedule_upgrades(
+    base_pvc_name, sites=None, filters=None, priority=0, db_hosts=None
+):
+    site_names = get_site_names(sites, filters)
+    if not base_pvc_name or not site_names:
+        frappe.local.response["http_status_code"] = 400
+        return {
+            "base_pvc_name": base_pvc_name or NOT_SET,
+            "sites": site_names or NOT_SET,
+        }
+
+    pending = set(
+        frappe.get_all(
+            UPGRADE_REQUEST,
+            filters={
+                "site": ("in", site_names),
+                "status": ("in", (REQUEST_QUEUED, REQUEST_DISPATCHED)),
+            },
+            pluck="site",
+        )
+    )
+
+    db_hosts = frappe.parse_json(db_hosts) or {}
+    default_db_host = frappe.conf.db_host or "localhost"
+    queued = []
+    fallback = []
+    for site_name in site_names:
+        if site_name in pending:
+            continue
+        db_host = db_hosts.get(site_name) or get_db_host(site_name, base_pvc_name)
+        if not db_host:
+            db_host = default_db_host
+            fallback.append(site_name)
+        doc = frappe.get_doc(
+            {
+                "doctype": UPGRADE_REQUEST,
+                "site": site_name,
+                "base_bench": base_pvc_name,
+                "db_host": db_host,
+                "priority": cint(priority),
+                "status": REQUEST_QUEUED,
+            }
+        )
+        doc.insert(ignore_permissions=True)
+        queued.append(site_name)
+
+    frappe.db.commit()
+    enqueue_dispatch()
+
+    out = {"queued": queued, "already_scheduled": sorted(pending)}
+    if fallback:
+        # these share one per host limit whatever database they really live on
+        frappe.logger("k8s_bench").warning(
+            f"db_host not found on {base_pvc_name} for {len(fallback)} sites,"
+            f" scheduled under {default_db_host}: {', '.join(fallback)}"
+        )
+        out["db_host_fallback"] = {"db_host": default_db_host, "sites": fallback}
+
+    frappe.local.response["http_status_code"] = 202
+    return out
+
+
+def get_base_sites_path(base_pvc_name):
+    # where this pod mounts the sites directory of the base PVC, if it does
+    return (frappe.get_conf().get("k8s_base_sites_paths") or {}).get(base_pvc_name)
+
+
+def get_db_host(site_name, base_pvc_name):
+    # the site is upgraded from the base PVC, its config there names the host
+    sites_path = get_base_sites_path(base_pvc_name)
+    if not sites_path:
+        return None
+
+    for config_path in (
+        os.path.join(sites_path, site_name, "site_config.json"),
+        os.path.join(sites_path, "common_site_config.json"),
+    ):
+        if os.path.exists(config_path):
+            db_host = frappe.get_file_json(config_path).get("db_host")
+            if db_host:
+                return db_host
+    return None
+
+
+def enqueue_dispatch():
+    frappe.enqueue(
+        "k8s_bench.utils.upgrade_scheduler.dispatch_upgrade_requests", queue="short"
+    )
+
+
+def dispatch_upgrade_requests():
+    # a single dispatcher, a trigger that arrives meanwhile makes it run once more
+    cache = frappe.cache()
+    if not cache.set(
+        cache.make_key(DISPATCH_LOCK_KEY), 1, nx=True, ex=DISPATCH_LOCK_EXPIRY
+    ):
+        cache.set(cache.make_key(DISPATCH_PENDING_KEY), 1, ex=DISPATCH_LOCK_EXPIRY)
+        return
+
+    try:
+        k8s_settings = get_k8s_settings()
+        if k8s_settings.get_not_set(UPGRADE_JOB_FIELDS):
+            return
+
+        while True:
+            cache.delete_value(DISPATCH_PENDING_KEY)
+            finish_upgrade_requests(k8s_settings)
+            dispatch_queued_requests(k8s_settings)
+            frappe.db.commit()
+            if not cache.get(cache.make_key(DISPATCH_PENDING_KEY)):
+                break
+    finally:
+        cache.delete_value(DISPATCH_LOCK_KEY)
+
+
+def dispatch_queued_requests(k8s_settings):
+    running = dict(
+        frappe.db.sql(
+            """
+            select db_host, count(*)
+            from `tabUpgrade Request`
+            where status = %s
+            group by db_host
+            """,
+            REQUEST_DISPATCHED,
+        )
+    )
+    db_hosts = frappe.get_all(
+        UPGRADE_REQUEST,
+        filters={"status": REQUEST_QUEUED},
+        pluck="db_host",
+        distinct=True,
+    )
+
+    for db_host in db_hosts:
+        slots = int(get_host_state(db_host)["limit"]) - running.get(db_host, 0)
+        if slots <= 0:
+            continue
+
+        requests = frappe.get_all(
+            UPGRADE_REQUEST,
+            filters={"status": REQUEST_QUEUED, "db_host": db_host},
+            fields=["name", "site", "base_bench"],
+            order_by="priority desc, creation asc",
+            limit_page_length=slots,
+        )
+        for request in requests:
+            dispatch_request(k8s_settings, request)
+
+
+def dispatch_request(k8s_settings, request):
+    try:
+        job_name = submit_upgrade_job(
+            k8s_settings,
+            request.site,
+            request.base_bench,
+            {UPGRADE_REQUEST_LABEL: request.name},
+        )
+    except Exception as e:
+        frappe.db.set_value(
+            UPGRADE_REQUEST,
+            request.name,
+            {
+                "status": REQUEST_FAILED,
+                "finished_at": now_datetime(),
+                "error": frappe.as_json(get_error_summary(e)),
+            },
+        )
+        return
+
+    frappe.db.set_value(
+        UPGRADE_REQUEST,
+        request.name,
+        {
+            "status": REQUEST_DISPATCHED,
+            "job_name": job_name,
+            "dispatched_at": now_datetime(),
+        },
+    )
+
+
+def finish_upgrade_requests(k8s_settings):
+    dispatched = frappe.get_all(
+        UPGRADE_REQUEST,
+        filters={"status": REQUEST_DISPATCHED},
+        fields=["name", "db_host", "job_name", "dispatched_at"],
+    )
+    if not dispatched:
+        return
+
+    job_statuses = get_job_statuses(k8s_settings)
+    now = now_datetime()
+    for request in dispatched:
+        elapsed = time_diff_in_seconds(now, request.dispatched_at)
+        if request.job_name not in job_statuses:
+            if elapsed > MISSING_JOB_GRACE:
+                frappe.db.set_value(
+                    UPGRADE_REQUEST,
+                    request.name,
+                    {
+                        "status": REQUEST_FAILED,
+                        "finished_at": now,
+                        "error": f"Job {request.job_name} not found",
+                    },
+                )
+            continue
+
+        status = job_statuses[request.job_name]
+        phase = get_job_phase(status)
+        if phase not in (JOB_SUCCEEDED, JOB_FAILED):
+            continue
+
+        succeeded = phase == JOB_SUCCEEDED
+        duration = get_job_duration(status) or elapsed
+        frappe.db.set_value(
+            UPGRADE_REQUEST,
+            request.name,
+            {
+                "status": REQUEST_SUCCEEDED if succeeded else REQUEST_FAILED,
+                "finished_at": now,
+                "duration": duration,
+            },
+        )
+        update_host_state(request.db_host, duration, succeeded)
+
+
+def get_job_statuses(k8s_settings):
+    jobs = get_cached_objects(JOBS, k8s_settings.namespace)
+    if jobs is not None:
+        return {name: job.get("status") for name, job in jobs.items()}
+
+    batch_v1_api = get_api(client.BatchV1Api)
+    jobs = batch_v1_api.list_namespaced_job(
+        k8s_settings.namespace, label_selector=UPGRADE_REQUEST_LABEL
+    )
+    return {job.metadata.name: to_dict(job.status) for job in jobs.items}
+
+
+def get_job_duration(status):
+    start_time = status.get("startTime")
+    end_time = status.get("completionTime")
+    if not end_time:
+        # failed jobs have no completionTime, the Failed condition has the time
+        for condition in status.get("conditions") or []:
+            if condition.get("type") == "Failed" and condition.get("status") == "True":
+                end_time = condition.get("lastTransitionTime")
+    if not start_time or not end_time:
+        return None
+    return (parse_datetime(end_time) - parse_datetime(start_time)).total_seconds()
+
+
+def get_max_per_db_host():
+    return max(
+        cint(frappe.get_conf().get("k8s_upgrade_max_per_db_host"))
+        or DEFAULT_MAX_PER_DB_HOST,
+        1,
+    )
+
+
+def get_host_state(db_host):
+    # a copy, hget hands out the object kept in the request local cache
+    state = dict(frappe.cache().hget(SCHEDULER_STATE_KEY, db_host) or {})
+    state.setdefault("limit", 1.0)
+    state["limit"] = min(state["limit"], get_max_per_db_host())
+    return state
+
+
+def update_host_state(db_host, duration, succeeded):
+    # AIMD on the concurrency limit: one more slot per window of fast jobs, halved
+    # when jobs slow down past the host's baseline or fail
+    state = get_host_state(db_host)
+    ewma = state.get("ewma")
+    ewma = duration if ewma is None else ewma + EWMA_WEIGHT * (duration - ewma)
+    # the baseline is the fastest the host has been, drifting up so it can recover
+    baseline = state.get("baseline")
+    baseline = ewma if baseline is None else min(baseline * BASELINE_DRIFT, ewma)
+
+    if not succeeded or ewma > baseline * SLOWDOWN_FACTOR:
+        limit = max(1.0, state["limit"] * DECREASE_FACTOR)
+    else:
+        limit = min(get_max_per_db_host(), state["limit"] + 1 / state["limit"])
+
+    frappe.cache().hset(
+        SCHEDULER_STATE_KEY,
+        db_host,
+        {"limit": limit, "ewma": ewma, "baseline": baseline},
+    )
+
+
+def get_scheduler_status():
+    counts = frappe.db.sql(
+        """
+        select db_host, status, count(*)
+        from `tabUpgrade Request`
+        where status in %s
+        group by db_host, status
+        """,
+        [(REQUEST_QUEUED, REQUEST_DISPATCHED)],
+    )
+
+    hosts = {}
+    for db_host, status, count in counts:
+        hosts.setdefault(db_host, {REQUEST_QUEUED: 0, REQUEST_DISPATCHED: 0})
+        hosts[db_host][status] = count
+
+    for db_host, host in hosts.items():
+        state = get_host_state(db_host)
+        host.update(
+            limit=int(state["limit"]),
+            ewma=state.get("ewma"),
+            baseline=state.get("baseline"),
+        )
+
+    return {"max_per_db_host": get_max_per_db_host(), "db_hosts": hosts}
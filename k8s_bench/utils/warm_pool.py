@@ -0,0 +1,225 @@
+import os
+import time
+
+import frappe
+from frappe.utils import cint
+from k8s_bench.utils.k8s import create_site_ingress
+from k8s_bench.utils.metrics import (
+    WARM_POOL_CLAIM_FAILED,
+    WARM_POOL_CLAIMED,
+    WARM_POOL_MISSED,
+    WARM_POOL_REFILL_FAILED,
+    WARM_POOL_REFILLED,
+    inc_warm_pool,
+    observe_warm_pool_claim,
+    observe_warm_pool_refill,
+)
+from k8s_bench.utils.provision import (
+    PROVISION_FAILED,
+    PROVISION_SUCCESS,
+    create_site_database,
+    get_publisher,
+    get_result,
+    log_result,
+    parse_apps,
+    switch_site,
+    timed_step,
+)
+from k8s_bench.utils.site_template import get_site_template
+
+WARM_POOL_KEY = "k8s_bench_warm_pool"
+REFILL_LOCK_KEY = "k8s_bench_warm_pool_refill"
+REFILL_TIMEOUT = 3600
+PLACEHOLDER_PREFIX = "warm-pool-"
+
+
+class IngressError(Exception):
+    pass
+
+
+def get_pool_config():
+    conf = frappe.get_conf()
+    size = cint(conf.get("k8s_warm_pool_size"))
+    return max(size, 0), get_app_set(conf.get("k8s_warm_pool_apps"))
+
+
+def get_app_set(apps):
+    return sorted(set(parse_apps(apps)) - {"frappe"})
+
+
+def get_pool_key(apps):
+    # one list per app set, a config change leaves the old sites unclaimed
+    return f"{WARM_POOL_KEY}|{','.join(apps) or 'frappe'}"
+
+
+def get_pool_depth():
+    size, apps = get_pool_config()
+    return frappe.cache().llen(get_pool_key(apps))
+
+
+def claim_warm_site(site_name, key, first_name, last_name, password, email, apps=None):
+    # False when the pool cannot serve the request and the site needs a full install
+    size, pool_apps = get_pool_config()
+    if not size or get_app_set(apps) != pool_apps:
+        return False
+    if os.path.exists(os.path.join(frappe.local.sites_path, site_name)):
+        return False
+
+    pool_key = get_pool_key(pool_apps)
+    placeholder = frappe.cache().rpop(pool_key)
+    if not placeholder:
+        inc_warm_pool(WARM_POOL_MISSED)
+        enqueue_refill_warm_pool()
+        return False
+
+    frappe.enqueue(
+        "k8s_bench.utils.warm_pool.activate_warm_site",
+        queue="short",
+        timeout=300,
+        placeholder=frappe.safe_decode(placeholder),
+        site_name=site_name,
+        key=key,
+        first_name=first_name,
+        last_name=last_name,
+        password=password,
+        email=email,
+        pool_key=pool_key,
+        claimed_at=time.time(),
+    )
+    return True
+
+
+def activate_warm_site(
+    placeholder,
+    site_name,
+    key,
+    first_name,
+    last_name,
+    password,
+    email,
+    pool_key,
+    claimed_at,
+):
+    from frappe.utils.user import add_system_manager
+
+    publish = get_publisher(key)
+    steps = []
+    status = PROVISION_SUCCESS
+    error = None
+    renamed = False
+    publish(f"Activating {site_name} from the warm pool\n")
+    try:
+        with timed_step(steps, "rename_site", publish):
+            rename_site(placeholder, site_name)
+        renamed = True
+
+        with switch_site(site_name):
+            with timed_step(steps, "add_system_manager", publish):
+                add_system_manager(email, first_name, last_name, password=password)
+                frappe.db.commit()
+                frappe.clear_cache()
+
+        with timed_step(steps, "create_ingress", publish):
+            out = create_site_ingress(site_name)
+            if cint(frappe.local.response.pop("http_status_code", None)) >= 400:
+                raise IngressError(out)
+    except (Exception, SystemExit) as e:
+        status = PROVISION_FAILED
+        error = repr(e)
+        if not renamed:
+            # the placeholder is untouched and can serve the next signup
+            frappe.cache().lpush(pool_key, placeholder)
+
+    result = get_result(site_name, status, steps, error)
+    result["placeholder"] = placeholder
+    result["claim_latency"] = round(time.time() - claimed_at, 3)
+    if status == PROVISION_SUCCESS:
+        inc_warm_pool(WARM_POOL_CLAIMED)
+        observe_warm_pool_claim(result["claim_latency"])
+    else:
+        inc_warm_pool(WARM_POOL_CLAIM_FAILED)
+
+    log_result(result, "Exception: activate_warm_site")
+    publish(f"{status}: {site_name} in {result['claim_latency']}s\n")
+    enqueue_refill_warm_pool()
+    return result
+
+
+def rename_site(placeholder, site_name):
+    # the database keeps its name, only the site directory moves
+    if os.path.basename(site_name) != site_name or site_name.startswith("."):
+        raise ValueError(f"Invalid site name {site_name}")
+
+    sites_path = frappe.local.sites_path
+    target = os.path.join(sites_path, site_name)
+    if os.path.exists(target):
+        raise FileExistsError(target)
+    os.rename(os.path.join(sites_path, placeholder), target)
+
+
+def enqueue_refill_warm_pool():
+    size, apps = get_pool_config()
+    if not size or get_pool_depth() >= size:
+        return
+
+    frappe.enqueue(
+        "k8s_bench.utils.warm_pool.refill_warm_pool",
+        queue="long",
+        timeout=REFILL_TIMEOUT,
+    )
+
+
+def refill_warm_pool():
+    # one refill at a time, concurrent installs would overshoot the pool size
+    cache = frappe.cache()
+    if not cache.set(cache.make_key(REFILL_LOCK_KEY), 1, nx=True, ex=REFILL_TIMEOUT):
+        return
+
+    conf = frappe.get_conf()
+    sites_path = frappe.local.sites_path
+    try:
+        while True:
+            size, apps = get_pool_config()
+            pool_key = get_pool_key(apps)
+            if cache.llen(pool_key) >= size:
+                break
+
+            placeholder = f"{PLACEHOLDER_PREFIX}{frappe.generate_hash(length=10)}"
+            steps = []
+            try:
+                template_path = get_site_template(apps, conf, steps)
+                with switch_site():
+                    create_site_database(
+                        placeholder, sites_path, apps, conf, steps, None, template_path
+                    )
+            except (Exception, SystemExit) as e:
+                # the scheduler retries, a broken install should not loop here
+                inc_warm_pool(WARM_POOL_REFILL_FAILED)
+                log_result(
+                    get_result(placeholder, PROVISION_FAILED, steps, repr(e)),
+                    "Exception: refill_warm_pool",
+                )
+                break
+
+            cache.lpush(pool_key, placeholder)
+            result = get_result(placeholder, PROVISION_SUCCESS, steps)
+            inc_warm_pool(WARM_POOL_REFILLED)
+            observe_warm_pool_refill(result["duration"])
+            log_result(result, "Exception: refill_warm_pool")
+    finally:
+        cache.delete_value(REFILL_LOCK_KEY)
+
+
+def get_warm_pool_status():
+    cache = frappe.cache()
+    size, apps = get_pool_config()
+    sites = [
+        frappe.safe_decode(site) for site in cache.lrange(get_pool_key(apps), 0, -1)
+    ]
+    return {
+        "size": size,
+        "apps": apps,
+        "depth": len(sites),
+        "sites": sites,
+        "refilling": bool(cache.get(cache.make_key(REFILL_LOCK_KEY))),
+    }